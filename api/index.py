@@ -2,16 +2,29 @@
 Vercel Serverless Function 入口
 处理 HTTP 请求并路由到对应的服务
 """
+import base64
+import io
 import json
 import sys
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 # 添加项目根目录到 Python Path（Vercel 环境需要）
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
-from backend.service import analyze_status, check_health
+from backend.config import settings
+from backend.service import analyze_status, analyze_frame_bytes, check_health, warm_up
+from backend.utils import is_binary_frame_request, parse_frame_uploads
+from backend.utils.frame_upload import get_header
+from backend.utils.admission import get_admission_controller, client_key
+from backend.Agent.scheduler import SESSION_HEADER, superseded_result, track_session
+from backend.utils.idempotency import IDEMPOTENCY_HEADER, IDEMPOTENCY_FIELD
+from backend.utils.request_body import RequestBodyError, check_content_length, parse_analyze_body
+from backend.utils.metrics import render_metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from backend.utils.log_tool import configure_logging, new_request_id, get_request_id
+
+configure_logging()
 
 
 def create_response(status_code: int, body: Dict[str, Any]) -> Dict[str, Any]:
@@ -31,24 +44,41 @@ def create_response(status_code: int, body: Dict[str, Any]) -> Dict[str, Any]:
             "Content-Type": "application/json",
             "Access-Control-Allow-Origin": "*",  # CORS
             "Access-Control-Allow-Methods": "GET, POST, OPTIONS",
-            "Access-Control-Allow-Headers": "Content-Type"
+            "Access-Control-Allow-Headers": "Content-Type, X-FocusEye-Stats, X-Request-ID, X-Session-ID, Idempotency-Key",
+            "Access-Control-Expose-Headers": "X-Request-ID, Retry-After",
+            "X-Request-ID": get_request_id()
         },
         "body": json.dumps(body, ensure_ascii=False)
     }
 
 
-def handle_analyze(body: Dict[str, Any]) -> Dict[str, Any]:
+def analyze_status_code(result: Dict[str, Any]) -> int:
+    """根据分析结果返回状态码（被同一会话的新请求取代时为 409，幂等键已用于内容不同的请求时为 422）"""
+    if result.get("success"):
+        return 200
+    if result.get("superseded"):
+        return 409
+    return 422 if result.get("idempotencyConflict") else 500
+
+
+def handle_analyze(
+    body: Dict[str, Any],
+    session_id: Optional[str] = None,
+    idempotency_key: Optional[str] = None
+) -> Dict[str, Any]:
     """
     处理分析请求
     
     Args:
-        body: 请求体，应包含 image 字段
+        body: 请求体，应包含 image 字段（连拍时为 images 列表，可选 layout）
+        session_id: 会话标识（X-Session-ID 请求头）
+        idempotency_key: 幂等键（Idempotency-Key 请求头，也可以放在请求体的 idempotencyKey 字段）
         
     Returns:
         Dict: 分析结果
     """
     # 获取图片数据
-    image_base64 = body.get("image")
+    image_base64 = body.get("images") or body.get("image")
     if not image_base64:
         return create_response(400, {
             "success": False,
@@ -59,12 +89,99 @@ def handle_analyze(body: Dict[str, Any]) -> Dict[str, Any]:
     context = body.get("context")
     
     # 调用服务层
-    result = analyze_status(image_base64, context)
+    result = analyze_status(
+        image_base64, context, body.get("layout"), session_id,
+        idempotency_key or body.get(IDEMPOTENCY_FIELD)
+    )
     
-    # 根据结果返回状态码
-    status_code = 200 if result.get("success") else 500
+    return create_response(analyze_status_code(result), result)
+
+
+def handle_analyze_stream(raw_body: bytes, headers: Optional[Dict[str, str]]) -> Dict[str, Any]:
+    """
+    处理 JSON 分析请求（流式解析，Base64 图片边读边解码，不构建完整的 JSON 对象）
     
-    return create_response(status_code, result)
+    Args:
+        raw_body: 请求体
+        headers: 请求头
+        
+    Returns:
+        Dict: 分析结果
+    """
+    try:
+        frames, body = parse_analyze_body(
+            io.BytesIO(raw_body), settings.ANALYZE_MAX_BODY_BYTES, max_frames=settings.BURST_MAX_FRAMES
+        )
+    except RequestBodyError as e:
+        return create_response(e.status, {
+            "success": False,
+            "error": str(e)
+        })
+    
+    if not frames:
+        return create_response(400, {
+            "success": False,
+            "error": "缺少 image 字段"
+        })
+    
+    result = analyze_frame_bytes(
+        frames, body.get("context"), body.get("layout"),
+        get_header(headers, SESSION_HEADER),
+        get_header(headers, IDEMPOTENCY_HEADER) or body.get(IDEMPOTENCY_FIELD)
+    )
+    
+    return create_response(analyze_status_code(result), result)
+
+
+def read_raw_body(event: Dict[str, Any]) -> bytes:
+    """
+    读取请求体原始字节
+    
+    Args:
+        event: 请求事件对象
+        
+    Returns:
+        bytes: 请求体
+    """
+    raw_body = event.get("body") or b""
+    if event.get("isBase64Encoded") and isinstance(raw_body, str):
+        return base64.b64decode(raw_body)
+    if isinstance(raw_body, str):
+        # 二进制上传按 latin-1 还原字节，JSON 文本按 UTF-8 编码
+        content_type = get_header(event.get("headers"), "Content-Type")
+        return raw_body.encode("latin-1" if is_binary_frame_request(content_type) else "utf-8")
+    return raw_body
+
+
+def handle_analyze_binary(event: Dict[str, Any], content_type: str) -> Dict[str, Any]:
+    """
+    处理二进制帧上传的分析请求（multipart/form-data 或 image/*）
+    
+    Args:
+        event: 请求事件对象
+        content_type: Content-Type 请求头
+        
+    Returns:
+        Dict: 分析结果
+    """
+    raw_body = read_raw_body(event)
+    
+    try:
+        frames, stats = parse_frame_uploads(content_type, raw_body, event.get("headers"))
+    except ValueError as e:
+        return create_response(400, {
+            "success": False,
+            "error": str(e)
+        })
+    
+    headers = event.get("headers")
+    result = analyze_frame_bytes(
+        frames, stats,
+        session_id=get_header(headers, SESSION_HEADER),
+        idempotency_key=get_header(headers, IDEMPOTENCY_HEADER)
+    )
+    
+    return create_response(analyze_status_code(result), result)
 
 
 def handle_health() -> Dict[str, Any]:
@@ -80,6 +197,60 @@ def handle_health() -> Dict[str, Any]:
     return create_response(status_code, result)
 
 
+def handle_warmup() -> Dict[str, Any]:
+    """
+    处理预热请求（平台预热 ping 时调用，提前加载 LLM 依赖并建立连接）
+    
+    Returns:
+        Dict: 预热结果
+    """
+    result = warm_up()
+    status_code = 200 if result.get("success") else 500
+    
+    return create_response(status_code, result)
+
+
+def handle_metrics() -> Dict[str, Any]:
+    """
+    处理指标请求（Prometheus 文本格式）
+    
+    Returns:
+        Dict: 指标文本响应
+    """
+    response = create_response(200, {})
+    response["headers"]["Content-Type"] = METRICS_CONTENT_TYPE
+    response["body"] = render_metrics()
+    return response
+
+
+def handle_admitted(event: Dict[str, Any], handle: Any, *args: Any) -> Dict[str, Any]:
+    """
+    经过准入控制后处理分析请求
+    
+    Args:
+        event: 请求事件对象（用于识别客户端）
+        handle: 实际的处理函数
+        *args: 处理函数参数
+        
+    Returns:
+        Dict: 处理结果，被拒绝时为 429 / 503 响应（带 Retry-After），
+            排队期间被同一会话的新请求取代时为 409 响应
+    """
+    headers = event.get("headers")
+    remote_addr = (event.get("requestContext") or {}).get("identity", {}).get("sourceIp")
+    
+    # 排队之前登记会话，同一会话的新请求可以取代排队中的旧请求
+    with track_session(get_header(headers, SESSION_HEADER)) as token, \
+            get_admission_controller().admit(client_key(headers, remote_addr), token) as ticket:
+        if ticket.reason == "superseded":
+            return create_response(ticket.status, superseded_result())
+        if not ticket.admitted:
+            response = create_response(ticket.status, ticket.error_body())
+            response["headers"].update(ticket.headers())
+            return response
+        return handle(*args)
+
+
 def handler(event: Dict[str, Any], context: Any = None) -> Dict[str, Any]:
     """
     Vercel Serverless Function 主入口
@@ -91,37 +262,63 @@ def handler(event: Dict[str, Any], context: Any = None) -> Dict[str, Any]:
     Returns:
         Dict: HTTP 响应
     """
+    new_request_id(get_header(event.get("headers"), "X-Request-ID"))
+    
     try:
         # 处理 OPTIONS 请求（CORS 预检）
         method = event.get("httpMethod") or event.get("method", "GET")
         if method == "OPTIONS":
             return create_response(200, {})
         
-        # 解析请求体
-        body_str = event.get("body", "{}")
-        if isinstance(body_str, str):
-            body = json.loads(body_str) if body_str else {}
-        else:
-            body = body_str
-        
-        # 路由
         path = event.get("path", "/")
         
-        if path == "/api/health" or method == "GET":
+        headers = event.get("headers")
+        content_type = get_header(headers, "Content-Type")
+        raw_body = event.get("body")
+        is_analyze = method == "POST" and path not in ("/api/metrics", "/api/warmup", "/api/health")
+        
+        # 分析请求体过大时在解析和排队之前拒绝
+        if is_analyze and isinstance(raw_body, (str, bytes)):
+            try:
+                content_length = get_header(headers, "Content-Length")
+                check_content_length(
+                    int(content_length) if content_length and content_length.isdigit() else None,
+                    settings.ANALYZE_MAX_BODY_BYTES
+                )
+                check_content_length(len(raw_body), settings.ANALYZE_MAX_BODY_BYTES)
+            except RequestBodyError as e:
+                return create_response(e.status, {
+                    "success": False,
+                    "error": str(e)
+                })
+        
+        # 二进制帧上传不经过 JSON 解析
+        if method == "POST" and is_binary_frame_request(content_type):
+            return handle_admitted(event, handle_analyze_binary, event, content_type)
+        
+        # JSON 请求体流式解析（平台已解析为对象时直接使用）
+        if is_analyze and raw_body and not isinstance(raw_body, dict):
+            return handle_admitted(event, handle_analyze_stream, read_raw_body(event), headers)
+        body = raw_body if isinstance(raw_body, dict) else {}
+        
+        # 路由
+        if path == "/api/metrics":
+            return handle_metrics()
+        elif path == "/api/warmup":
+            return handle_warmup()
+        elif path == "/api/health" or method == "GET":
             return handle_health()
         elif path == "/api/analyze" or path == "/" or method == "POST":
-            return handle_analyze(body)
+            return handle_admitted(
+                event, handle_analyze, body,
+                get_header(headers, SESSION_HEADER), get_header(headers, IDEMPOTENCY_HEADER)
+            )
         else:
             return create_response(404, {
                 "success": False,
                 "error": f"未知路径: {path}"
             })
             
-    except json.JSONDecodeError:
-        return create_response(400, {
-            "success": False,
-            "error": "无效的 JSON 格式"
-        })
     except Exception as e:
         return create_response(500, {
             "success": False,
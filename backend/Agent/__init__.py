@@ -1,14 +1,36 @@
 """
 Agent 模块初始化
+
+导出项按需加载：导入本包不会加载 LangChain / pydantic，
+首次访问对应名称时才导入所在子模块（降低无服务器环境的冷启动耗时）
 """
-from .prompts import SupervisorResponse, create_user_message, get_system_prompt
-from .supervisor import SupervisorAgent, get_supervisor_agent, analyze_focus
-
-__all__ = [
-    "SupervisorResponse",
-    "create_user_message",
-    "get_system_prompt",
-    "SupervisorAgent",
-    "get_supervisor_agent",
-    "analyze_focus"
-]
+import importlib
+from typing import Any
+
+# 导出名称 -> 所在子模块
+_EXPORTS = {
+    "SupervisorResponse": ".prompts",
+    "create_user_message": ".prompts",
+    "get_system_prompt": ".prompts",
+    "SceneConfig": ".scenes",
+    "scene_registry": ".scenes",
+    "get_scene": ".scenes",
+    "reload_scenes": ".scenes",
+    "SupervisorAgent": ".supervisor",
+    "get_supervisor_agent": ".supervisor",
+    "analyze_focus": ".supervisor",
+    "warm_up": ".supervisor",
+    "LocalClassifier": ".fallback",
+    "get_local_classifier": ".fallback",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str) -> Any:
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
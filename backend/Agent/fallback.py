@@ -0,0 +1,257 @@
+"""
+本地降级分类
+模型服务不可用（熔断或调用失败）时在本地给出 focused / distracted / away 判断，保持监督不中断。
+
+按会话记录模型分析过的画面（感知哈希 + 亮度 + 模型给出的状态），降级时以加权最近邻分类：
+与当前画面越相似、时间越近的记录权重越高。画面过暗时判断为离开（摄像头被遮挡或关灯）；
+没有可参考的记录时返回 unknown（不做判断、不语音播报），前端保持之前的状态，不计入专注或分心。
+反馈文本取自场景配置中的示例
+
+置信度按模型结果校准：每次记录模型结果之前，先用已有记录对同一画面做一次本地判断，
+按判断依据（获胜状态的投票占比分段 / 画面过暗 / 没有相似记录）统计与模型结果一致的比例。
+降级时的置信度即对应分段的一致率（以 0.5 为先验），并限制在 MAX_CONFIDENCE 以内（低于模型结果）。
+只有置信度达到 SPEAK_CONFIDENCE 且至少有 SPEAK_MIN_SUPPORT 条相似记录支持时才语音提醒
+
+只依赖预处理阶段已经计算好的特征（见 frame_batch），不加载模型和 LangChain
+"""
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from backend.Agent.scenes import get_scene
+from backend.utils.frame_batch import DARK_THRESHOLD, hamming_distance
+
+# 降级结果的置信度上限
+MAX_CONFIDENCE = 0.7
+
+# 汉明距离达到该值视为完全不相似（64 位 dHash）
+MAX_DISTANCE = 24
+
+# 记录的权重每经过该时间（秒）减半
+HALF_LIFE = 600.0
+
+# 投票占比的分段数（获胜状态的占比在 1/3 到 1 之间）
+SHARE_BUCKETS = 5
+
+# 校准的先验：没有统计数据时一致率按 PRIOR_AGREEMENT 计，相当于 PRIOR_WEIGHT 次观察
+PRIOR_AGREEMENT = 0.5
+PRIOR_WEIGHT = 2.0
+
+# 语音提醒需要的置信度和支持该状态的相似记录数
+SPEAK_CONFIDENCE = 0.6
+SPEAK_MIN_SUPPORT = 2
+
+# 可参考的状态
+STATUSES = ("focused", "distracted", "away")
+
+# 无法判断时的状态
+STATUS_UNKNOWN = "unknown"
+
+
+@dataclass
+class _Exemplar:
+    hash: int
+    brightness: float
+    status: str
+    at: float
+
+
+@dataclass
+class _Prediction:
+    """
+    一次本地判断
+
+    Attributes:
+        status: 判断的状态
+        bucket: 校准分段（share-N / dark / dissimilar）
+        support: 支持该状态的相似记录数
+    """
+    status: str
+    bucket: str
+    support: int = 0
+
+
+class LocalClassifier:
+    """
+    按会话的加权最近邻分类器（线程安全）
+
+    Args:
+        max_sessions: 最多保留的会话数（按最近使用淘汰）
+        per_session: 每个会话保留的记录数
+        max_age: 记录的最长保留时间（秒）
+        clock: 时钟函数（测试时替换）
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 1024,
+        per_session: int = 16,
+        max_age: float = 3600.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.max_sessions = max_sessions
+        self.per_session = per_session
+        self.max_age = max_age
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, Deque[_Exemplar]]" = OrderedDict()
+        # 校准分段 -> [与模型结果一致次数, 判断次数]（所有会话共用）
+        self._agreement: Dict[str, List[int]] = {}
+
+    def _exemplars(self, session_id: Optional[str], now: float) -> List[_Exemplar]:
+        with self._lock:
+            exemplars = list(self._sessions.get(session_id or "", ()))
+        return [item for item in exemplars if now - item.at <= self.max_age]
+
+    @staticmethod
+    def _predict(
+        exemplars: List[_Exemplar],
+        hashes: List[int],
+        brightness: List[float],
+        now: float
+    ) -> Optional[_Prediction]:
+        """加权最近邻判断（没有可参考的记录时为 None）"""
+        if brightness and all(value < DARK_THRESHOLD for value in brightness):
+            return _Prediction("away", "dark")
+        if not hashes or not exemplars:
+            return None
+
+        votes = dict.fromkeys(STATUSES, 0.0)
+        support = dict.fromkeys(STATUSES, 0)
+        for item in exemplars:
+            similarity = max(0.0, 1.0 - hamming_distance(hashes[-1], item.hash) / MAX_DISTANCE)
+            if similarity > 0.0:
+                votes[item.status] += similarity * 0.5 ** ((now - item.at) / HALF_LIFE)
+                support[item.status] += 1
+        total = sum(votes.values())
+        if total <= 0.0:
+            # 画面与之前都不相似（换了位置、有人走动等）：沿用最近一次的状态
+            return _Prediction(exemplars[-1].status, "dissimilar")
+
+        status = max(votes, key=votes.get)
+        bucket = min(int(votes[status] / total * SHARE_BUCKETS), SHARE_BUCKETS - 1)
+        return _Prediction(status, f"share-{bucket}", support[status])
+
+    def confidence(self, bucket: str) -> float:
+        """
+        校准分段的置信度（与模型结果的一致率，以先验平滑并限制在 MAX_CONFIDENCE 以内）
+
+        Args:
+            bucket: 校准分段
+
+        Returns:
+            float: 置信度
+        """
+        with self._lock:
+            agreed, count = self._agreement.get(bucket, (0, 0))
+        rate = (agreed + PRIOR_AGREEMENT * PRIOR_WEIGHT) / (count + PRIOR_WEIGHT)
+        return round(min(rate, MAX_CONFIDENCE), 2)
+
+    def learn(
+        self,
+        session_id: Optional[str],
+        hashes: List[int],
+        brightness: List[float],
+        status: str
+    ) -> None:
+        """
+        记录一次模型分析结果（使用最后一帧的特征），并用于校准本地判断的置信度
+
+        Args:
+            session_id: 会话标识（没有会话时不记录）
+            hashes: 各帧感知哈希
+            brightness: 各帧平均亮度
+            status: 模型给出的状态
+        """
+        if not session_id or not hashes or status not in STATUSES:
+            return
+        now = self._clock()
+        # 先按已有记录判断一次，统计本地判断与模型结果是否一致
+        prediction = self._predict(self._exemplars(session_id, now), hashes, brightness, now)
+        exemplar = _Exemplar(hashes[-1], brightness[-1] if brightness else 0.0, status, now)
+        with self._lock:
+            if prediction is not None:
+                counts = self._agreement.setdefault(prediction.bucket, [0, 0])
+                counts[0] += prediction.status == status
+                counts[1] += 1
+            exemplars = self._sessions.get(session_id)
+            if exemplars is None:
+                exemplars = self._sessions[session_id] = deque(maxlen=self.per_session)
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(session_id)
+            exemplars.append(exemplar)
+
+    def classify(
+        self,
+        session_id: Optional[str],
+        hashes: List[int],
+        brightness: List[float],
+        scene: str = "reading"
+    ) -> Dict[str, Any]:
+        """
+        本地判断用户状态
+
+        Args:
+            session_id: 会话标识
+            hashes: 各帧感知哈希（未安装 Pillow 时为空）
+            brightness: 各帧平均亮度
+            scene: 场景类型（用于选择反馈文本）
+
+        Returns:
+            Dict: 与 analyze_focus 相同结构的结果（status, message, confidence, shouldSpeak），
+                  没有可参考的记录时 status 为 unknown
+        """
+        now = self._clock()
+        prediction = self._predict(self._exemplars(session_id, now), hashes, brightness, now)
+        if prediction is None:
+            return {
+                "status": STATUS_UNKNOWN,
+                "message": "模型服务暂时不可用，本次不做判断",
+                "confidence": 0.0,
+                "shouldSpeak": False,
+            }
+        return self._result(prediction, self.confidence(prediction.bucket), scene)
+
+    @staticmethod
+    def _result(prediction: _Prediction, confidence: float, scene: str) -> Dict[str, Any]:
+        status = prediction.status
+        scene_config = get_scene(scene)
+        examples = {
+            "focused": scene_config.normal_msg_examples,
+            "distracted": scene_config.distracted_msg_examples,
+            "away": scene_config.away_msg_examples,
+        }[status]
+        return {
+            "status": status,
+            "message": random.choice(examples) if examples else "",
+            "confidence": confidence,
+            # 只在把握较大且有多条相似记录支持时提醒，避免降级期间误报打扰用户
+            # （画面过暗不依赖记录，只看置信度）
+            "shouldSpeak": status != "focused" and confidence >= SPEAK_CONFIDENCE and (
+                prediction.bucket == "dark" or prediction.support >= SPEAK_MIN_SUPPORT
+            ),
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sessions.clear()
+            self._agreement.clear()
+
+
+_classifier: Optional[LocalClassifier] = None
+_classifier_lock = threading.Lock()
+
+
+def get_local_classifier() -> LocalClassifier:
+    """获取全局本地降级分类器"""
+    global _classifier
+    if _classifier is None:
+        with _classifier_lock:
+            if _classifier is None:
+                _classifier = LocalClassifier()
+    return _classifier
@@ -2,13 +2,19 @@
 Prompt 模板定义
 定义监督 Agent 的 System Prompt 和消息结构
 """
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Union, TYPE_CHECKING
 from pydantic import BaseModel, Field
 
+# 场景配置由场景注册表加载（数据文件见 backend/Agent/scenes/）；SCENE_PROMPTS 保留在本模块的原导出位置
+from backend.Agent.scenes import SCENE_PROMPTS, get_scene  # noqa: F401
 
-class SupervisorResponse(BaseModel):
+if TYPE_CHECKING:
+    from backend.Agent.scenes import SceneConfig
+
+
+class FrameResponse(BaseModel):
     """
-    监督反馈结构化输出模型
+    单张照片的结构化输出模型（输出格式说明中不包含连拍字段）
     
     Attributes:
         status: 当前状态 (focused/distracted/away)
@@ -34,78 +40,22 @@ class SupervisorResponse(BaseModel):
     )
 
 
-# 场景配置
-SCENE_PROMPTS = {
-    "reading": {
-        "name": "专心读书",
-        "focused_desc": "正在认真看书、阅读学习资料、做笔记，画面中能看到书籍或学习材料",
-        "distracted_desc": "玩手机、刷视频、做与阅读无关的事情、发呆、趴着、画面中看不到书籍、只有头像没有学习场景",
-        "normal_msg_examples": ["很好，继续保持", "专注阅读的样子真棒", "读得很认真", "书读得很投入"],
-        "distracted_msg_examples": ["该收心看书啦", "手机放一边吧", "注意力回到书本上"],
-        "away_msg_examples": ["休息够了吗，该回来读书了", "别走太久哦", "该回来学习了"],
-        "encourage_msg_prefix": "太棒了！已经认真读书",
-        "rest_msg_prefix": "读了这么久，该休息一下眼睛了"
-    },
-    "homework": {
-        "name": "专心写作业",
-        "focused_desc": "正在认真写字、做题、思考作业问题，画面中能看到作业本、笔或学习用品",
-        "distracted_desc": "玩手机、玩玩具、刷视频、发呆、做与作业无关的事情、趴着、画面中看不到作业本和笔、只有头像没有学习场景",
-        "posture_check": True,
-        "posture_msg_examples": ["坐姿要端正哦", "注意坐姿，保护脊椎", "背挺直，对身体好"],
-        "normal_msg_examples": ["写得不错，继续", "专注做题的样子真棒", "很认真在写", "作业做得很用心"],
-        "distracted_msg_examples": ["该认真写作业了", "别分心啦", "专心做题吧"],
-        "away_msg_examples": ["休息好了该写作业了", "作业还没做完呢", "该回来继续做题了"],
-        "encourage_msg_prefix": "太棒了！已经专心做作业",
-        "rest_msg_prefix": "写了这么久，休息一下手吧"
-    },
-    "eating": {
-        "name": "专心吃饭",
-        "focused_desc": "正在认真吃饭、咀嚼食物、享受美食，画面中能看到食物或餐具",
-        "distracted_desc": "边吃边玩手机、边吃边看视频、注意力不在食物上、发呆、趴着、画面中看不到食物、只有头像没有用餐场景",
-        "normal_msg_examples": ["好好享受美食", "专心吃饭真好", "细嚼慢咽", "用餐很认真"],
-        "distracted_msg_examples": ["专心吃饭吧", "手机放下，好好吃饭", "边吃边玩对肠胃不好哦"],
-        "away_msg_examples": ["饭菜要凉了", "该回来吃饭了", "食物还在等你呢"],
-        "encourage_msg_prefix": "太棒了！已经专心用餐",
-        "rest_msg_prefix": "吃得差不多了吧，可以休息一下"
-    },
-    "fitness": {
-        "name": "专心健身",
-        "focused_desc": "动作标准规范、姿势正确、有节奏地锻炼，画面中能看到运动动作或器械",
-        "distracted_desc": "动作不标准、频繁停顿、玩手机、不认真锻炼、发呆、趴着、坐着不动、画面中看不到运动动作、只有头像没有健身场景",
-        "normal_msg_examples": ["动作很标准", "坚持就是胜利", "锻炼状态不错", "姿势很到位"],
-        "distracted_msg_examples": ["认真锻炼别偷懒", "动作要标准哦", "专心健身效果才好"],
-        "away_msg_examples": ["休息够了该继续练了", "别偷懒太久哦", "该回来继续锻炼了"],
-        "encourage_msg_prefix": "太棒了！已经坚持锻炼",
-        "rest_msg_prefix": "练了这么久，该休息补充水分了"
-    },
-    "computer": {
-        "name": "电脑办公",
-        "focused_desc": "正在认真使用电脑工作、编程、写文档、处理事务，画面中能看到电脑或显示器",
-        "distracted_desc": "玩游戏、刷网页、玩手机、看视频、做与工作无关的事情、发呆、趴着、画面中看不到电脑屏幕、只有头像没有办公场景",
-        "posture_check": True,
-        "posture_msg_examples": ["坐姿要端正哦", "注意坐姿，避免颈椎问题", "腰背挺直，对身体好"],
-        "normal_msg_examples": ["工作很专注", "效率不错", "继续保持", "办公状态很好"],
-        "distracted_msg_examples": ["该专心工作了", "别摸鱼啦", "工作时间要认真哦"],
-        "away_msg_examples": ["休息好了该工作了", "工作还没完成呢", "该回来继续办公了"],
-        "encourage_msg_prefix": "太棒了！已经专注工作",
-        "rest_msg_prefix": "工作这么久，该休息一下眼睛和活动身体了"
-    },
-    "tablet": {
-        "name": "平板办公",
-        "focused_desc": "正在认真使用平板工作、学习、记笔记、处理事务，画面中能看到平板设备",
-        "distracted_desc": "玩游戏、刷视频、浏览娱乐内容、做与工作无关的事情、趴着、发呆、画面中看不到平板、只有头像没有学习/工作场景",
-        "normal_msg_examples": ["用平板很专注", "工作状态不错", "继续保持", "学习很认真"],
-        "distracted_msg_examples": ["该认真用平板工作了", "别刷娱乐内容啦", "专心学习吧"],
-        "away_msg_examples": ["该回来继续学习了", "平板还开着呢", "休息够了该工作了"],
-        "encourage_msg_prefix": "太棒了！已经专注使用平板",
-        "rest_msg_prefix": "用平板这么久，该休息一下眼睛了"
-    }
-}
+class SupervisorResponse(FrameResponse):
+    """
+    监督反馈结构化输出模型（解析单张和连拍的结果）
+    
+    Attributes:
+        frameStatuses: 连拍多帧时每一帧的状态（单张照片时为空列表）
+    """
+    frameStatuses: List[str] = Field(
+        default_factory=list,
+        description="按时间顺序给出每张连拍照片的状态"
+    )
 
 
 def get_system_prompt(scene: str = "reading") -> str:
     """
-    根据场景获取对应的 System Prompt
+    根据场景获取对应的 System Prompt（加载场景时已预渲染）
     
     Args:
         scene: 场景类型 (reading/homework/eating/fitness/computer/tablet)
@@ -113,22 +63,33 @@ def get_system_prompt(scene: str = "reading") -> str:
     Returns:
         str: 对应场景的 System Prompt
     """
-    scene_config = SCENE_PROMPTS.get(scene, SCENE_PROMPTS["reading"])
+    return get_scene(scene).system_prompt
+
+
+def render_system_prompt(scene_config: "SceneConfig") -> str:
+    """
+    渲染场景的 System Prompt
     
+    Args:
+        scene_config: 场景配置
+        
+    Returns:
+        str: System Prompt
+    """
     # 格式化所有示例消息
-    normal_examples = "、".join([f'"{msg}"' for msg in scene_config['normal_msg_examples']])
-    distracted_examples = "、".join([f'"{msg}"' for msg in scene_config['distracted_msg_examples']])
-    away_examples = "、".join([f'"{msg}"' for msg in scene_config['away_msg_examples']])
+    normal_examples = "、".join([f'"{msg}"' for msg in scene_config.normal_msg_examples])
+    distracted_examples = "、".join([f'"{msg}"' for msg in scene_config.distracted_msg_examples])
+    away_examples = "、".join([f'"{msg}"' for msg in scene_config.away_msg_examples])
     
     # 是否需要坐姿检查
-    posture_check = scene_config.get('posture_check', False)
+    posture_check = scene_config.posture_check
     posture_section = ""
     posture_roles = ""
     if posture_check:
-        posture_examples = "、".join([f'"{msg}"' for msg in scene_config.get('posture_msg_examples', [])])
+        posture_examples = "、".join([f'"{msg}"' for msg in scene_config.posture_msg_examples])
         posture_section = f"""
             **坐姿检查（重要）**：
-            即使用户在专注{scene_config['name']}，也要注意观察坐姿：
+            即使用户在专注{scene_config.name}，也要注意观察坐姿：
             - 如果坐姿不规范（弯腰驼背、趴着、歪斜等），需要给予坐姿提醒
             - 坐姿提醒时：status="focused"（因为确实在专注），shouldSpeak=true（语音提醒坐姿）
             - message示例：{posture_examples}
@@ -137,10 +98,10 @@ def get_system_prompt(scene: str = "reading") -> str:
                 6. **专注但坐姿不规范时**：语音播放坐姿提醒 (shouldSpeak=true)
                 - status 设置为 "focused"（因为确实在专注）
                 - shouldSpeak 设置为 true（语音提醒坐姿）
-                - message: 坐姿提醒，如{scene_config.get('posture_msg_examples', ['注意坐姿'])[0] if posture_check else '注意坐姿'}
+                - message: 坐姿提醒，如{scene_config.posture_msg_examples[0]}
             '''
     
-    return f"""你是 FocusEye，一个友善但严格的监督助手。你的任务是通过摄像头画面判断用户的{scene_config['name']}状态。
+    return f"""你是 FocusEye，一个友善但严格的监督助手。你的任务是通过摄像头画面判断用户的{scene_config.name}状态。
 
         ## 判断规则
 
@@ -151,13 +112,13 @@ def get_system_prompt(scene: str = "reading") -> str:
         - 只有同时满足"人在专注"+"场景物品可见"才能判定为 focused
 
         **focused（专注）**：
-        - {scene_config['focused_desc']}
+        - {scene_config.focused_desc}
         - 姿势端正，注意力集中
         - **关键：画面中必须清晰可见相关物品（书籍/作业/食物/设备等）**
 
         {posture_section}
         **distracted（分心）**：
-        - {scene_config['distracted_desc']}
+        - {scene_config.distracted_desc}
         - 东张西望、趴着、发呆
         - 做与当前任务无关的事情
         - **画面中只有头像，看不到学习/工作物品**
@@ -175,7 +136,7 @@ def get_system_prompt(scene: str = "reading") -> str:
 
         2. **连续专注达到里程碑时**：语音播放鼓励 (shouldSpeak=true)
         - 当 continuousFocusMinutes >= encouragementInterval 时触发
-        - message: 热情鼓励，如"{scene_config['encourage_msg_prefix']}XX分钟了，继续加油！"
+        - message: 热情鼓励，如"{scene_config.encourage_msg_prefix}XX分钟了，继续加油！"
 
         3. **分心时**：语音播放提醒 (shouldSpeak=true)
         - message: 友善提醒，如{distracted_examples}
@@ -185,7 +146,7 @@ def get_system_prompt(scene: str = "reading") -> str:
 
         5. **累计专注需要休息时**：语音播放休息提醒 (shouldSpeak=true)
         - 当 incrementalRestMinutes >= restReminderInterval 时触发（优先级最高）
-        - message: 温馨提醒，如"{scene_config['rest_msg_prefix']}，站起来活动/休息5分钟吧！"
+        - message: 温馨提醒，如"{scene_config.rest_msg_prefix}，站起来活动/休息5分钟吧！"
        
          {posture_roles}
 
@@ -199,21 +160,65 @@ def get_system_prompt(scene: str = "reading") -> str:
         """
 
 
-def create_user_message(image_base64: str, stats: dict = None) -> List[Dict[str, Any]]:
+def create_burst_instruction(frame_count: int, layout: str = "frames", interval: Any = None) -> str:
+    """
+    连拍多帧的说明文字
+    
+    Args:
+        frame_count: 帧数
+        layout: frames（逐张发送）或 grid（拼成一张网格图）
+        interval: 相邻两帧的间隔（秒，来自客户端统计信息，无法解析时忽略）
+        
+    Returns:
+        str: 说明文字
+    """
+    try:
+        interval = float(interval) if interval is not None else None
+    except (TypeError, ValueError):
+        interval = None
+    interval_text = f"，相邻两张间隔约 {interval:g} 秒" if interval and 0 < interval < float("inf") else ""
+    if layout == "grid":
+        source = f"下面的图片是按时间顺序拍摄的 {frame_count} 张照片拼成的网格（从左到右、从上到下{interval_text}），最后一格为当前画面"
+    else:
+        source = f"下面的 {frame_count} 张照片按时间顺序拍摄{interval_text}，最后一张为当前画面"
+    return f"""
+
+            ## 连拍照片
+            {source}。
+            - status、message、shouldSpeak 以当前画面为准，结合前面的照片判断是持续分心还是短暂动作
+            - frameStatuses 按时间顺序给出每张照片的状态（共 {frame_count} 个）
+            """
+
+
+def create_user_message(
+    image_base64: Union[str, List[str]],
+    stats: dict = None,
+    layout: str = "frames",
+    frame_count: Optional[int] = None
+) -> List[Dict[str, Any]]:
     """
     创建用户消息，包含图片和统计信息
     
     Args:
-        image_base64: Base64 编码的图片（包含 data:image/...;base64, 前缀）
+        image_base64: Base64 编码的图片（包含 data:image/...;base64, 前缀），连拍时为按时间顺序的列表
         stats: 监督统计信息 (checkCount, runningTime, focusTime, currentTime, continuousFocusMinutes, scene)
+        layout: 连拍布局，frames（逐张发送）或 grid（已拼成一张网格图）
+        frame_count: 连拍帧数（grid 布局时图片只有一张，需要单独传入）
         
     Returns:
         List[Dict]: LangChain 格式的消息内容
     """
     content_parts = []
+    images = [image_base64] if isinstance(image_base64, str) else list(image_base64)
+    frame_count = frame_count or len(images)
     
     # 构建文本指令（包含统计信息）
-    text_instruction = "请分析这张照片，判断用户的状态并给出反馈。"
+    if frame_count > 1:
+        text_instruction = "请分析这组连拍照片，判断用户的状态并给出反馈。"
+        interval = stats.get('frameIntervalSeconds') if stats else None
+        text_instruction += create_burst_instruction(frame_count, layout, interval)
+    else:
+        text_instruction = "请分析这张照片，判断用户的状态并给出反馈。"
     
     if stats:
         incremental_focus = stats.get('incrementalFocusMinutes', 0)
@@ -259,12 +264,13 @@ def create_user_message(image_base64: str, stats: dict = None) -> List[Dict[str,
         "text": text_instruction
     })
     
-    # 添加图片
-    content_parts.append({
-        "type": "image_url",
-        "image_url": {
-            "url": image_base64  # 直接使用 data URI
-        }
-    })
+    # 添加图片（按时间顺序）
+    for image in images:
+        content_parts.append({
+            "type": "image_url",
+            "image_url": {
+                "url": image  # 直接使用 data URI
+            }
+        })
     
     return content_parts
@@ -0,0 +1,345 @@
+"""
+场景注册表
+从数据文件（backend/Agent/scenes/*.json，安装 PyYAML 时也支持 *.yaml / *.yml）加载监督场景，
+校验为不可变的 SceneConfig，并预渲染 System Prompt
+
+新增或修改场景只需编辑数据文件：reload() 校验全部文件后整体替换场景表，
+进行中的请求继续使用替换前取到的 SceneConfig；任一文件无效时保留原场景表
+"""
+import json
+import logging
+import threading
+from collections.abc import Mapping as MappingABC
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Set, Tuple
+
+from backend.config import settings, on_reload, on_reload_trigger
+
+logger = logging.getLogger(__name__)
+
+# 内置场景目录
+BUILTIN_SCENES_DIR = Path(__file__).parent / "scenes"
+
+# 未知场景时使用的默认场景
+DEFAULT_SCENE = "reading"
+
+_REQUIRED_TEXT = ("name", "focused_desc", "distracted_desc", "encourage_msg_prefix", "rest_msg_prefix")
+_REQUIRED_EXAMPLES = ("normal_msg_examples", "distracted_msg_examples", "away_msg_examples")
+
+
+@dataclass(frozen=True)
+class SceneConfig:
+    """
+    监督场景配置（不可变）
+
+    Attributes:
+        key: 场景标识（reading/homework/...）
+        version: 数据文件版本
+        name: 场景名称
+        focused_desc / distracted_desc: 专注 / 分心的判断描述
+        normal_msg_examples / distracted_msg_examples / away_msg_examples: 反馈示例
+        encourage_msg_prefix / rest_msg_prefix: 鼓励 / 休息提醒的开头
+        posture_check: 是否检查坐姿
+        posture_msg_examples: 坐姿提醒示例
+        order: 排序（前端展示顺序）
+        system_prompt: 预渲染的 System Prompt
+    """
+    key: str
+    version: str
+    name: str
+    focused_desc: str
+    distracted_desc: str
+    normal_msg_examples: Tuple[str, ...]
+    distracted_msg_examples: Tuple[str, ...]
+    away_msg_examples: Tuple[str, ...]
+    encourage_msg_prefix: str
+    rest_msg_prefix: str
+    posture_check: bool = False
+    posture_msg_examples: Tuple[str, ...] = ()
+    order: int = 0
+    system_prompt: str = field(default="", repr=False, compare=False)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """转换为原 SCENE_PROMPTS 中的字典格式"""
+        data: Dict[str, Any] = {
+            "name": self.name,
+            "focused_desc": self.focused_desc,
+            "distracted_desc": self.distracted_desc,
+            "normal_msg_examples": list(self.normal_msg_examples),
+            "distracted_msg_examples": list(self.distracted_msg_examples),
+            "away_msg_examples": list(self.away_msg_examples),
+            "encourage_msg_prefix": self.encourage_msg_prefix,
+            "rest_msg_prefix": self.rest_msg_prefix,
+        }
+        if self.posture_check:
+            data["posture_check"] = True
+            data["posture_msg_examples"] = list(self.posture_msg_examples)
+        return data
+
+
+def parse_scene(data: Mapping[str, Any], default_key: str) -> SceneConfig:
+    """
+    校验场景数据并渲染 System Prompt
+
+    Args:
+        data: 数据文件内容
+        default_key: 文件中没有 key 字段时使用的场景标识（文件名）
+
+    Returns:
+        SceneConfig: 场景配置
+
+    Raises:
+        ValueError: 数据无效
+    """
+    from backend.Agent.prompts import render_system_prompt
+
+    if not isinstance(data, Mapping):
+        raise ValueError("场景配置必须是对象")
+
+    key = data.get("key", default_key)
+    if not isinstance(key, str) or not key:
+        raise ValueError("key 必须是非空字符串")
+    if "version" not in data:
+        raise ValueError("缺少 version 字段")
+
+    for name in _REQUIRED_TEXT:
+        if not isinstance(data.get(name), str) or not data[name]:
+            raise ValueError(f"{name} 必须是非空字符串")
+
+    examples: Dict[str, Tuple[str, ...]] = {}
+    for name in _REQUIRED_EXAMPLES + ("posture_msg_examples",):
+        value = data.get(name, [])
+        if not isinstance(value, list) or not all(isinstance(item, str) and item for item in value):
+            raise ValueError(f"{name} 必须是非空字符串列表")
+        if not value and name in _REQUIRED_EXAMPLES:
+            raise ValueError(f"{name} 不能为空")
+        examples[name] = tuple(value)
+
+    posture_check = data.get("posture_check", False)
+    if not isinstance(posture_check, bool):
+        raise ValueError("posture_check 必须是布尔值")
+    if posture_check and not examples["posture_msg_examples"]:
+        raise ValueError("开启 posture_check 时 posture_msg_examples 不能为空")
+
+    order = data.get("order", 0)
+    if not isinstance(order, int) or isinstance(order, bool):
+        raise ValueError("order 必须是整数")
+
+    scene = SceneConfig(
+        key=key,
+        version=str(data["version"]),
+        name=data["name"],
+        focused_desc=data["focused_desc"],
+        distracted_desc=data["distracted_desc"],
+        encourage_msg_prefix=data["encourage_msg_prefix"],
+        rest_msg_prefix=data["rest_msg_prefix"],
+        posture_check=posture_check,
+        order=order,
+        **examples,
+    )
+    object.__setattr__(scene, "system_prompt", render_system_prompt(scene))
+    return scene
+
+
+def _read_scene_file(path: Path) -> Any:
+    """读取单个场景文件"""
+    with open(path, encoding="utf-8") as f:
+        if path.suffix == ".json":
+            return json.load(f)
+        import yaml
+        return yaml.safe_load(f)
+
+
+def _scene_files(directory: Path) -> List[Path]:
+    """列出目录中的场景文件（未安装 PyYAML 时跳过 YAML 文件）"""
+    files = sorted(directory.glob("*.json"))
+    yaml_files = sorted(list(directory.glob("*.yaml")) + list(directory.glob("*.yml")))
+    if yaml_files:
+        try:
+            import yaml  # noqa: F401
+            files.extend(yaml_files)
+        except ImportError:
+            logger.warning("未安装 PyYAML，跳过 YAML 场景文件: %s", ", ".join(path.name for path in yaml_files))
+    return files
+
+
+def load_scenes(directory: Path) -> Dict[str, SceneConfig]:
+    """
+    加载并校验目录中的全部场景
+
+    Args:
+        directory: 场景目录
+
+    Returns:
+        Dict: 场景标识 -> SceneConfig（按 order 排序）
+
+    Raises:
+        ValueError: 任一文件无效、场景重复或缺少默认场景
+    """
+    scenes: Dict[str, SceneConfig] = {}
+    for path in _scene_files(directory):
+        try:
+            scene = parse_scene(_read_scene_file(path), path.stem)
+        except (ValueError, OSError) as e:
+            raise ValueError(f"场景文件 {path.name} 无效: {e}") from e
+        if scene.key in scenes:
+            raise ValueError(f"场景 {scene.key} 重复定义（{path.name}）")
+        scenes[scene.key] = scene
+
+    if DEFAULT_SCENE not in scenes:
+        raise ValueError(f"场景目录 {directory} 缺少默认场景 {DEFAULT_SCENE}")
+
+    return dict(sorted(scenes.items(), key=lambda item: (item[1].order, item[0])))
+
+
+class SceneRegistry:
+    """
+    场景注册表
+
+    场景表为只读映射，重新加载时整体替换；读取方取到的 SceneConfig 不会被修改
+    """
+
+    def __init__(self, directory: Optional[Path] = None):
+        self._directory = directory
+        self._scenes: Mapping[str, SceneConfig] = MappingProxyType({})
+        self._signature: Tuple[Tuple[str, float, int], ...] = ()
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[Set[str]], None]] = []
+        self._loaded = False
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    @property
+    def directory(self) -> Path:
+        if self._directory is not None:
+            return self._directory
+        return Path(settings.SCENES_DIR) if settings.SCENES_DIR else BUILTIN_SCENES_DIR
+
+    def _file_signature(self) -> Tuple[Tuple[str, float, int], ...]:
+        signature = []
+        for path in _scene_files(self.directory):
+            stat = path.stat()
+            signature.append((path.name, stat.st_mtime, stat.st_size))
+        return tuple(signature)
+
+    def _ensure_loaded(self) -> Mapping[str, SceneConfig]:
+        if not self._loaded:
+            self.reload(force=True, strict=True)
+        return self._scenes
+
+    def scenes(self) -> Mapping[str, SceneConfig]:
+        """当前场景表（只读）"""
+        return self._ensure_loaded()
+
+    def get(self, scene: Optional[str]) -> SceneConfig:
+        """
+        获取场景配置，未知场景返回默认场景
+
+        Args:
+            scene: 场景标识
+
+        Returns:
+            SceneConfig: 场景配置
+        """
+        scenes = self._ensure_loaded()
+        return scenes.get(scene) or scenes[DEFAULT_SCENE]
+
+    def on_change(self, listener: Callable[[Set[str]], None]) -> Callable[[Set[str]], None]:
+        """
+        注册场景变更回调（用于按场景清理缓存）
+
+        Args:
+            listener: 回调函数，参数为新增、修改或删除的场景标识
+
+        Returns:
+            Callable: 原函数（可用作装饰器）
+        """
+        self._listeners.append(listener)
+        return listener
+
+    def reload(self, force: bool = False, strict: bool = False) -> Set[str]:
+        """
+        重新加载场景文件
+
+        Args:
+            force: 文件未变化时也重新加载
+            strict: 加载失败时抛出异常（默认记录错误并保留原场景表）
+
+        Returns:
+            Set[str]: 发生变化的场景标识
+        """
+        with self._lock:
+            try:
+                signature = self._file_signature()
+                if not force and self._loaded and signature == self._signature:
+                    return set()
+                new = load_scenes(self.directory)
+            except (ValueError, OSError) as e:
+                if strict and not self._loaded:
+                    raise
+                logger.error("加载场景配置失败，继续使用原配置: %s", e)
+                return set()
+
+            old = self._scenes
+            changed = {key for key in set(old) | set(new) if old.get(key) != new.get(key)}
+            self._scenes = MappingProxyType(new)
+            self._signature = signature
+            was_loaded, self._loaded = self._loaded, True
+
+        if was_loaded and changed:
+            logger.info("场景配置已重新加载，变更场景: %s", ", ".join(sorted(changed)))
+            for listener in list(self._listeners):
+                try:
+                    listener(changed)
+                except Exception as e:
+                    logger.error("场景变更回调失败: %s", e, exc_info=True)
+        return changed
+
+
+# 全局场景注册表
+scene_registry = SceneRegistry()
+
+
+def get_scene(scene: Optional[str]) -> SceneConfig:
+    """便捷函数：获取场景配置（未知场景返回默认场景）"""
+    return scene_registry.get(scene)
+
+
+def reload_scenes(force: bool = True) -> Set[str]:
+    """便捷函数：重新加载场景文件，返回发生变化的场景"""
+    return scene_registry.reload(force=force)
+
+
+@on_reload_trigger
+def _reload_on_trigger(force: bool) -> None:
+    """SIGHUP / 文件检查时重新加载场景（未加载过时不处理，保持按需加载）"""
+    if scene_registry.loaded:
+        scene_registry.reload(force=force)
+
+
+@on_reload
+def _reload_on_settings_change(old, new) -> None:
+    """SCENES_DIR 变更后从新目录加载"""
+    if old.SCENES_DIR != new.SCENES_DIR and scene_registry.loaded:
+        scene_registry.reload(force=True)
+
+
+class _SceneDictView(MappingABC):
+    """原 SCENE_PROMPTS 字典的只读视图（始终反映当前场景表）"""
+
+    def __getitem__(self, key: str) -> Dict[str, Any]:
+        return scene_registry.scenes()[key].as_dict()
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(scene_registry.scenes())
+
+    def __len__(self) -> int:
+        return len(scene_registry.scenes())
+
+
+# 原 SCENE_PROMPTS 字典接口（prompts 模块中同名导出）：只读视图，始终反映当前场景表
+SCENE_PROMPTS: Mapping[str, Dict[str, Any]] = _SceneDictView()
@@ -0,0 +1,357 @@
+"""
+模型调用优先级调度
+模型调用并发达到上限时，排队的请求按截止时间（到达时间 + 所属优先级的时间预算）依次放行：
+
+- transition: 上一次检查为分心 / 离开，或会话的第一次检查（用户在等待反馈）
+- milestone: 即将触发鼓励或休息提醒（会语音播报）
+- steady: 持续专注中的例行检查
+
+时间预算越短越先放行；例行检查等待超过预算差后截止时间会早于新到达的高优先级请求，
+因此不会被无限期推迟（防饥饿）
+
+同一会话（X-Session-ID）的新请求到达时，该会话仍在排队的旧请求直接退出（抛出 Superseded），
+已经开始的模型调用照常完成。入口在准入控制排队之前登记会话（track_session），
+因此在准入队列中等待的旧请求也会被取代
+"""
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from backend.config import get_settings, on_reload
+from backend.utils.metrics import MODEL_QUEUE_WAIT, MODEL_QUEUE_DEPTH
+
+# 客户端会话标识请求头
+SESSION_HEADER = "X-Session-ID"
+
+PRIORITY_TRANSITION = "transition"
+PRIORITY_MILESTONE = "milestone"
+PRIORITY_STEADY = "steady"
+
+# 各优先级的时间预算（秒）
+DEFAULT_DEADLINES: Dict[str, float] = {
+    PRIORITY_TRANSITION: 1.0,
+    PRIORITY_MILESTONE: 3.0,
+    PRIORITY_STEADY: 15.0,
+}
+
+
+def classify_request(stats: Optional[Dict[str, Any]]) -> str:
+    """
+    根据监督统计信息判断请求优先级
+
+    Args:
+        stats: 监督统计信息（lastStatus 为前端记录的上一次状态）
+
+    Returns:
+        str: transition / milestone / steady
+    """
+    if not stats:
+        return PRIORITY_TRANSITION
+
+    try:
+        if stats.get("lastStatus") in ("distracted", "away", "error") or int(stats.get("checkCount") or 0) <= 1:
+            return PRIORITY_TRANSITION
+
+        reached_rest = stats.get("incrementalRestMinutes", 0) >= stats.get("restReminderInterval", 3)
+        reached_encouragement = (
+            stats.get("incrementalFocusMinutes", 0) >= stats.get("encouragementInterval", 20)
+            and not stats.get("suppressEncouragement", False)
+        )
+    except (TypeError, ValueError):
+        return PRIORITY_STEADY
+
+    return PRIORITY_MILESTONE if reached_rest or reached_encouragement else PRIORITY_STEADY
+
+
+class Superseded(Exception):
+    """同一会话已有更新的请求，本次分析不再进行"""
+
+
+def superseded_result() -> Dict[str, Any]:
+    """被同一会话的新请求取代时的响应体（HTTP 409）"""
+    return {
+        "success": False,
+        "status": "superseded",
+        "message": "已有更新的检查请求",
+        "confidence": 0.0,
+        "superseded": True
+    }
+
+
+class _Waiter:
+    __slots__ = ("event", "granted", "cancelled")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.granted = False
+        self.cancelled = False
+
+
+class SessionToken:
+    """
+    会话内一次分析请求的序号
+
+    Attributes:
+        session: 会话标识
+        seq: 会话内的请求序号
+    """
+
+    __slots__ = ("session", "seq", "_sequencer", "_on_superseded")
+
+    def __init__(self, session: str, seq: int, sequencer: "SessionSequencer"):
+        self.session = session
+        self.seq = seq
+        self._sequencer = sequencer
+        self._on_superseded: Optional[Callable[[], None]] = None
+
+    @property
+    def superseded(self) -> bool:
+        """是否已有同一会话的更新请求"""
+        return self._sequencer.latest(self.session) > self.seq
+
+    @contextmanager
+    def watch(self, callback: Callable[[], None]) -> Iterator[None]:
+        """
+        排队等待期间登记唤醒函数：被同一会话的新请求取代时调用
+
+        登记之后等待方仍需检查 superseded（取代可能发生在登记之前）
+
+        Args:
+            callback: 唤醒等待方的无参数函数
+        """
+        self._on_superseded = callback
+        try:
+            yield
+        finally:
+            self._on_superseded = None
+
+    def _cancel(self) -> None:
+        callback = self._on_superseded
+        if callback is not None:
+            callback()
+
+
+class SessionSequencer:
+    """按会话记录最新的请求序号（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seq = itertools.count(1)
+        self._tokens: Dict[str, SessionToken] = {}
+
+    def latest(self, session: str) -> int:
+        token = self._tokens.get(session)
+        return token.seq if token is not None else 0
+
+    def begin(self, session: str) -> SessionToken:
+        """
+        登记会话的新请求，同一会话仍在排队的旧请求立即退出
+
+        Args:
+            session: 会话标识
+
+        Returns:
+            SessionToken: 新请求的序号
+        """
+        with self._lock:
+            token = SessionToken(session, next(self._seq), self)
+            previous, self._tokens[session] = self._tokens.get(session), token
+        if previous is not None:
+            previous._cancel()
+        return token
+
+    def end(self, token: SessionToken) -> None:
+        """请求结束（仍是会话最新请求时移除记录）"""
+        with self._lock:
+            if self._tokens.get(token.session) is token:
+                del self._tokens[token.session]
+
+
+_sequencer = SessionSequencer()
+_current_token: ContextVar[Optional[SessionToken]] = ContextVar("session_token", default=None)
+
+
+@contextmanager
+def track_session(session: Optional[str]) -> Iterator[Optional[SessionToken]]:
+    """
+    在当前上下文中登记会话请求，其中的模型调用排队时可被同一会话的新请求取代
+
+    当前上下文已登记同一会话时沿用原序号（入口登记后，分析流程中再次调用不会取代自己）
+
+    用法:
+        with track_session(session_id):
+            analyze_focus(...)  # 被取代时抛出 Superseded
+
+    Args:
+        session: 会话标识（为空时不做会话排序）
+
+    Yields:
+        Optional[SessionToken]: 本次请求的序号
+    """
+    if not session:
+        yield None
+        return
+    current = _current_token.get()
+    if current is not None and current.session == session:
+        # 入口已在准入控制之前登记了本次请求
+        yield current
+        return
+
+    token = _sequencer.begin(session)
+    reset = _current_token.set(token)
+    try:
+        yield token
+    finally:
+        _current_token.reset(reset)
+        _sequencer.end(token)
+
+
+def current_session_token() -> Optional[SessionToken]:
+    """当前上下文中登记的会话请求"""
+    return _current_token.get()
+
+
+class PriorityGate:
+    """
+    按优先级放行的并发闸门（线程安全）
+
+    Args:
+        max_concurrency: 同时进行的模型调用上限（0 表示不限制）
+        timeout: 排队最长等待时间（秒），超时抛出 TimeoutError
+        deadlines: 各优先级的时间预算（秒）
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 6,
+        timeout: float = 30.0,
+        deadlines: Optional[Dict[str, float]] = None
+    ):
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.deadlines = dict(deadlines or DEFAULT_DEADLINES)
+        self._lock = threading.Lock()
+        self._active = 0
+        self._heap: List[Tuple[float, int, _Waiter]] = []
+        self._seq = itertools.count()
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @property
+    def pending(self) -> int:
+        return len(self._heap)
+
+    def _acquire(self, priority: str, token: Optional[SessionToken] = None) -> None:
+        with self._lock:
+            if self._active < self.max_concurrency and not self._heap:
+                self._active += 1
+                return
+            waiter = _Waiter()
+            deadline = time.monotonic() + self.deadlines.get(priority, self.deadlines[PRIORITY_STEADY])
+            entry = (deadline, next(self._seq), waiter)
+            heapq.heappush(self._heap, entry)
+            MODEL_QUEUE_DEPTH.set(self.pending)
+
+        if token is None:
+            waiter.event.wait(self.timeout)
+        else:
+            with token.watch(lambda: self._cancel(waiter)):
+                if token.superseded:
+                    self._cancel(waiter)
+                waiter.event.wait(self.timeout)
+        with self._lock:
+            if waiter.granted:
+                return
+            self._heap.remove(entry)
+            heapq.heapify(self._heap)
+            MODEL_QUEUE_DEPTH.set(self.pending)
+        if waiter.cancelled:
+            raise Superseded("同一会话已有更新的请求")
+        raise TimeoutError(f"模型调用排队超过 {self.timeout:.0f} 秒")
+
+    def _cancel(self, waiter: _Waiter) -> None:
+        """取消仍在排队的等待者（已获得名额时无效）"""
+        with self._lock:
+            if not waiter.granted:
+                waiter.cancelled = True
+                waiter.event.set()
+
+    def _release(self) -> None:
+        with self._lock:
+            if self._heap:
+                # 名额直接交给截止时间最早的等待者
+                _, _, waiter = heapq.heappop(self._heap)
+                waiter.granted = True
+                waiter.event.set()
+            else:
+                self._active -= 1
+            MODEL_QUEUE_DEPTH.set(self.pending)
+
+    @contextmanager
+    def slot(self, priority: str = PRIORITY_STEADY) -> Iterator[float]:
+        """
+        占用一个模型调用名额
+
+        用法:
+            with gate.slot("transition") as waited:
+                llm.invoke(...)
+
+        Args:
+            priority: 请求优先级
+
+        Yields:
+            float: 排队等待时间（秒）
+
+        Raises:
+            TimeoutError: 排队超时
+            Superseded: 排队期间同一会话有更新的请求（见 track_session）
+        """
+        token = current_session_token()
+        if token is not None and token.superseded:
+            raise Superseded("同一会话已有更新的请求")
+        if self.max_concurrency <= 0:
+            yield 0.0
+            return
+
+        started = time.perf_counter()
+        self._acquire(priority, token)
+        if token is not None and token.superseded:
+            # 获得名额时已被取代：让出名额，不再调用模型
+            self._release()
+            raise Superseded("同一会话已有更新的请求")
+        waited = time.perf_counter() - started
+        MODEL_QUEUE_WAIT.observe(waited, priority=priority)
+        try:
+            yield waited
+        finally:
+            self._release()
+
+
+_gate: Optional[PriorityGate] = None
+_gate_lock = threading.Lock()
+
+
+def get_model_gate() -> PriorityGate:
+    """获取全局模型调用闸门（按配置创建）"""
+    global _gate
+    if _gate is None:
+        with _gate_lock:
+            if _gate is None:
+                config = get_settings()
+                _gate = PriorityGate(config.MODEL_MAX_CONCURRENCY, config.MODEL_QUEUE_TIMEOUT)
+    return _gate
+
+
+@on_reload
+def _rebuild_on_reload(old, new) -> None:
+    """并发配置变更后创建新的闸门（进行中的调用仍在原闸门上释放）"""
+    global _gate
+    if (old.MODEL_MAX_CONCURRENCY, old.MODEL_QUEUE_TIMEOUT) != (new.MODEL_MAX_CONCURRENCY, new.MODEL_QUEUE_TIMEOUT):
+        with _gate_lock:
+            _gate = None
@@ -2,15 +2,29 @@
 Supervisor Agent 实现
 定义完整的监督 Chain：Prompt | LLM | Output Parser
 """
-from typing import Dict, Any, Optional
+import logging
+import threading
+import time
+from typing import Dict, Any, List, Optional, Set, Tuple, Union
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_core.output_parsers import PydanticOutputParser
 from backend.client import get_llm_client
+from backend.config import settings, get_settings, on_reload
+from backend.utils.metrics import STAGE_LATENCY, MODEL_TOKENS, FALLBACK_PARSES, CACHE_EVENTS, RESOLUTION_PASSES
+from backend.utils.tracing import start_span
+from backend.utils.circuit import CircuitOpen, get_model_circuit
 from backend.Agent.prompts import (
+    FrameResponse,
     SupervisorResponse,
-    get_system_prompt,
     create_user_message
 )
+from backend.Agent.scenes import SceneConfig, scene_registry, get_scene
+from backend.Agent.scheduler import Superseded, classify_request, get_model_gate
+
+logger = logging.getLogger(__name__)
+
+# 模型可能返回的状态（其他取值视为不确定）
+KNOWN_STATUSES = frozenset({"focused", "distracted", "away"})
 
 
 class SupervisorAgent:
@@ -20,18 +34,103 @@ class SupervisorAgent:
         """初始化 Agent"""
         self.llm = get_llm_client()
         self.output_parser = PydanticOutputParser(pydantic_object=SupervisorResponse)
+        # 单张照片的输出格式说明不包含 frameStatuses，避免每次请求多出无用的 Prompt 和输出 token
+        self._format_instructions = PydanticOutputParser(pydantic_object=FrameResponse).get_format_instructions()
+        self._burst_format_instructions = self.output_parser.get_format_instructions()
+        # (场景, 是否连拍) -> (场景配置, 完整 System Prompt（含输出格式说明）)
+        self._system_prompts: Dict[Tuple[str, bool], Tuple[SceneConfig, str]] = {}
+    
+    def get_rendered_system_prompt(self, scene: str, burst: bool = False) -> str:
+        """
+        获取渲染好的 System Prompt（按场景和是否连拍缓存，场景配置重新加载后自动失效）
+        
+        Args:
+            scene: 场景类型
+            burst: 是否为连拍多帧请求（输出格式说明中包含 frameStatuses）
+            
+        Returns:
+            str: 包含输出格式说明的 System Prompt
+        """
+        scene_config = get_scene(scene)
+        key = (scene_config.key, burst)
+        cached = self._system_prompts.get(key)
+        if cached is not None and cached[0] is scene_config:
+            CACHE_EVENTS.inc(cache="system_prompt", result="hit")
+            return cached[1]
+        
+        CACHE_EVENTS.inc(cache="system_prompt", result="miss")
+        instructions = self._burst_format_instructions if burst else self._format_instructions
+        prompt = f"{scene_config.system_prompt}\n\n{instructions}"
+        self._system_prompts[key] = (scene_config, prompt)
+        return prompt
+    
+    def invalidate_prompts(self, scenes: Set[str]) -> None:
+        """
+        清理指定场景的 System Prompt 缓存
+        
+        Args:
+            scenes: 场景标识
+        """
+        for scene in scenes:
+            self._system_prompts.pop((scene, False), None)
+            self._system_prompts.pop((scene, True), None)
+    
+    def warm_up(self, prime: bool = False) -> Dict[str, Any]:
+        """
+        预热：预渲染全部场景的 System Prompt，建立到模型服务的连接
+        
+        Args:
+            prime: 是否发送一次极小的文本请求（同时预热服务端）
+            
+        Returns:
+            Dict: 各步骤耗时（毫秒）和连接是否成功
+        """
+        report: Dict[str, Any] = {}
+        
+        started = time.perf_counter()
+        burst = get_settings().BURST_MAX_FRAMES > 1
+        for scene in scene_registry.scenes():
+            self.get_rendered_system_prompt(scene)
+            if burst:
+                self.get_rendered_system_prompt(scene, burst=True)
+        report["promptsMs"] = round((time.perf_counter() - started) * 1000, 1)
+        
+        started = time.perf_counter()
+        try:
+            if prime:
+                self.llm.invoke([HumanMessage(content="ping")], max_tokens=1)
+            else:
+                # 只建立 HTTP 连接（TLS 握手后连接留在连接池中）
+                self.llm.root_client.with_options(timeout=5, max_retries=0).models.list()
+            report["connected"] = True
+        except Exception as e:
+            logger.warning("预热连接模型服务失败: %s", e)
+            report["connected"] = False
+        report["connectMs"] = round((time.perf_counter() - started) * 1000, 1)
+        
+        return report
         
     def analyze(
         self, 
-        image_base64: str, 
-        stats: Optional[Dict[str, Any]] = None
+        image_base64: Union[str, List[str]], 
+        stats: Optional[Dict[str, Any]] = None,
+        layout: str = "frames",
+        frame_count: Optional[int] = None,
+        preview: Optional[List[str]] = None,
+        max_tokens: Optional[int] = None
     ) -> SupervisorResponse:
         """
         分析用户状态
         
+        提供预览图时先用预览图分析，结果不确定（见 needs_full_resolution）时再用原图重新分析
+        
         Args:
-            image_base64: Base64 编码的图片
+            image_base64: Base64 编码的图片，连拍时为按时间顺序的列表
             stats: 监督统计信息
+            layout: 连拍布局（frames / grid）
+            frame_count: 连拍帧数（grid 布局时需要传入）
+            preview: 与 image_base64 一一对应的低分辨率预览图
+            max_tokens: 输出 token 上限（默认使用客户端配置）
             
         Returns:
             SupervisorResponse: 结构化的分析结果
@@ -39,38 +138,174 @@ class SupervisorAgent:
         Raises:
             ValueError: 图片格式错误
             Exception: LLM 调用失败
+            Superseded: 排队期间同一会话有更新的请求
+            CircuitOpen: 模型服务熔断中，没有调用模型
         """
-        try:
-            # 构建消息
-            messages = self._build_messages(image_base64, stats)
-            
-            # 调用 LLM
-            response = self.llm.invoke(messages)
-            
-            # 解析输出
-            result = self._parse_response(response.content)
+        scene = stats.get('scene', 'reading') if stats else 'reading'
+        images = [image_base64] if isinstance(image_base64, str) else list(image_base64)
+        with start_span("supervisor.analyze", scene=scene, frames=frame_count or len(images)) as span:
+            try:
+                resolution = "full"
+                if preview:
+                    result = self._analyze_pass(preview, stats, layout, frame_count, "preview", max_tokens)
+                    if self.needs_full_resolution(result):
+                        RESOLUTION_PASSES.inc(result="escalated")
+                        logger.debug(
+                            "预览图结果不确定（%s, %.2f），使用原图重新分析",
+                            result.status, result.confidence,
+                            extra={"sample_rate": settings.LOG_SAMPLE_RATE}
+                        )
+                    else:
+                        RESOLUTION_PASSES.inc(result="preview")
+                        resolution = "preview"
+                if resolution == "full":
+                    result = self._analyze_pass(images, stats, layout, frame_count, "full", max_tokens)
+                
+                span.set_attributes({
+                    "result.status": result.status,
+                    "result.confidence": result.confidence,
+                    "result.resolution": resolution
+                })
+                return result
+                
+            except Superseded:
+                span.set_attribute("superseded", True)
+                raise
+            except CircuitOpen:
+                span.set_attribute("circuit_open", True)
+                raise
+            except Exception as e:
+                span.record_exception(e)
+                logger.error("Agent 分析失败: %s", e, exc_info=True)
+                # 返回默认错误响应
+                return SupervisorResponse(
+                    status="error",
+                    message=f"分析失败：{str(e)[:20]}",
+                    confidence=0.0
+                )
+    
+    def _analyze_pass(
+        self,
+        images: List[str],
+        stats: Optional[Dict[str, Any]],
+        layout: str,
+        frame_count: Optional[int],
+        resolution: str,
+        max_tokens: Optional[int] = None
+    ) -> SupervisorResponse:
+        """
+        用一组图片调用一次模型并解析结果
+        
+        Args:
+            images: Base64 图片列表
+            stats: 统计信息
+            layout: 连拍布局
+            frame_count: 连拍帧数
+            resolution: 图片分辨率（preview / full，用于追踪）
+            max_tokens: 输出 token 上限
             
-            return result
+        Returns:
+            SupervisorResponse: 解析后的结果
             
-        except Exception as e:
-            # 返回默认错误响应
-            return SupervisorResponse(
-                status="error",
-                message=f"分析失败：{str(e)[:20]}",
-                confidence=0.0
+        Raises:
+            CircuitOpen: 模型服务熔断中
+        """
+        # 构建消息
+        with start_span("supervisor.prompt_build", resolution=resolution) as build_span, \
+                STAGE_LATENCY.time(stage="prompt_build"):
+            messages = self._build_messages(images, stats, layout, frame_count)
+            prompt_chars = len(messages[0].content) + sum(
+                len(part.get("text", "")) for part in messages[1].content if isinstance(part, dict)
             )
+            build_span.set_attributes({
+                "prompt.chars": prompt_chars,
+                "image.base64_chars": sum(len(image) for image in images)
+            })
+        
+        # 调用 LLM（并发达到上限时按优先级排队）
+        priority = classify_request(stats)
+        with start_span(
+            "supervisor.model_call", model=settings.MODEL_NAME, priority=priority, resolution=resolution
+        ) as call_span, get_model_gate().slot(priority) as waited:
+            # 熔断中直接返回，不等待模型服务超时
+            circuit = get_model_circuit()
+            if not circuit.allow():
+                raise CircuitOpen("模型服务熔断中")
+            started = time.perf_counter()
+            try:
+                if max_tokens:
+                    response = self.llm.invoke(messages, max_tokens=max_tokens)
+                else:
+                    response = self.llm.invoke(messages)
+            except Exception:
+                circuit.record_failure()
+                raise
+            circuit.record_success()
+            elapsed = time.perf_counter() - started
+            STAGE_LATENCY.observe(elapsed, stage="model_call")
+            usage = self._record_usage(response)
+            call_span.set_attributes({
+                "queue.wait_ms": round(waited * 1000, 1),
+                "tokens.input": usage.get("input_tokens", 0),
+                "tokens.output": usage.get("output_tokens", 0),
+            })
+        logger.debug(
+            "模型调用完成（%s），耗时 %.0fms",
+            resolution, elapsed * 1000,
+            extra={"sample_rate": settings.LOG_SAMPLE_RATE}
+        )
+        
+        # 解析输出
+        with start_span("supervisor.parse"), STAGE_LATENCY.time(stage="parse"):
+            return self._parse_response(response.content)
+    
+    @staticmethod
+    def needs_full_resolution(result: SupervisorResponse) -> bool:
+        """
+        预览图的分析结果是否需要用原图复核
+        
+        置信度低于 PROGRESSIVE_MIN_CONFIDENCE、状态无法识别，或状态属于
+        PROGRESSIVE_VERIFY_STATUSES（如 distracted：物品在小图中看不清时容易误判）时需要复核
+        
+        Args:
+            result: 预览图的分析结果
+            
+        Returns:
+            bool: 是否需要复核
+        """
+        config = get_settings()
+        verify = {status.strip().lower() for status in config.PROGRESSIVE_VERIFY_STATUSES.split(",")}
+        return (
+            result.confidence < config.PROGRESSIVE_MIN_CONFIDENCE
+            or result.status not in KNOWN_STATUSES
+            or result.status in verify
+        )
+    
+    @staticmethod
+    def _record_usage(response: Any) -> Dict[str, int]:
+        """记录模型返回的 token 用量（服务端未返回时跳过）"""
+        usage = getattr(response, "usage_metadata", None) or {}
+        if usage.get("input_tokens"):
+            MODEL_TOKENS.inc(usage["input_tokens"], direction="input")
+        if usage.get("output_tokens"):
+            MODEL_TOKENS.inc(usage["output_tokens"], direction="output")
+        return usage
     
     def _build_messages(
         self, 
-        image_base64: str, 
-        stats: Optional[Dict[str, Any]]
+        image_base64: Union[str, List[str]], 
+        stats: Optional[Dict[str, Any]],
+        layout: str = "frames",
+        frame_count: Optional[int] = None
     ) -> list:
         """
         构建完整的消息链
         
         Args:
-            image_base64: 图片 Base64
+            image_base64: 图片 Base64（连拍时为列表）
             stats: 统计信息（包含 scene 字段）
+            layout: 连拍布局
+            frame_count: 连拍帧数
             
         Returns:
             list: 消息列表
@@ -78,12 +313,12 @@ class SupervisorAgent:
         # 获取场景
         scene = stats.get('scene', 'reading') if stats else 'reading'
         
-        # System Message（根据场景生成）
-        system_prompt = get_system_prompt(scene)
-        system_prompt += f"\n\n{self.output_parser.get_format_instructions()}"
+        # System Message（根据场景和是否连拍生成，已缓存）
+        images = [image_base64] if isinstance(image_base64, str) else image_base64
+        system_prompt = self.get_rendered_system_prompt(scene, (frame_count or len(images)) > 1)
         
         # User Message (包含图片和统计信息)
-        user_content = create_user_message(image_base64, stats)
+        user_content = create_user_message(image_base64, stats, layout, frame_count)
         
         messages = [
             SystemMessage(content=system_prompt),
@@ -107,7 +342,10 @@ class SupervisorAgent:
             return self.output_parser.parse(content)
         except Exception:
             # 如果解析失败，尝试手动提取
-            return self._fallback_parse(content)
+            logger.warning("结构化解析失败，使用降级解析: %.100s", content)
+            FALLBACK_PARSES.inc()
+            with start_span("supervisor.fallback_parse"), STAGE_LATENCY.time(stage="fallback_parse"):
+                return self._fallback_parse(content)
     
     def _fallback_parse(self, content: str) -> SupervisorResponse:
         """
@@ -138,6 +376,7 @@ class SupervisorAgent:
 
 # 单例实例
 _agent_instance: Optional[SupervisorAgent] = None
+_agent_lock = threading.Lock()
 
 
 def get_supervisor_agent() -> SupervisorAgent:
@@ -149,39 +388,89 @@ def get_supervisor_agent() -> SupervisorAgent:
     """
     global _agent_instance
     if _agent_instance is None:
-        _agent_instance = SupervisorAgent()
+        with _agent_lock:
+            if _agent_instance is None:
+                _agent_instance = SupervisorAgent()
     return _agent_instance
 
 
+@scene_registry.on_change
+def _invalidate_scene_prompts(scenes: Set[str]) -> None:
+    """场景配置变更后只清理对应场景的 Prompt 缓存"""
+    if _agent_instance is not None:
+        _agent_instance.invalidate_prompts(scenes)
+
+
+@on_reload
+def _reset_agent_on_reload(old, new) -> None:
+    """模型相关配置变更后，下次请求使用新客户端重新创建 Agent"""
+    global _agent_instance
+    if (old.API_KEY, old.API_BASE, old.MODEL_NAME, old.REQUEST_TIMEOUT) != \
+            (new.API_KEY, new.API_BASE, new.MODEL_NAME, new.REQUEST_TIMEOUT):
+        with _agent_lock:
+            _agent_instance = None
+
+
+def warm_up(prime: Optional[bool] = None) -> Dict[str, Any]:
+    """
+    预热 Agent（进程启动时或平台预热请求调用）
+    
+    创建 LLM 客户端和输出解析器、预渲染场景 Prompt、建立连接，
+    使新实例的第一次分析与后续请求耗时相同
+    
+    Args:
+        prime: 是否发送极小的预热请求（默认读取 WARMUP_PRIME 配置）
+        
+    Returns:
+        Dict: 预热报告（各步骤耗时）
+    """
+    if prime is None:
+        prime = settings.WARMUP_PRIME
+    
+    started = time.perf_counter()
+    agent = get_supervisor_agent()
+    report = {"agentMs": round((time.perf_counter() - started) * 1000, 1)}
+    report.update(agent.warm_up(prime=prime))
+    logger.info("Agent 预热完成: %s", report)
+    return report
+
+
 def analyze_focus(
-    image_base64: str, 
-    stats: Optional[Dict[str, Any]] = None
+    image_base64: Union[str, List[str]], 
+    stats: Optional[Dict[str, Any]] = None,
+    layout: str = "frames",
+    frame_count: Optional[int] = None,
+    preview: Optional[List[str]] = None,
+    max_tokens: Optional[int] = None
 ) -> Dict[str, Any]:
     """
     便捷函数：分析用户专注状态
     
     Args:
-        image_base64: 图片 Base64 字符串
+        image_base64: 图片 Base64 字符串，连拍时为按时间顺序的列表
         stats: 统计信息 (checkCount, runningTime, focusTime, currentTime, continuousFocusMinutes, encouragementInterval)
+        layout: 连拍布局，frames（逐张发送）或 grid（已拼成网格图）
+        frame_count: 连拍帧数（grid 布局时需要传入）
+        preview: 低分辨率预览图（先用预览图分析，结果不确定时再用原图）
+        max_tokens: 输出 token 上限（负载较高时由服务层降低）
         
     Returns:
-        Dict: 包含 status, message, confidence, shouldSpeak 的字典
+        Dict: 包含 status, message, confidence, shouldSpeak 的字典，连拍时附带 frames（每帧状态）
     """
     # 添加鼓励门槛到 stats
     if stats:
-        import os
-        from dotenv import load_dotenv
-        load_dotenv()
-        encouragement_interval = int(stats.get('encouragementInterval',os.getenv('ENCOURAGEMENT_INTERVAL', 20)))
-        # encouragement_interval = int(os.getenv('ENCOURAGEMENT_INTERVAL', 20))
+        encouragement_interval = int(stats.get('encouragementInterval', settings.ENCOURAGEMENT_INTERVAL))
         stats['encouragementInterval'] = encouragement_interval
     
     agent = get_supervisor_agent()
-    result = agent.analyze(image_base64, stats)
+    result = agent.analyze(image_base64, stats, layout, frame_count, preview, max_tokens)
     
-    return {
+    response = {
         "status": result.status,
         "message": result.message,
         "confidence": result.confidence,
         "shouldSpeak": result.shouldSpeak
     }
+    if (frame_count or (1 if isinstance(image_base64, str) else len(image_base64))) > 1:
+        response["frames"] = result.frameStatuses
+    return response
@@ -0,0 +1,332 @@
+"""
+Flask 应用工厂
+供开发服务器（dev_server.py）和生产 WSGI 服务器（gunicorn wsgi:app）共用
+"""
+import logging
+from contextlib import ExitStack
+from typing import Callable, List
+
+from flask import Flask, request, jsonify, make_response, g
+from flask_cors import CORS
+from werkzeug.exceptions import RequestEntityTooLarge
+
+from backend.config import settings
+from backend.service import analyze_frame_bytes, check_health, warm_up
+from backend.utils import is_binary_frame_request, parse_frame_uploads
+from backend.utils.admission import get_admission_controller, client_key
+from backend.Agent.scheduler import SESSION_HEADER, superseded_result, track_session
+from backend.utils.idempotency import IDEMPOTENCY_HEADER, IDEMPOTENCY_FIELD
+from backend.utils.request_body import RequestBodyError, check_content_length, parse_analyze_body
+from backend.utils.metrics import render_metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from backend.utils.log_tool import configure_logging, new_request_id, get_request_id
+from backend.service.tts import (
+    synthesize_speech_variant,
+    generate_temp_token,
+    resolve_output_format,
+    TTS_FORMATS
+)
+
+logger = logging.getLogger(__name__)
+
+# 各接口的请求体大小上限（配置项名称）
+_BODY_LIMITS = {
+    '/api/analyze': 'ANALYZE_MAX_BODY_BYTES',
+    '/api/tts': 'TTS_MAX_BODY_BYTES',
+}
+
+# 进程退出时需要执行的清理函数（后台线程、进程池等）
+_shutdown_hooks: List[Callable[[], None]] = []
+
+
+def on_shutdown(hook: Callable[[], None]) -> Callable[[], None]:
+    """
+    注册进程退出时的清理函数
+
+    Args:
+        hook: 无参数的清理函数
+
+    Returns:
+        Callable: 原函数（可用作装饰器）
+    """
+    _shutdown_hooks.append(hook)
+    return hook
+
+
+def shutdown() -> None:
+    """执行所有清理函数（由 gunicorn 的 worker_exit 钩子或开发服务器退出时调用）"""
+    while _shutdown_hooks:
+        hook = _shutdown_hooks.pop()
+        try:
+            hook()
+        except Exception as e:
+            logger.error("清理函数执行失败: %s", e, exc_info=True)
+
+
+def create_app() -> Flask:
+    """
+    创建 Flask 应用
+
+    Returns:
+        Flask: 注册好全部接口的应用实例
+    """
+    configure_logging()
+
+    app = Flask(__name__)
+    CORS(app, expose_headers=["X-Request-ID", "Retry-After"])  # 允许跨域
+
+    @app.before_request
+    def bind_request_id():
+        """为每个请求绑定请求 ID（沿用客户端传入的 X-Request-ID）"""
+        new_request_id(request.headers.get("X-Request-ID"))
+
+    @app.before_request
+    def limit_request_body():
+        """按 Content-Length 在读取请求体之前拒绝过大的请求（分块传输时读取过程中限制）"""
+        name = _BODY_LIMITS.get(request.path)
+        if name is None or request.method != 'POST':
+            return None
+        limit = getattr(settings, name)
+        try:
+            check_content_length(request.content_length, limit)
+        except RequestBodyError as e:
+            logger.warning("请求体过大: %s", e)
+            return jsonify({"success": False, "error": str(e)}), e.status
+        if limit > 0:
+            request.max_content_length = limit
+        return None
+
+    @app.before_request
+    def admission_control():
+        """
+        分析请求的限流和并发控制（拒绝时直接返回 429 / 503）
+
+        排队之前登记会话，同一会话的新请求到达时排队中的旧请求直接返回 409
+        """
+        if request.path != '/api/analyze' or request.method != 'POST':
+            return None
+        g.session_scope = scope = ExitStack()
+        token = scope.enter_context(track_session(request.headers.get(SESSION_HEADER)))
+        ticket = get_admission_controller().acquire(client_key(request.headers, request.remote_addr), token)
+        if not ticket.admitted:
+            if ticket.reason == "superseded":
+                logger.info("排队中的分析请求已被同一会话的新请求取代")
+                return jsonify(superseded_result()), ticket.status
+            logger.warning("分析请求被拒绝: %s (Retry-After %ds)", ticket.reason, ticket.retry_after)
+            return jsonify(ticket.error_body()), ticket.status, ticket.headers()
+        g.admission_ticket = ticket
+        return None
+
+    @app.teardown_request
+    def release_admission(exc):
+        ticket = g.pop('admission_ticket', None)
+        if ticket is not None:
+            ticket.release()
+        scope = g.pop('session_scope', None)
+        if scope is not None:
+            scope.close()
+
+    @app.after_request
+    def add_request_id(response):
+        response.headers["X-Request-ID"] = get_request_id()
+        return response
+
+    @app.route('/api/health', methods=['GET'])
+    def health():
+        """健康检查接口"""
+        result = check_health()
+        status_code = 200 if result.get("success") else 500
+        return jsonify(result), status_code
+
+    @app.route('/api/warmup', methods=['GET', 'POST'])
+    def warmup():
+        """预热接口（平台预热请求调用，?prime=1 时额外发送极小的模型请求）"""
+        prime = request.args.get('prime')
+        result = warm_up(prime in ('1', 'true') if prime is not None else None)
+        status_code = 200 if result.get("success") else 500
+        return jsonify(result), status_code
+
+    @app.route('/api/metrics', methods=['GET'])
+    def metrics():
+        """Prometheus 指标接口"""
+        return render_metrics(), 200, {"Content-Type": METRICS_CONTENT_TYPE}
+
+    @app.route('/api/analyze', methods=['POST', 'OPTIONS'])
+    def analyze():
+        """图片分析接口"""
+        # 处理 OPTIONS 预检请求
+        if request.method == 'OPTIONS':
+            return '', 200
+
+        try:
+            # 二进制上传（multipart/form-data 或 image/*）：直接把字节交给图片流水线
+            if is_binary_frame_request(request.content_type):
+                try:
+                    frames, stats = parse_frame_uploads(
+                        request.content_type, request.get_data(), request.headers
+                    )
+                except RequestEntityTooLarge:
+                    return jsonify({
+                        "success": False,
+                        "error": "请求体过大"
+                    }), 413
+                except ValueError as e:
+                    logger.warning("二进制上传解析失败: %s", e)
+                    return jsonify({
+                        "success": False,
+                        "error": str(e)
+                    }), 400
+
+                logger.debug(
+                    "收到分析请求: %d 张图片共 %d 字节（二进制上传）, 统计信息: %s",
+                    len(frames), sum(len(frame) for frame in frames), stats
+                )
+                result = analyze_frame_bytes(
+                    frames, stats, request.args.get('layout'),
+                    request.headers.get(SESSION_HEADER), request.headers.get(IDEMPOTENCY_HEADER)
+                )
+            else:
+                # JSON 请求体流式解析：Base64 图片（连拍时为 images 列表）边读边解码，
+                # 过大或格式错误时立即停止读取
+                try:
+                    frames, data = parse_analyze_body(
+                        request.stream, settings.ANALYZE_MAX_BODY_BYTES, max_frames=settings.BURST_MAX_FRAMES
+                    )
+                except RequestEntityTooLarge:
+                    return jsonify({
+                        "success": False,
+                        "error": "请求体过大"
+                    }), 413
+                except RequestBodyError as e:
+                    logger.warning("分析请求体无效: %s", e)
+                    return jsonify({
+                        "success": False,
+                        "error": str(e)
+                    }), e.status
+
+                if not frames:
+                    logger.warning("分析请求缺少 image 字段")
+                    return jsonify({
+                        "success": False,
+                        "error": "缺少 image 字段"
+                    }), 400
+
+                stats = data.get('stats')  # 获取统计信息
+
+                logger.debug(
+                    "收到分析请求: %d 张图片共 %d 字节, 统计信息: %s",
+                    len(frames), sum(len(frame) for frame in frames), stats
+                )
+                result = analyze_frame_bytes(
+                    frames, stats, data.get('layout'), request.headers.get(SESSION_HEADER),
+                    request.headers.get(IDEMPOTENCY_HEADER) or data.get(IDEMPOTENCY_FIELD)
+                )
+
+            logger.debug("分析结果: %s", result)
+            # 被同一会话的新请求取代时返回 409，幂等键已用于内容不同的请求时返回 422
+            if result.get("success"):
+                status_code = 200
+            elif result.get("superseded"):
+                status_code = 409
+            else:
+                status_code = 422 if result.get("idempotencyConflict") else 500
+            return jsonify(result), status_code
+
+        except Exception as e:
+            logger.error("服务器错误: %s", e, exc_info=True)
+            return jsonify({
+                "success": False,
+                "error": f"服务器错误: {str(e)}"
+            }), 500
+
+    @app.route('/api/tts/token', methods=['GET', 'OPTIONS'])
+    def get_tts_token():
+        """获取临时 Token 用于前端直接连接 WebSocket"""
+        if request.method == 'OPTIONS':
+            return '', 200
+
+        try:
+            token_data = generate_temp_token()
+
+            if token_data:
+                return jsonify({
+                    "success": True,
+                    "token": token_data["token"],
+                    "expires_at": token_data["expires_at"]
+                })
+            else:
+                return jsonify({
+                    "success": False,
+                    "error": "生成 Token 失败"
+                }), 500
+
+        except Exception as e:
+            logger.error("生成 Token 错误: %s", e)
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 500
+
+    @app.route('/api/tts', methods=['POST', 'OPTIONS'])
+    def tts():
+        """文本转语音接口"""
+        # 处理 OPTIONS 预检请求
+        if request.method == 'OPTIONS':
+            return '', 200
+
+        try:
+            data = request.get_json()
+
+            if not data or 'text' not in data:
+                logger.warning("TTS 请求缺少 text 字段")
+                return jsonify({
+                    "success": False,
+                    "error": "缺少 text 字段"
+                }), 400
+
+            text = data.get('text')
+            model = data.get('model', 'cosyvoice-v3-flash')
+            voice = data.get('voice', 'longanyang')
+            # 输出格式：body 中的 format 参数优先，其次是 Accept 头
+            audio_format = resolve_output_format(data.get('format'), request.headers.get('Accept'))
+
+            logger.debug("收到 TTS 请求: %s (模型: %s, 音色: %s, 格式: %s)", text, model, voice, audio_format)
+            result = synthesize_speech_variant(text, model, voice, audio_format)
+
+            if result:
+                audio_data, actual_format = result
+                logger.debug("语音合成成功，大小: %d 字节 (%s)", len(audio_data), actual_format)
+                # 返回音频数据
+                response = make_response(audio_data)
+                response.headers['Content-Type'] = TTS_FORMATS[actual_format]['mime']
+                response.headers['Content-Length'] = len(audio_data)
+                response.headers['Vary'] = 'Accept'
+                return response
+            else:
+                logger.warning("语音合成失败")
+                return jsonify({
+                    "success": False,
+                    "error": "语音合成失败"
+                }), 500
+
+        except Exception as e:
+            logger.error("TTS 服务器错误: %s", e, exc_info=True)
+            return jsonify({
+                "success": False,
+                "error": f"服务器错误: {str(e)}"
+            }), 500
+
+    @app.route('/')
+    def index():
+        """根路径"""
+        return jsonify({
+            "message": "FocusEye API Server",
+            "status": "running",
+            "endpoints": {
+                "health": "/api/health",
+                "analyze": "/api/analyze",
+                "warmup": "/api/warmup",
+                "metrics": "/api/metrics"
+            }
+        })
+
+    return app
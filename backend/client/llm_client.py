@@ -2,15 +2,17 @@
 LLM 客户端模块
 封装 LangChain ChatOpenAI 实例，适配 Qwen-VL 服务
 """
+import threading
 from typing import Optional
 from langchain_openai import ChatOpenAI
-from backend.config import settings
+from backend.config import settings, on_reload
 
 
 class LLMClient:
     """LLM 客户端管理类"""
     
     _instance: Optional[ChatOpenAI] = None
+    _lock = threading.Lock()
     
     @classmethod
     def get_client(cls) -> ChatOpenAI:
@@ -21,7 +23,9 @@ class LLMClient:
             ChatOpenAI: 配置好的 LLM 客户端
         """
         if cls._instance is None:
-            cls._instance = cls._create_client()
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls._create_client()
         
         return cls._instance
     
@@ -63,6 +67,17 @@ class LLMClient:
         cls._instance = None
 
 
+# 影响客户端的配置项
+_CLIENT_SETTINGS = ("API_KEY", "API_BASE", "MODEL_NAME", "REQUEST_TIMEOUT")
+
+
+@on_reload
+def _reset_on_reload(old, new) -> None:
+    """模型相关配置变更后重建客户端"""
+    if any(getattr(old, name) != getattr(new, name) for name in _CLIENT_SETTINGS):
+        LLMClient.reset_client()
+
+
 # 便捷函数：获取客户端
 def get_llm_client() -> ChatOpenAI:
     """
@@ -1,10 +1,27 @@
 """
 配置模块初始化
 """
-from .settings import settings, API_KEY, API_BASE, MODEL_NAME
+from .settings import (
+    settings,
+    Settings,
+    get_settings,
+    reload_settings,
+    on_reload,
+    on_reload_trigger,
+    install_reload_handlers,
+    API_KEY,
+    API_BASE,
+    MODEL_NAME
+)
 
 __all__ = [
     "settings",
+    "Settings",
+    "get_settings",
+    "reload_settings",
+    "on_reload",
+    "on_reload_trigger",
+    "install_reload_handlers",
     "API_KEY",
     "API_BASE", 
     "MODEL_NAME"
@@ -1,55 +1,408 @@
 """
 配置管理模块
 加载环境变量并提供配置常量
+
+配置在启动时读取为一份不可变快照，请求处理路径上不再读取环境变量或 .env 文件。
+需要修改配置时调用 reload_settings()（或发送 SIGHUP / 修改 .env 文件，
+见 install_reload_handlers），新快照整体替换旧快照，读取方不会看到只更新了一半的配置。
 """
+import logging
 import os
+import signal
+import threading
+from dataclasses import dataclass, fields
 from pathlib import Path
-from typing import Optional
-from dotenv import load_dotenv
+from typing import Any, Callable, Dict, List, Mapping, Optional
+
+logger = logging.getLogger(__name__)
 
-# 加载环境变量
 env_path = Path(__file__).parent.parent.parent / ".env"
-load_dotenv(dotenv_path=env_path)
 
 
+def _read_env_file() -> Dict[str, str]:
+    """读取 .env 文件（部署环境通常没有 .env 文件，此时不导入 dotenv）"""
+    if not env_path.exists():
+        return {}
+    from dotenv import dotenv_values
+    return {key: value for key, value in dotenv_values(env_path).items() if value is not None}
+
+
+# 由 .env 文件注入到 os.environ 的变量（进程环境中已存在的变量优先，不会被覆盖）
+_injected: Dict[str, str] = {}
+
+
+def _load_environment() -> Dict[str, str]:
+    """
+    合并 .env 文件和进程环境变量
+
+    与 load_dotenv() 相同，进程环境变量优先；此前由 .env 注入的变量视为来自文件，
+    因此重新加载时 .env 中的修改可以生效。注入的变量同步写回 os.environ，
+    供直接读取环境变量的第三方库使用
+
+    Returns:
+        Dict: 合并后的变量
+    """
+    file_values = _read_env_file()
+    values = dict(file_values)
+    for key, value in os.environ.items():
+        if _injected.get(key) == value:
+            continue
+        values[key] = value
+
+    for key in set(_injected) - set(file_values):
+        if os.environ.get(key) == _injected[key]:
+            del os.environ[key]
+    _injected.clear()
+    for key, value in file_values.items():
+        if values[key] == value and os.environ.get(key) != value:
+            os.environ[key] = value
+        if os.environ.get(key) == value:
+            _injected[key] = value
+
+    return values
+
+
+def _as_bool(value: str) -> bool:
+    return value.lower() in ("1", "true", "yes")
+
+
+@dataclass(frozen=True)
 class Settings:
-    """应用配置类"""
-    
+    """应用配置（不可变快照）"""
+
     # AI 服务配置
-    API_KEY: str = os.getenv("API_KEY", "apikey")
-    API_BASE: str = os.getenv("API_BASE", "https://igw.livzon.cn/ai/qwenvl/v1")
-    MODEL_NAME: str = os.getenv("MODEL_NAME", "qwen3-vl:32b")
-    
-    # 监督配置
-    MONITOR_INTERVAL: int = int(os.getenv("MONITOR_INTERVAL", "20"))
-    
+    API_KEY: str = "apikey"
+    API_BASE: str = "https://igw.livzon.cn/ai/qwenvl/v1"
+    MODEL_NAME: str = "qwen3-vl:32b"
+
+    # 监督配置：监督间隔及随机波动（秒），鼓励门槛（分钟，前端未传时使用）
+    MONITOR_INTERVAL: int = 20
+    MONITOR_INTERVAL_RANDOM: int = 10
+    ENCOURAGEMENT_INTERVAL: int = 20
+
+    # 准入控制：每个客户端（IP）每分钟请求数和突发容量（0 表示不限流），
+    # 进程内并发上限（0 表示不限制）、排队上限和排队超时（秒）；并发上限与排队上限之和须小于 SERVER_THREADS
+    RATE_LIMIT_PER_MINUTE: float = 12.0
+    RATE_LIMIT_BURST: int = 3
+    ADMISSION_MAX_CONCURRENCY: int = 6
+    ADMISSION_MAX_QUEUE: int = 6
+    ADMISSION_QUEUE_TIMEOUT: float = 10.0
+    # 可信反向代理层数（0 表示直接使用连接地址，不读取 X-Forwarded-For）
+    TRUSTED_PROXY_COUNT: int = 0
+
+    # 模型调用并发上限（0 表示不限制，超出时按优先级排队）和排队超时（秒）
+    MODEL_MAX_CONCURRENCY: int = 6
+    MODEL_QUEUE_TIMEOUT: float = 30.0
+
+    # 请求体大小上限（字节，0 表示不限制）：分析接口（Base64 JSON 或二进制上传）和语音合成接口
+    ANALYZE_MAX_BODY_BYTES: int = 8 * 1024 * 1024
+    TTS_MAX_BODY_BYTES: int = 16 * 1024
+
+    # 幂等请求：相同 Idempotency-Key 的重试在该时间（秒）内直接返回原结果（0 表示不缓存），缓存的键数量上限
+    IDEMPOTENCY_TTL: float = 120.0
+    IDEMPOTENCY_MAX_ENTRIES: int = 1024
+
+    # 连拍分析：每次请求最多帧数；多帧布局（frames: 逐张发送；grid: 拼成一张网格图，需要 Pillow）
+    BURST_MAX_FRAMES: int = 4
+    BURST_LAYOUT: str = "frames"
+
+    # 区域裁剪：发送给模型前裁剪到人物和桌面所在区域（需要 Pillow）；
+    # 四周留白比例；面积至少减少该比例时才裁剪
+    ROI_CROP: bool = True
+    ROI_PADDING: float = 0.1
+    ROI_MIN_SAVING: float = 0.2
+
+    # 渐进分辨率：先发送长边不超过 PROGRESSIVE_PREVIEW_SIZE 像素的预览图（需要 Pillow，0 表示不使用），
+    # 置信度低于 PROGRESSIVE_MIN_CONFIDENCE 或结果为 PROGRESSIVE_VERIFY_STATUSES 中的状态（逗号分隔）时
+    # 再用原分辨率分析
+    PROGRESSIVE_PREVIEW_SIZE: int = 384
+    PROGRESSIVE_MIN_CONFIDENCE: float = 0.75
+    PROGRESSIVE_VERIFY_STATUSES: str = "distracted"
+
+    # 自适应质量：排队请求数超过 QUALITY_QUEUE_TARGET 或分析耗时（秒，指数平均）超过 QUALITY_LATENCY_TARGET 时
+    # 逐级降低图片分辨率、连拍帧数和输出 token 上限，负载回落后逐级恢复；两次调整至少间隔 QUALITY_STEP_INTERVAL 秒。
+    # 排队数主要来自准入控制，QUALITY_QUEUE_TARGET 须小于 ADMISSION_MAX_QUEUE
+    QUALITY_ADAPTIVE: bool = True
+    QUALITY_QUEUE_TARGET: int = 4
+    QUALITY_LATENCY_TARGET: float = 6.0
+    QUALITY_STEP_INTERVAL: float = 10.0
+
+    # 模型服务熔断：连续失败该次数后熔断（0 表示不熔断），熔断后多久（秒）放行一次探测调用；
+    # 熔断或调用失败时是否使用本地降级分类（按同一会话之前的分析结果和画面相似度判断）
+    CIRCUIT_FAILURE_THRESHOLD: int = 3
+    CIRCUIT_RESET_TIMEOUT: float = 30.0
+    LOCAL_FALLBACK: bool = True
+
+    # 样本采集（用于训练本地模型）：样本库目录（留空表示不采集）；采样比例；图片长边上限（像素）；
+    # 单个图片分片大小上限（字节）；同一会话相邻样本视为重复的感知哈希汉明距离（负数表示不做相似去重）
+    CAPTURE_DIR: str = ""
+    CAPTURE_SAMPLE_RATE: float = 1.0
+    CAPTURE_MAX_SIDE: int = 384
+    CAPTURE_SHARD_BYTES: int = 64 * 1024 * 1024
+    CAPTURE_DEDUP_DISTANCE: int = 4
+
+    # 图片处理进程池：子进程数量（0 表示在请求线程中处理）；图片总大小达到该值（字节）才交给进程池；
+    # 等待结果的超时（秒，超时后在请求线程中处理）
+    IMAGE_POOL_WORKERS: int = 0
+    IMAGE_POOL_MIN_BYTES: int = 256 * 1024
+    IMAGE_POOL_TIMEOUT: float = 10.0
+
+    # 场景配置目录（JSON / YAML 文件，留空使用内置的 backend/Agent/scenes）
+    SCENES_DIR: str = ""
+
     # 图片处理配置
-    MAX_IMAGE_SIZE: int = int(os.getenv("MAX_IMAGE_SIZE", "800"))
-    IMAGE_QUALITY: float = float(os.getenv("IMAGE_QUALITY", "0.5"))
-    
+    MAX_IMAGE_SIZE: int = 800
+    IMAGE_QUALITY: float = 0.5
+
     # 超时配置
-    REQUEST_TIMEOUT: int = int(os.getenv("REQUEST_TIMEOUT", "30"))
-    
+    REQUEST_TIMEOUT: int = 30
+
+    # 语音合成配置
+    TTS_MODEL: str = "cosyvoice-v3-flash"
+    TTS_VOICE: str = "longanyang"
+    TTS_FORMAT: str = "mp3"
+    TTS_CACHE_MAX_BYTES: int = 16 * 1024 * 1024
+    # 合成方式（sdk: 优先使用 DashScope SDK；http: 只使用 HTTP 接口）
+    TTS_BACKEND: str = "sdk"
+    TTS_API_URL: str = "https://dashscope.aliyuncs.com/api/v1/services/audio/tts/synthesis"
+
+    # 预热配置：进程启动时预热 Agent；是否额外发送极小的预热请求
+    WARMUP_ON_START: bool = True
+    WARMUP_PRIME: bool = False
+
+    # 服务器配置（生产 WSGI 服务器）
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = 5001
+    SERVER_WORKERS: int = 2
+    SERVER_THREADS: int = 16
+    SERVER_TIMEOUT: int = 60
+    SERVER_GRACEFUL_TIMEOUT: int = 30
+
+    # 日志级别（DEBUG 时输出每个请求的详细信息）
+    LOG_LEVEL: str = "INFO"
+    # 日志格式（json: 每行一个 JSON 对象；text: 人类可读）
+    LOG_FORMAT: str = "text"
+    # 每个请求级别的高频日志的采样比例（0-1）
+    LOG_SAMPLE_RATE: float = 1.0
+
+    # 链路追踪后端（none / otel / memory）
+    TRACING_BACKEND: str = "none"
+
+    # .env 文件变更检查间隔（秒，0 表示不检查）
+    CONFIG_WATCH_INTERVAL: float = 5.0
+
     @classmethod
-    def validate(cls) -> bool:
+    def from_env(cls, environ: Optional[Mapping[str, str]] = None) -> "Settings":
+        """
+        从环境变量构建配置快照
+
+        Args:
+            environ: 变量来源（默认合并 .env 文件和进程环境变量）
+
+        Returns:
+            Settings: 配置快照
+        """
+        if environ is None:
+            environ = _load_environment()
+
+        values: Dict[str, Any] = {}
+        for item in fields(cls):
+            raw = environ.get(item.name)
+            if raw is None:
+                continue
+            if item.type in (bool, "bool"):
+                values[item.name] = _as_bool(raw)
+            elif item.type in (int, "int"):
+                values[item.name] = int(raw)
+            elif item.type in (float, "float"):
+                values[item.name] = float(raw)
+            else:
+                values[item.name] = raw
+
+        # 统一大小写
+        for name in ("LOG_LEVEL",):
+            if name in values:
+                values[name] = values[name].upper()
+        for name in ("LOG_FORMAT", "TRACING_BACKEND", "TTS_FORMAT", "TTS_BACKEND", "BURST_LAYOUT"):
+            if name in values:
+                values[name] = values[name].lower()
+
+        return cls(**values)
+
+    def validate(self) -> bool:
         """验证必要配置是否存在"""
         required = ["API_KEY", "API_BASE", "MODEL_NAME"]
-        missing = [key for key in required if not getattr(cls, key)]
-        
+        missing = [key for key in required if not getattr(self, key)]
+
         if missing:
             raise ValueError(f"Missing required configuration: {', '.join(missing)}")
-        
+
         return True
 
 
+_current: Settings = Settings.from_env()
+_reload_lock = threading.Lock()
+_reload_listeners: List[Callable[[Settings, Settings], None]] = []
+_reload_triggers: List[Callable[[bool], Any]] = []
+
+
+def get_settings() -> Settings:
+    """
+    获取当前配置快照
+
+    需要同时读取多个配置项时先取快照，保证读到的是同一版本的配置
+
+    Returns:
+        Settings: 当前配置
+    """
+    return _current
+
+
+def on_reload(listener: Callable[[Settings, Settings], None]) -> Callable[[Settings, Settings], None]:
+    """
+    注册配置重新加载后的回调（用于清理依赖配置的缓存和客户端）
+
+    Args:
+        listener: 回调函数，参数为 (旧配置, 新配置)
+
+    Returns:
+        Callable: 原函数（可用作装饰器）
+    """
+    _reload_listeners.append(listener)
+    return listener
+
+
+def on_reload_trigger(hook: Callable[[bool], Any]) -> Callable[[bool], Any]:
+    """
+    注册随配置热重载触发的回调（用于重新加载配置以外的数据文件，如场景配置）
+
+    收到 SIGHUP 时以 force=True 调用；文件检查线程每次检查时以 force=False 调用，
+    由回调自行判断文件是否有变化
+
+    Args:
+        hook: 回调函数，参数为 force
+
+    Returns:
+        Callable: 原函数（可用作装饰器）
+    """
+    _reload_triggers.append(hook)
+    return hook
+
+
+def _run_reload_triggers(force: bool) -> None:
+    for hook in list(_reload_triggers):
+        try:
+            hook(force)
+        except Exception as e:
+            logger.error("热重载回调失败: %s", e, exc_info=True)
+
+
+def reload_settings(environ: Optional[Mapping[str, str]] = None) -> Settings:
+    """
+    重新读取配置并原子替换当前快照
+
+    新配置无法解析时保留旧配置
+
+    Args:
+        environ: 变量来源（默认合并 .env 文件和进程环境变量）
+
+    Returns:
+        Settings: 生效的配置
+    """
+    global _current
+
+    with _reload_lock:
+        old = _current
+        try:
+            new = Settings.from_env(environ)
+        except (ValueError, OSError) as e:
+            logger.error("重新加载配置失败，继续使用旧配置: %s", e)
+            return old
+
+        if new == old:
+            return old
+        _current = new
+        changed = [item.name for item in fields(Settings) if getattr(old, item.name) != getattr(new, item.name)]
+        logger.info("配置已重新加载，变更项: %s", ", ".join(changed))
+
+    for listener in list(_reload_listeners):
+        try:
+            listener(old, new)
+        except Exception as e:
+            logger.error("配置重新加载回调失败: %s", e, exc_info=True)
+
+    return new
+
+
+def install_reload_handlers(watch_interval: Optional[float] = None) -> Callable[[], None]:
+    """
+    安装配置热重载触发器：SIGHUP 信号和 .env 文件修改检查（同时触发 on_reload_trigger 注册的回调）
+
+    由开发服务器和 gunicorn worker 启动时调用（信号处理只能在主线程安装）
+
+    Args:
+        watch_interval: 文件检查间隔（秒，默认读取 CONFIG_WATCH_INTERVAL，0 表示不检查）
+
+    Returns:
+        Callable: 停止文件检查线程的函数
+    """
+    def on_sighup(signum: int, frame: Any) -> None:
+        reload_settings()
+        _run_reload_triggers(True)
+
+    if hasattr(signal, "SIGHUP") and threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGHUP, on_sighup)
+
+    if watch_interval is None:
+        watch_interval = _current.CONFIG_WATCH_INTERVAL
+    stop_event = threading.Event()
+    if watch_interval <= 0:
+        return stop_event.set
+
+    def mtime() -> Optional[float]:
+        try:
+            return env_path.stat().st_mtime
+        except OSError:
+            return None
+
+    def watch() -> None:
+        last = mtime()
+        while not stop_event.wait(watch_interval):
+            current = mtime()
+            if current != last:
+                last = current
+                reload_settings()
+            _run_reload_triggers(False)
+
+    threading.Thread(target=watch, name="config-watcher", daemon=True).start()
+    return stop_event.set
+
+
+class _SettingsProxy:
+    """
+    始终指向当前快照的配置对象
+
+    模块可以在导入时持有 settings，读取到的仍是最新配置
+    """
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(_current, name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError("配置为只读快照，请修改环境变量后调用 reload_settings()")
+
+    def __repr__(self) -> str:
+        return repr(_current)
+
+
 # 创建全局配置实例
-settings = Settings()
-
-# 导出配置常量（向后兼容）
-API_KEY = settings.API_KEY
-API_BASE = settings.API_BASE
-MODEL_NAME = settings.MODEL_NAME
-MONITOR_INTERVAL = settings.MONITOR_INTERVAL
-MAX_IMAGE_SIZE = settings.MAX_IMAGE_SIZE
-IMAGE_QUALITY = settings.IMAGE_QUALITY
-REQUEST_TIMEOUT = settings.REQUEST_TIMEOUT
+settings = _SettingsProxy()
+
+# 导出配置常量（向后兼容，取导入时的值，不随重新加载更新）
+API_KEY = _current.API_KEY
+API_BASE = _current.API_BASE
+MODEL_NAME = _current.MODEL_NAME
+MONITOR_INTERVAL = _current.MONITOR_INTERVAL
+MAX_IMAGE_SIZE = _current.MAX_IMAGE_SIZE
+IMAGE_QUALITY = _current.IMAGE_QUALITY
+REQUEST_TIMEOUT = _current.REQUEST_TIMEOUT
@@ -1,11 +1,29 @@
 """
 服务模块初始化
+
+导出项按需加载，健康检查等轻量路径不会导入 LLM 相关依赖
 """
-from .monitor import MonitorService, monitor_service, analyze_status, check_health
-
-__all__ = [
-    "MonitorService",
-    "monitor_service",
-    "analyze_status",
-    "check_health"
-]
+import importlib
+from typing import Any
+
+# 导出名称 -> 所在子模块
+_EXPORTS = {
+    "MonitorService": ".monitor",
+    "monitor_service": ".monitor",
+    "quality_controller": ".monitor",
+    "analyze_status": ".monitor",
+    "analyze_frame_bytes": ".monitor",
+    "check_health": ".monitor",
+    "warm_up": ".monitor",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str) -> Any:
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
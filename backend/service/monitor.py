@@ -2,30 +2,184 @@
 监督服务层
 业务逻辑的组装者：校验 -> 调用 Agent -> 格式化结果
 """
-from typing import Dict, Any, Optional
+from dataclasses import dataclass
+from typing import Callable, Dict, Any, List, Optional, Tuple, Union
 import logging
-from backend.utils import validate_base64_image, clean_base64_string, validate_image_size
-from backend.Agent import analyze_focus
+import threading
+import time
+from backend.utils import (
+    validate_base64_image,
+    clean_base64_string,
+    validate_image_size,
+    validate_image_bytes,
+    encode_image_bytes,
+    decode_base64_image,
+    get_image_size_estimate
+)
+from backend.config import settings, get_settings, on_reload
+from backend.utils.metrics import (
+    STAGE_LATENCY,
+    ANALYZE_RESULTS,
+    ROI_CROPS,
+    QUALITY_LEVEL,
+    MODEL_QUEUE_DEPTH,
+    ADMISSION_QUEUE_DEPTH,
+    LOCAL_FALLBACKS
+)
+from backend.utils.tracing import start_span
+from backend.utils.idempotency import (
+    IdempotencyConflict,
+    get_idempotency_cache,
+    request_fingerprint,
+    scoped_key
+)
+from backend.utils.image_pool import run_image_task
+from backend.utils.circuit import CircuitOpen
+from backend.utils.capture import CaptureSample, capture_sample
 
-# 配置日志
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+@dataclass(frozen=True)
+class QualityProfile:
+    """
+    分析质量等级
+    
+    Attributes:
+        level: 等级（0 为完整质量）
+        max_side: 发送给模型的图片长边上限（像素，0 表示不限制）
+        max_frames: 连拍最多使用的帧数（取最近的帧，0 表示不限制）
+        layout: 连拍布局（空字符串表示按请求）
+        max_tokens: 输出 token 上限（None 表示使用客户端配置）
+        progressive: 是否先用预览图分析、不确定时再用原图（会增加一次模型调用）
+    """
+    level: int
+    max_side: int = 0
+    max_frames: int = 0
+    layout: str = ""
+    max_tokens: Optional[int] = None
+    progressive: bool = True
+
+
+# 质量等级：负载升高时依次降级（图片更小、连拍拼成一张或只取最后一帧、输出更短）
+QUALITY_PROFILES: Tuple[QualityProfile, ...] = (
+    QualityProfile(0),
+    QualityProfile(1, max_side=640, layout="grid", max_tokens=300, progressive=False),
+    QualityProfile(2, max_side=384, max_frames=1, max_tokens=160, progressive=False),
+)
+
+
+class QualityController:
+    """
+    过载自适应质量控制器
+    
+    观察排队的请求数（准入控制和模型调用排队之和）和分析耗时（指数平均），
+    超过 QUALITY_QUEUE_TARGET / QUALITY_LATENCY_TARGET 时降一级，
+    排队不超过目标的一半且耗时低于目标的 60% 时升一级。两次调整至少间隔 QUALITY_STEP_INTERVAL 秒，
+    避免降级后耗时下降又立刻恢复造成震荡；较长时间没有新的耗时样本时只按排队情况判断
+    
+    Args:
+        smoothing: 耗时指数平均的新样本权重
+        clock: 时钟函数（测试时替换）
+    """
+    
+    def __init__(self, smoothing: float = 0.3, clock: Callable[[], float] = time.monotonic):
+        self.smoothing = smoothing
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._level = 0
+        self._changed = clock()
+        self._latency: Optional[float] = None
+        self._sampled = 0.0
+    
+    @property
+    def level(self) -> int:
+        return self._level
+    
+    @staticmethod
+    def queue_depth() -> float:
+        """当前排队的分析请求数"""
+        return ADMISSION_QUEUE_DEPTH.value() + MODEL_QUEUE_DEPTH.value()
+    
+    def observe(self, seconds: float) -> None:
+        """
+        记录一次分析耗时
+        
+        Args:
+            seconds: 耗时（秒）
+        """
+        with self._lock:
+            if self._latency is None:
+                self._latency = seconds
+            else:
+                self._latency += self.smoothing * (seconds - self._latency)
+            self._sampled = self._clock()
+    
+    def profile(self) -> QualityProfile:
+        """
+        按当前负载调整并返回质量等级（每个分析请求开始时调用）
+        
+        Returns:
+            QualityProfile: 本次请求使用的质量等级
+        """
+        config = get_settings()
+        with self._lock:
+            previous = self._level
+            now = self._clock()
+            if not config.QUALITY_ADAPTIVE:
+                self._level = 0
+            elif now - self._changed >= config.QUALITY_STEP_INTERVAL:
+                queue = self.queue_depth()
+                latency = self._latency if now - self._sampled < 3 * config.QUALITY_STEP_INTERVAL else None
+                overloaded = queue > config.QUALITY_QUEUE_TARGET or (
+                    latency is not None and latency > config.QUALITY_LATENCY_TARGET
+                )
+                relaxed = queue <= config.QUALITY_QUEUE_TARGET / 2 and (
+                    latency is None or latency < config.QUALITY_LATENCY_TARGET * 0.6
+                )
+                if overloaded and self._level < len(QUALITY_PROFILES) - 1:
+                    self._level += 1
+                elif relaxed and self._level > 0:
+                    self._level -= 1
+            if self._level != previous:
+                self._changed = now
+                logger.warning(
+                    "分析质量等级调整: %d -> %d（排队 %.0f，平均耗时 %s）",
+                    previous, self._level, self.queue_depth(),
+                    "-" if self._latency is None else f"{self._latency:.1f}s"
+                )
+            level = self._level
+        QUALITY_LEVEL.set(level)
+        return QUALITY_PROFILES[level]
+
+
+# 全局质量控制器（进程内所有分析请求共享）
+quality_controller = QualityController()
+
+
 class MonitorService:
     """监督服务类"""
     
+    # 健康检查结果缓存（配置重新加载时清空）
+    _health_cache: Optional[Dict[str, Any]] = None
+    
     @staticmethod
     def analyze_user_status(
-        image_base64: str,
-        stats: Optional[Dict[str, Any]] = None
+        image_base64: Union[str, List[str]],
+        stats: Optional[Dict[str, Any]] = None,
+        layout: Optional[str] = None,
+        session_id: Optional[str] = None,
+        idempotency_key: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         分析用户学习状态
         
         Args:
-            image_base64: Base64 编码的图片
+            image_base64: Base64 编码的图片；连拍时为按时间顺序的图片列表（最多 BURST_MAX_FRAMES 张）
             stats: 监督统计信息 (checkCount, runningTime, focusTime, currentTime, continuousFocusMinutes)
+            layout: 连拍布局，frames（逐张发送）或 grid（拼成网格图），默认读取 BURST_LAYOUT 配置
+            session_id: 会话标识（X-Session-ID），同一会话的新请求到达时排队中的本请求被取代
+            idempotency_key: 幂等键，重试时沿用同一个键直接返回原请求的结果（需要 session_id）
             
         Returns:
             Dict: 包含以下字段的字典
@@ -34,60 +188,346 @@ class MonitorService:
                 - message: str, 反馈文本
                 - confidence: float, 置信度
                 - shouldSpeak: bool, 是否需要语音播放
+                - frames: List[str], 连拍时每帧的状态
+                - qualityLevel: int, 本次分析使用的质量等级（0 为完整质量，负载较高时降级）
+                - degraded: bool, 模型服务不可用，结果来自本地降级分类
+                - superseded: bool, 被同一会话的新请求取代（status 为 superseded）
+                - idempotencyConflict: bool, 幂等键已用于内容不同的请求
                 - error: str, 错误信息（如果失败）
         """
-        try:
-            # 1. 清理输入
-            image_base64 = clean_base64_string(image_base64)
+        key = scoped_key(idempotency_key, session_id)
+        frames = [image_base64] if isinstance(image_base64, str) else list(image_base64)
+        if key:
+            return MonitorService._run_idempotent(
+                key, lambda: MonitorService.analyze_user_status(image_base64, stats, layout, session_id),
+                request_fingerprint(frames, stats, layout)
+            )
+        
+        scene = stats.get("scene", "reading") if stats else "reading"
+        with start_span("monitor.analyze", scene=scene, upload="base64", frames=len(frames)) as span:
+            try:
+                error = MonitorService._check_frame_count(frames)
+                if error:
+                    return error
+                
+                with start_span("monitor.validate"), STAGE_LATENCY.time(stage="validate"):
+                    cleaned = []
+                    for frame in frames:
+                        # 1. 清理输入
+                        frame = clean_base64_string(frame)
+                        
+                        # 2. 验证图片格式
+                        is_valid, error_msg = validate_base64_image(frame)
+                        if not is_valid:
+                            logger.warning("图片格式验证失败: %s", error_msg)
+                            return MonitorService._invalid("图片格式不正确", error_msg)
+                        
+                        # 3. 验证图片大小
+                        size_valid, size_error = validate_image_size(frame, max_size_mb=5.0)
+                        if not size_valid:
+                            logger.warning("图片大小验证失败: %s", size_error)
+                            return MonitorService._invalid("图片太大，请压缩后重试", size_error)
+                        cleaned.append(frame)
+                span.set_attribute("image.bytes", sum(get_image_size_estimate(frame) for frame in cleaned))
+            
+                return MonitorService._run_analysis(cleaned, stats, layout, session_id=session_id)
             
-            # 2. 验证图片格式
-            is_valid, error_msg = validate_base64_image(image_base64)
-            if not is_valid:
-                logger.warning(f"图片格式验证失败: {error_msg}")
+            except Exception as e:
+                # 捕获所有异常，返回友好的错误信息
+                ANALYZE_RESULTS.inc(status="exception")
+                span.record_exception(e)
+                logger.error("分析过程出错: %s", e, exc_info=True)
                 return {
                     "success": False,
                     "status": "error",
-                    "message": "图片格式不正确",
+                    "message": "分析失败，请稍后重试",
                     "confidence": 0.0,
-                    "error": error_msg
+                    "error": str(e)
                 }
+    
+    @staticmethod
+    def analyze_image_bytes(
+        image_bytes: Union[bytes, List[bytes]],
+        stats: Optional[Dict[str, Any]] = None,
+        layout: Optional[str] = None,
+        session_id: Optional[str] = None,
+        idempotency_key: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        分析用户学习状态（二进制图片上传）
+        
+        跳过 Base64 清洗和解码校验，只做一次编码生成模型所需的 Data URI
+        
+        Args:
+            image_bytes: 图片二进制数据；连拍时为按时间顺序的列表
+            stats: 监督统计信息
+            layout: 连拍布局（frames / grid）
+            session_id: 会话标识（X-Session-ID）
+            idempotency_key: 幂等键
             
-            # 3. 验证图片大小
-            size_valid, size_error = validate_image_size(image_base64, max_size_mb=5.0)
-            if not size_valid:
-                logger.warning(f"图片大小验证失败: {size_error}")
+        Returns:
+            Dict: 与 analyze_user_status 相同结构的结果
+        """
+        key = scoped_key(idempotency_key, session_id)
+        frames = [image_bytes] if isinstance(image_bytes, (bytes, bytearray)) else list(image_bytes)
+        if key:
+            return MonitorService._run_idempotent(
+                key, lambda: MonitorService.analyze_image_bytes(image_bytes, stats, layout, session_id),
+                request_fingerprint(frames, stats, layout)
+            )
+        
+        scene = stats.get("scene", "reading") if stats else "reading"
+        with start_span("monitor.analyze", scene=scene, upload="binary", frames=len(frames)) as span:
+            try:
+                error = MonitorService._check_frame_count(frames)
+                if error:
+                    return error
+                
+                span.set_attribute("image.bytes", sum(len(frame) for frame in frames))
+                with start_span("monitor.validate"), STAGE_LATENCY.time(stage="validate"):
+                    encoded = []
+                    for frame in frames:
+                        is_valid, error_msg = validate_image_bytes(frame, max_size_mb=5.0)
+                        if not is_valid:
+                            logger.warning("图片验证失败: %s", error_msg)
+                            return MonitorService._invalid("图片格式不正确", error_msg)
+                        encoded.append(encode_image_bytes(frame))
+            
+                return MonitorService._run_analysis(encoded, stats, layout, frames, session_id)
+            
+            except Exception as e:
+                ANALYZE_RESULTS.inc(status="exception")
+                span.record_exception(e)
+                logger.error("分析过程出错: %s", e, exc_info=True)
                 return {
                     "success": False,
                     "status": "error",
-                    "message": "图片太大，请压缩后重试",
+                    "message": "分析失败，请稍后重试",
                     "confidence": 0.0,
-                    "error": size_error
+                    "error": str(e)
                 }
+    
+    @staticmethod
+    def _run_idempotent(key: str, compute: Callable[[], Dict[str, Any]], fingerprint: str) -> Dict[str, Any]:
+        """按幂等键执行分析：重复的请求返回原请求的结果，不再调用模型；键已用于其他内容时拒绝"""
+        with start_span("monitor.idempotency") as span:
+            try:
+                result, source = get_idempotency_cache().run(key, compute, fingerprint)
+            except IdempotencyConflict as e:
+                span.set_attribute("cache.result", "conflict")
+                logger.warning("幂等键冲突: %s", e)
+                return {
+                    "success": False,
+                    "status": "error",
+                    "message": "请求标识已被使用，请重新发起检查",
+                    "confidence": 0.0,
+                    "error": str(e),
+                    "idempotencyConflict": True
+                }
+            span.set_attribute("cache.result", source)
+        if source != "miss":
+            logger.info("重复的分析请求，返回原请求结果（%s）", source)
+        return result
+    
+    @staticmethod
+    def _invalid(message: str, error: str) -> Dict[str, Any]:
+        """图片校验失败的结果"""
+        ANALYZE_RESULTS.inc(status="invalid")
+        return {
+            "success": False,
+            "status": "error",
+            "message": message,
+            "confidence": 0.0,
+            "error": error
+        }
+    
+    @staticmethod
+    def _check_frame_count(frames: List[Any]) -> Optional[Dict[str, Any]]:
+        """检查连拍帧数，超出 BURST_MAX_FRAMES 时返回错误结果"""
+        if not frames:
+            return MonitorService._invalid("图片格式不正确", "图片数据为空")
+        if len(frames) > settings.BURST_MAX_FRAMES:
+            return MonitorService._invalid(
+                "连拍照片过多",
+                f"最多 {settings.BURST_MAX_FRAMES} 张，实际 {len(frames)} 张"
+            )
+        return None
+    
+    @staticmethod
+    def _run_analysis(
+        frames: List[str],
+        stats: Optional[Dict[str, Any]],
+        layout: Optional[str] = None,
+        frame_bytes: Optional[List[bytes]] = None,
+        session_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        调用 Agent 分析已校验的图片并格式化结果
+        
+        Args:
+            frames: 已校验的 Data URI（按时间顺序）
+            stats: 统计信息
+            layout: 连拍布局（frames / grid，默认读取 BURST_LAYOUT 配置）
+            frame_bytes: 各帧二进制数据（二进制上传时提供，免去 Base64 解码）
+            session_id: 会话标识
             
-            # 4. 调用 Agent 分析
-            logger.info("开始分析用户状态...")
-            result = analyze_focus(image_base64, stats)
-            
-            # 5. 格式化返回结果
-            response = {
-                "success": True,
-                "status": result.get("status", "unknown"),
-                "message": result.get("message", "分析完成"),
-                "confidence": result.get("confidence", 0.8),
-                "shouldSpeak": result.get("shouldSpeak", True)  # 是否需要语音播放
+        Returns:
+            Dict: 格式化后的分析结果
+        """
+        # Agent 依赖 LangChain，首次分析时才导入（健康检查等路径不加载）
+        from backend.Agent import analyze_focus
+        from backend.Agent.scheduler import Superseded, superseded_result, track_session
+        from backend.Agent.fallback import get_local_classifier
+        
+        # 按当前负载选择质量等级（过载时少发帧）
+        profile = quality_controller.profile()
+        if profile.max_frames and len(frames) > profile.max_frames:
+            frames = frames[-profile.max_frames:]
+            frame_bytes = frame_bytes[-profile.max_frames:] if frame_bytes else None
+        
+        # 批量预处理：亮度和感知哈希，并裁剪到人物和桌面所在区域
+        # （需要 Pillow，无法可靠判断区域时使用原图）
+        if frame_bytes is None:
+            frame_bytes = [decode_base64_image(frame) for frame in frames]
+        with start_span("monitor.preprocess") as span, STAGE_LATENCY.time(stage="preprocess"):
+            prepared = run_image_task(
+                "preprocess",
+                frame_bytes,
+                roi=settings.ROI_CROP,
+                padding=settings.ROI_PADDING,
+                min_saving=settings.ROI_MIN_SAVING
+            )
+            span.set_attribute("roi.area_ratio", round(prepared.area_ratio, 3))
+            if prepared.brightness:
+                span.set_attributes({
+                    "frames.brightness": round(min(prepared.brightness), 1),
+                    "frames.dark": prepared.dark,
+                    "frames.dhash": ",".join(f"{value:016x}" for value in prepared.hashes)
+                })
+        if prepared.dark:
+            logger.info("画面过暗（平均亮度 %.0f），摄像头可能被遮挡", min(prepared.brightness))
+        if settings.ROI_CROP:
+            ROI_CROPS.inc(result="cropped" if prepared.area_ratio < 1.0 else "full")
+        if prepared.area_ratio < 1.0:
+            frame_bytes = prepared.frames
+            frames = [encode_image_bytes(frame, "jpeg") for frame in prepared.frames]
+        
+        layout = (profile.layout or layout or settings.BURST_LAYOUT).lower()
+        images: Union[str, List[str]] = frames[0] if len(frames) == 1 else frames
+        sent_bytes = frame_bytes
+        if len(frames) > 1 and layout == "grid":
+            # 拼成一张网格图（需要 Pillow，不可用时逐张发送）
+            sheet = run_image_task("contact_sheet", frame_bytes)
+            if sheet:
+                images = [encode_image_bytes(sheet, "jpeg")]
+                sent_bytes = [sheet]
+            else:
+                layout = "frames"
+        
+        preview = None
+        if profile.max_side:
+            # 降级：直接发送缩小的图片（原图已经足够小时不处理）
+            with start_span("monitor.downscale"), STAGE_LATENCY.time(stage="downscale"):
+                reduced = run_image_task("downscale", sent_bytes, max_side=profile.max_side)
+            if reduced:
+                images = [encode_image_bytes(image, "jpeg") for image in reduced]
+        elif profile.progressive and settings.PROGRESSIVE_PREVIEW_SIZE > 0:
+            # 渐进分辨率：先用低分辨率预览图分析（原图保留，结果不确定时再用原图）
+            with start_span("monitor.downscale"), STAGE_LATENCY.time(stage="downscale"):
+                previews = run_image_task("downscale", sent_bytes, max_side=settings.PROGRESSIVE_PREVIEW_SIZE)
+            if previews:
+                preview = [encode_image_bytes(image, "jpeg") for image in previews]
+        
+        # 4. 调用 Agent 分析
+        logger.debug("开始分析用户状态...")
+        scene = stats.get("scene", "reading") if stats else "reading"
+        fallback_reason = None
+        try:
+            started = time.perf_counter()
+            with track_session(session_id), STAGE_LATENCY.time(stage="total"):
+                result = analyze_focus(images, stats, layout, len(frames), preview, profile.max_tokens)
+            quality_controller.observe(time.perf_counter() - started)
+            if result.get("status") == "error":
+                fallback_reason = "model_error"
+        except Superseded:
+            # 同一会话已有更新的请求：不再调用模型，返回轻量结果
+            ANALYZE_RESULTS.inc(status="superseded")
+            logger.info("分析请求已被同一会话的新请求取代")
+            return superseded_result()
+        except CircuitOpen:
+            fallback_reason = "circuit_open"
+            result = {"status": "error", "message": "模型服务暂时不可用", "confidence": 0.0, "shouldSpeak": False}
+        
+        # 模型服务不可用时使用本地降级分类；模型成功给出的结果作为之后降级分类的参考
+        classifier = get_local_classifier()
+        degraded = bool(fallback_reason) and settings.LOCAL_FALLBACK
+        if degraded:
+            result = classifier.classify(session_id, prepared.hashes, prepared.brightness, scene)
+            LOCAL_FALLBACKS.inc(reason=fallback_reason, status=result["status"])
+            logger.warning("模型服务不可用（%s），使用本地降级分类: %s", fallback_reason, result["status"])
+        elif not fallback_reason:
+            classifier.learn(session_id, prepared.hashes, prepared.brightness, result.get("status", ""))
+            # 采集模型结果作为训练样本（配置 CAPTURE_DIR 后启用，后台线程写入）
+            capture_sample(CaptureSample(
+                frames=frame_bytes,
+                hashes=prepared.hashes,
+                scene=scene,
+                stats=dict(stats or {}),
+                result=dict(result),
+                session_id=session_id
+            ))
+        
+        # 5. 格式化返回结果
+        response = {
+            "success": True,
+            "status": result.get("status", "unknown"),
+            "message": result.get("message", "分析完成"),
+            "confidence": result.get("confidence", 0.8),
+            "shouldSpeak": result.get("shouldSpeak", True),  # 是否需要语音播放
+            "qualityLevel": profile.level
+        }
+        if "frames" in result:
+            response["frames"] = result["frames"]
+        if degraded:
+            response["degraded"] = True
+        
+        ANALYZE_RESULTS.inc(status=response["status"])
+        logger.info(
+            "分析完成: %s - %s - 语音: %s",
+            response["status"], response["message"], response["shouldSpeak"],
+            extra={
+                "status": response["status"],
+                "shouldSpeak": response["shouldSpeak"],
+                "sample_rate": settings.LOG_SAMPLE_RATE
             }
+        )
+        return response
+    
+    @staticmethod
+    def warm_up(prime: Optional[bool] = None) -> Dict[str, Any]:
+        """
+        预热接口：提前加载 LLM 依赖并初始化 Agent
+        
+        Args:
+            prime: 是否发送极小的预热请求（默认读取配置）
             
-            logger.info(f"分析完成: {response['status']} - {response['message']} - 语音: {response['shouldSpeak']}")
-            return response
+        Returns:
+            Dict: 预热结果和各步骤耗时
+        """
+        try:
+            from backend.Agent import warm_up as warm_up_agent
             
+            report = warm_up_agent(prime=prime)
+            return {
+                "success": True,
+                "status": "warm",
+                "report": report
+            }
         except Exception as e:
-            # 捕获所有异常，返回友好的错误信息
-            logger.error(f"分析过程出错: {str(e)}", exc_info=True)
+            logger.error("预热失败: %s", e, exc_info=True)
             return {
                 "success": False,
-                "status": "error",
-                "message": "分析失败，请稍后重试",
-                "confidence": 0.0,
+                "status": "cold",
                 "error": str(e)
             }
     
@@ -99,30 +539,31 @@ class MonitorService:
         Returns:
             Dict: 服务状态信息
         """
+        if MonitorService._health_cache is not None:
+            return dict(MonitorService._health_cache)
+        
         try:
-            from backend.config import settings
-            import os
+            config = get_settings()
             
             # 验证配置
-            settings.validate()
+            config.validate()
             
             # 获取监督配置（仅后端控制的配置）
-            monitor_interval = int(os.getenv('MONITOR_INTERVAL', 60))
-            monitor_interval_random = int(os.getenv('MONITOR_INTERVAL_RANDOM', 10))
             # 注意：encouragementInterval 和 restReminderInterval 由前端用户自己设置，不从后端返回
             
-            return {
+            MonitorService._health_cache = {
                 "success": True,
                 "status": "healthy",
                 "message": "服务运行正常",
                 "config": {
-                    "model": settings.MODEL_NAME,
-                    "api_base": settings.API_BASE[:30] + "...",  # 只显示部分 URL
-                    "monitorInterval": monitor_interval,  # 监督间隔（秒）
-                    "monitorIntervalRandom": monitor_interval_random,  # 随机波动（秒）
+                    "model": config.MODEL_NAME,
+                    "api_base": config.API_BASE[:30] + "...",  # 只显示部分 URL
+                    "monitorInterval": config.MONITOR_INTERVAL,  # 监督间隔（秒）
+                    "monitorIntervalRandom": config.MONITOR_INTERVAL_RANDOM,  # 随机波动（秒）
                     # encouragementInterval 和 restReminderInterval 由前端管理，不在此返回
                 }
             }
+            return dict(MonitorService._health_cache)
         except Exception as e:
             return {
                 "success": False,
@@ -136,19 +577,57 @@ class MonitorService:
 monitor_service = MonitorService()
 
 
+@on_reload
+def _invalidate_health_cache(old, new) -> None:
+    """配置重新加载后重新生成健康检查结果"""
+    MonitorService._health_cache = None
+
+
 # 便捷函数
-def analyze_status(image_base64: str, stats: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+def analyze_status(
+    image_base64: Union[str, List[str]],
+    stats: Optional[Dict[str, Any]] = None,
+    layout: Optional[str] = None,
+    session_id: Optional[str] = None,
+    idempotency_key: Optional[str] = None
+) -> Dict[str, Any]:
     """
     便捷函数：分析用户状态
     
     Args:
-        image_base64: Base64 图片
+        image_base64: Base64 图片（连拍时为列表）
         stats: 统计信息
+        layout: 连拍布局（frames / grid）
+        session_id: 会话标识（X-Session-ID）
+        idempotency_key: 幂等键（Idempotency-Key）
         
     Returns:
         Dict: 分析结果
     """
-    return monitor_service.analyze_user_status(image_base64, stats)
+    return monitor_service.analyze_user_status(image_base64, stats, layout, session_id, idempotency_key)
+
+
+def analyze_frame_bytes(
+    image_bytes: Union[bytes, List[bytes]],
+    stats: Optional[Dict[str, Any]] = None,
+    layout: Optional[str] = None,
+    session_id: Optional[str] = None,
+    idempotency_key: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    便捷函数：分析二进制上传的图片
+    
+    Args:
+        image_bytes: 图片二进制数据（连拍时为列表）
+        stats: 统计信息
+        layout: 连拍布局（frames / grid）
+        session_id: 会话标识（X-Session-ID）
+        idempotency_key: 幂等键（Idempotency-Key）
+        
+    Returns:
+        Dict: 分析结果
+    """
+    return monitor_service.analyze_image_bytes(image_bytes, stats, layout, session_id, idempotency_key)
 
 
 def check_health() -> Dict[str, Any]:
@@ -159,3 +638,16 @@ def check_health() -> Dict[str, Any]:
         Dict: 健康状态
     """
     return monitor_service.health_check()
+
+
+def warm_up(prime: Optional[bool] = None) -> Dict[str, Any]:
+    """
+    便捷函数：预热服务
+    
+    Args:
+        prime: 是否发送极小的预热请求
+        
+    Returns:
+        Dict: 预热结果
+    """
+    return monitor_service.warm_up(prime)
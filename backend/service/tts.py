@@ -2,13 +2,248 @@
 文本转语音服务
 使用阿里云 CosyVoice API
 """
-import os
+import io
+import logging
+import wave
+import shutil
+import subprocess
+import threading
 import requests
 import time
 import hashlib
 import hmac
 import base64
-from typing import Optional, Dict
+from collections import OrderedDict
+from typing import Any, Optional, Dict, Tuple
+
+from backend.config import settings
+from backend.utils.metrics import CACHE_EVENTS, TTS_LATENCY
+from backend.utils.tracing import start_span
+
+logger = logging.getLogger(__name__)
+
+
+# 支持的输出格式
+# sdk_format: DashScope SDK AudioFormat 枚举名
+# http_format: HTTP 接口可直接返回的格式（None 表示需要服务端转码）
+TTS_FORMATS: Dict[str, Dict] = {
+    "mp3": {
+        "mime": "audio/mpeg",
+        "sdk_format": "MP3_22050HZ_MONO_256KBPS",
+        "http_format": "mp3",
+        "sample_rate": 22050,
+    },
+    "opus": {
+        "mime": "audio/ogg",
+        "sdk_format": "OGG_OPUS_16KHZ_MONO_32KBPS",
+        "http_format": None,
+        "sample_rate": 16000,
+        "bitrate": "32k",
+    },
+    "pcm": {
+        "mime": "audio/L16;rate=16000;channels=1",
+        "sdk_format": "PCM_16000HZ_MONO_16BIT",
+        "http_format": "pcm",
+        "sample_rate": 16000,
+    },
+    "wav": {
+        "mime": "audio/wav",
+        "sdk_format": "WAV_16000HZ_MONO_16BIT",
+        "http_format": "wav",
+        "sample_rate": 16000,
+    },
+}
+
+# 格式别名（请求参数 / Accept 头中的写法 -> 标准格式名）
+_FORMAT_ALIASES = {
+    "mpeg": "mp3",
+    "mp3": "mp3",
+    "ogg": "opus",
+    "opus": "opus",
+    "pcm": "pcm",
+    "l16": "pcm",
+    "wav": "wav",
+    "wave": "wav",
+    "x-wav": "wav",
+}
+
+DEFAULT_TTS_FORMAT = "mp3"
+
+
+def resolve_output_format(requested: Optional[str] = None, accept: Optional[str] = None) -> str:
+    """
+    根据请求参数或 Accept 头确定输出格式
+
+    显式的 format 参数优先；否则按 Accept 头的 q 值选择第一个支持的格式；
+    都没有时使用 TTS_FORMAT 配置（默认 mp3）
+
+    Args:
+        requested: 请求参数中的格式（如 'opus', 'mp3'）
+        accept: HTTP Accept 头
+
+    Returns:
+        str: 标准格式名（TTS_FORMATS 的键）
+    """
+    if requested:
+        fmt = _FORMAT_ALIASES.get(requested.strip().lower())
+        if fmt:
+            return fmt
+
+    if accept:
+        candidates = []
+        for index, part in enumerate(accept.split(",")):
+            media, _, params = part.strip().partition(";")
+            quality = 1.0
+            for param in params.split(";"):
+                key, _, value = param.strip().partition("=")
+                if key == "q":
+                    try:
+                        quality = float(value)
+                    except ValueError:
+                        quality = 0.0
+            subtype = media.strip().lower().split("/")[-1]
+            fmt = _FORMAT_ALIASES.get(subtype)
+            if fmt and quality > 0:
+                candidates.append((-quality, index, fmt))
+        if candidates:
+            return min(candidates)[2]
+
+    default = settings.TTS_FORMAT
+    return _FORMAT_ALIASES.get(default, DEFAULT_TTS_FORMAT)
+
+
+class AudioCache:
+    """
+    合成结果缓存（LRU，按总字节数限制）
+
+    键为 (model, voice, text, format)，同一段文本的不同格式变体分别缓存，
+    新格式请求可以直接从已缓存的变体转码而无需再次调用合成 API。
+    另按 (model, voice, text) 索引已缓存的格式，查找任意变体不需要遍历缓存
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._items: "OrderedDict[Tuple[str, str, str, str], bytes]" = OrderedDict()
+        # (model, voice, text) -> 已缓存的格式（按写入顺序，最后一个为最近写入）
+        self._variants: Dict[Tuple[str, str, str], Dict[str, None]] = {}
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, model: str, voice: str, text: str, fmt: str) -> Optional[bytes]:
+        key = (model, voice, text, fmt)
+        with self._lock:
+            data = self._items.get(key)
+            if data is not None:
+                self._items.move_to_end(key)
+            return data
+
+    def get_any(self, model: str, voice: str, text: str) -> Optional[Tuple[bytes, str]]:
+        """返回同一文本任意已缓存的格式变体（优先最近写入的）"""
+        with self._lock:
+            formats = self._variants.get((model, voice, text))
+            if not formats:
+                return None
+            fmt = next(reversed(formats))
+            key = (model, voice, text, fmt)
+            self._items.move_to_end(key)
+            return self._items[key], fmt
+
+    def put(self, model: str, voice: str, text: str, fmt: str, data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            return
+        key = (model, voice, text, fmt)
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._items[key] = data
+            self._size += len(data)
+            formats = self._variants.setdefault((model, voice, text), {})
+            formats.pop(fmt, None)
+            formats[fmt] = None
+            while self._size > self.max_bytes and self._items:
+                evicted_key, evicted = self._items.popitem(last=False)
+                self._size -= len(evicted)
+                self._forget(evicted_key)
+
+    def _forget(self, key: Tuple[str, str, str, str]) -> None:
+        """从格式索引中移除（调用方持有锁）"""
+        text_key = key[:3]
+        formats = self._variants.get(text_key)
+        if formats is not None:
+            formats.pop(key[3], None)
+            if not formats:
+                del self._variants[text_key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._variants.clear()
+            self._size = 0
+
+
+audio_cache = AudioCache(settings.TTS_CACHE_MAX_BYTES)
+
+
+def transcode_audio(data: bytes, src_format: str, dst_format: str) -> Optional[bytes]:
+    """
+    服务端音频转码
+
+    pcm <-> wav 使用标准库直接封装/解封装；其余格式依赖 ffmpeg，
+    未安装 ffmpeg 时返回 None
+
+    Args:
+        data: 源音频数据
+        src_format: 源格式
+        dst_format: 目标格式
+
+    Returns:
+        转码后的音频数据，失败返回 None
+    """
+    if src_format == dst_format:
+        return data
+
+    src = TTS_FORMATS[src_format]
+    dst = TTS_FORMATS[dst_format]
+
+    if src_format == "pcm" and dst_format == "wav" and src["sample_rate"] == dst["sample_rate"]:
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(src["sample_rate"])
+            wav_file.writeframes(data)
+        return buffer.getvalue()
+
+    if src_format == "wav" and dst_format == "pcm":
+        try:
+            with wave.open(io.BytesIO(data), "rb") as wav_file:
+                if wav_file.getframerate() == dst["sample_rate"] and wav_file.getsampwidth() == 2:
+                    return wav_file.readframes(wav_file.getnframes())
+        except wave.Error:
+            return None
+
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        return None
+
+    input_args = ["-f", "s16le", "-ar", str(src["sample_rate"]), "-ac", "1"] if src_format == "pcm" else []
+    output_args = {
+        "mp3": ["-f", "mp3", "-ar", str(dst["sample_rate"])],
+        "opus": ["-f", "ogg", "-c:a", "libopus", "-b:a", dst.get("bitrate", "32k"), "-ar", str(dst["sample_rate"])],
+        "pcm": ["-f", "s16le", "-ar", str(dst["sample_rate"])],
+        "wav": ["-f", "wav", "-ar", str(dst["sample_rate"])],
+    }[dst_format]
+
+    cmd = [ffmpeg, "-hide_banner", "-loglevel", "error", *input_args, "-i", "pipe:0", "-ac", "1", *output_args, "pipe:1"]
+    try:
+        result = subprocess.run(cmd, input=data, capture_output=True, timeout=15)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+
+    if result.returncode != 0 or not result.stdout:
+        return None
+    return result.stdout
 
 
 def generate_temp_token() -> Optional[Dict]:
@@ -22,7 +257,7 @@ def generate_temp_token() -> Optional[Dict]:
     Returns:
         包含 token 和过期时间的字典
     """
-    api_key = os.getenv("API_KEY")
+    api_key = settings.API_KEY
     if not api_key:
         raise ValueError("未配置 API_KEY")
     
@@ -31,17 +266,96 @@ def generate_temp_token() -> Optional[Dict]:
     # 1. 使用子账号 RAM 角色临时凭证
     # 2. 设置 IP 白名单
     # 3. 限制单日调用次数
-    print("🔑 返回 API Key（生产环境请使用更安全的方案）")
+    logger.warning("返回 API Key 作为 TTS Token（生产环境请使用更安全的方案）")
     return {
         "token": api_key,
         "expires_at": int(time.time()) + 3600  # 1小时后过期（仅用于前端判断）
     }
 
 
+def synthesize_speech_variant(
+    text: str,
+    model: str = None,
+    voice: str = None,
+    output_format: str = DEFAULT_TTS_FORMAT
+) -> Optional[Tuple[bytes, str]]:
+    """
+    按指定格式合成语音（带缓存和转码）
+
+    查找顺序：
+    1. 缓存中已有的目标格式
+    2. 缓存中同一文本的其他格式变体 -> 服务端转码（不再调用合成 API）
+    3. 调用合成 API，必要时转码
+
+    Args:
+        text: 要合成的文本
+        model: 模型名称（默认读取配置）
+        voice: 音色名称（默认读取配置）
+        output_format: 目标格式（TTS_FORMATS 的键）
+
+    Returns:
+        (音频数据, 实际格式)，失败返回 None。
+        无法转码时实际格式可能与请求的格式不同
+    """
+    if output_format not in TTS_FORMATS:
+        raise ValueError(f"不支持的音频格式: {output_format}")
+
+    if model is None:
+        model = settings.TTS_MODEL
+    if voice is None:
+        voice = settings.TTS_VOICE
+
+    with start_span("tts.synthesize", voice=voice, format=output_format) as span:
+        result = _synthesize_cached(text, model, voice, output_format, span)
+    return result
+
+
+def _synthesize_cached(
+    text: str,
+    model: str,
+    voice: str,
+    output_format: str,
+    span: Any
+) -> Optional[Tuple[bytes, str]]:
+    """synthesize_speech_variant 的缓存 / 转码 / 合成流程"""
+    cached = audio_cache.get(model, voice, text, output_format)
+    span.set_attribute("cache.hit", cached is not None)
+    if cached is not None:
+        CACHE_EVENTS.inc(cache="tts", result="hit")
+        return cached, output_format
+
+    variant = audio_cache.get_any(model, voice, text)
+    if variant is not None:
+        source_data, source_format = variant
+        converted = transcode_audio(source_data, source_format, output_format)
+        if converted:
+            CACHE_EVENTS.inc(cache="tts", result="transcoded")
+            audio_cache.put(model, voice, text, output_format, converted)
+            return converted, output_format
+
+    CACHE_EVENTS.inc(cache="tts", result="miss")
+    with TTS_LATENCY.time(voice=voice, format=output_format):
+        result = _synthesize_native(text, model, voice, output_format)
+    if result is None:
+        return None
+
+    audio_data, actual_format = result
+    audio_cache.put(model, voice, text, actual_format, audio_data)
+
+    if actual_format != output_format:
+        converted = transcode_audio(audio_data, actual_format, output_format)
+        if converted:
+            audio_cache.put(model, voice, text, output_format, converted)
+            return converted, output_format
+
+    return audio_data, actual_format
+
+
 def synthesize_speech(
     text: str,
     model: str = None,
-    voice: str = None
+    voice: str = None,
+    output_format: Optional[str] = None
 ) -> Optional[bytes]:
     """
     调用阿里云 CosyVoice API 进行语音合成
@@ -49,21 +363,26 @@ def synthesize_speech(
     
     Args:
         text: 要合成的文本
-        model: 模型名称（默认从环境变量读取）
-        voice: 音色名称（默认从环境变量读取）
+        model: 模型名称（默认读取配置）
+        voice: 音色名称（默认读取配置）
+        output_format: 输出格式（默认使用 SDK 默认格式）
         
     Returns:
         音频二进制数据，失败返回 None
     """
-    api_key = os.getenv("API_KEY")
+    if output_format is not None:
+        result = synthesize_speech_variant(text, model, voice, output_format)
+        return result[0] if result else None
+
+    api_key = settings.API_KEY
     if not api_key:
         raise ValueError("未配置 API_KEY")
     
-    # 从环境变量读取配置
+    # 从配置读取默认值
     if model is None:
-        model = os.getenv("TTS_MODEL", "cosyvoice-v3-flash")
+        model = settings.TTS_MODEL
     if voice is None:
-        voice = os.getenv("TTS_VOICE", "longanyang")
+        voice = settings.TTS_VOICE
     
     try:
         # 使用 DashScope SDK
@@ -74,8 +393,7 @@ def synthesize_speech(
         # 设置 API Key
         dashscope.api_key = api_key
         
-        print(f"🎤 调用 CosyVoice API: {text[:50]}...")
-        print(f"🎵 模型: {model}, 音色: {voice}")
+        logger.debug("调用 CosyVoice API: %s (模型: %s, 音色: %s)", text[:50], model, voice)
         
         # 创建合成器（使用默认格式，不指定 format 参数）
         synthesizer = SpeechSynthesizer(
@@ -87,31 +405,89 @@ def synthesize_speech(
         audio_data = synthesizer.call(text)
         
         if audio_data and isinstance(audio_data, bytes):
-            print(f"✅ 语音合成成功，大小: {len(audio_data)} 字节")
+            logger.debug("语音合成成功，大小: %d 字节", len(audio_data))
             return audio_data
         else:
-            print("❌ 语音合成失败：未返回数据或类型错误")
+            logger.warning("语音合成失败：未返回数据或类型错误")
             return None
             
     except ImportError:
-        print("❌ 未安装 dashscope，尝试使用 HTTP API...")
+        logger.warning("未安装 dashscope，尝试使用 HTTP API")
         return synthesize_speech_http(text, model, voice, api_key)
     except Exception as e:
-        print(f"❌ 语音合成异常: {str(e)}")
+        logger.warning("语音合成异常: %s", e)
         # 降级到 HTTP 方式
         return synthesize_speech_http(text, model, voice, api_key)
 
 
+def _synthesize_native(
+    text: str,
+    model: str,
+    voice: str,
+    output_format: str
+) -> Optional[Tuple[bytes, str]]:
+    """
+    直接向合成 API 请求指定格式
+
+    SDK 支持全部格式；HTTP 降级方案不支持的格式改为请求 mp3，由调用方转码
+
+    Returns:
+        (音频数据, 实际格式)，失败返回 None
+    """
+    api_key = settings.API_KEY
+    if not api_key:
+        raise ValueError("未配置 API_KEY")
+
+    spec = TTS_FORMATS[output_format]
+
+    # TTS_BACKEND=http 时跳过 SDK，直接使用 HTTP 接口（离线压测时指向本地模拟服务）
+    if settings.TTS_BACKEND != "http":
+        try:
+            import dashscope
+            from dashscope.audio.tts_v2 import SpeechSynthesizer, AudioFormat
+
+            dashscope.api_key = api_key
+
+            logger.debug("调用 CosyVoice API: %s (模型: %s, 音色: %s, 格式: %s)", text[:50], model, voice, output_format)
+            synthesizer = SpeechSynthesizer(
+                model=model,
+                voice=voice,
+                format=AudioFormat[spec["sdk_format"]]
+            )
+            audio_data = synthesizer.call(text)
+
+            if audio_data and isinstance(audio_data, bytes):
+                logger.debug("语音合成成功，大小: %d 字节", len(audio_data))
+                return audio_data, output_format
+            logger.warning("语音合成失败：未返回数据或类型错误")
+        except ImportError:
+            logger.warning("未安装 dashscope，尝试使用 HTTP API")
+        except Exception as e:
+            logger.warning("语音合成异常: %s", e)
+
+    http_format = spec["http_format"] or "mp3"
+    audio_data = synthesize_speech_http(
+        text, model, voice, api_key,
+        audio_format=http_format,
+        sample_rate=TTS_FORMATS[http_format]["sample_rate"]
+    )
+    if audio_data is None:
+        return None
+    return audio_data, http_format
+
+
 def synthesize_speech_http(
     text: str,
     model: str,
     voice: str,
-    api_key: str
+    api_key: str,
+    audio_format: str = "mp3",
+    sample_rate: int = 22050
 ) -> Optional[bytes]:
     """
     HTTP 方式调用（降级方案）
     """
-    url = os.getenv("TTS_API_URL", "https://dashscope.aliyuncs.com/api/v1/services/audio/tts/synthesis")
+    url = settings.TTS_API_URL
     
     headers = {
         "Authorization": f"Bearer {api_key}",
@@ -125,8 +501,8 @@ def synthesize_speech_http(
         },
         "parameters": {
             "voice": voice,
-            "format": "mp3",
-            "sample_rate": 22050,
+            "format": audio_format,
+            "sample_rate": sample_rate,
             "volume": 50,
             "speech_rate": 1.0,
             "pitch_rate": 1.0
@@ -134,32 +510,31 @@ def synthesize_speech_http(
     }
     
     try:
-        print(f"🎤 HTTP 降级：调用 {url}")
+        logger.debug("HTTP 降级：调用 %s", url)
         response = requests.post(url, headers=headers, json=payload, timeout=30)
         
         if response.status_code == 200:
             # 成功返回音频数据
             audio_data = response.content
-            print(f"✅ HTTP 方式合成成功，大小: {len(audio_data)} 字节")
+            logger.debug("HTTP 方式合成成功，大小: %d 字节", len(audio_data))
             return audio_data
         else:
-            print(f"❌ HTTP API 错误: {response.status_code}")
-            print(f"响应: {response.text}")
+            logger.warning("HTTP API 错误: %s, 响应: %.200s", response.status_code, response.text)
             return None
             
     except Exception as e:
-        print(f"❌ HTTP 请求异常: {str(e)}")
+        logger.warning("HTTP 请求异常: %s", e)
         return None
     
     try:
-        print(f"🎤 调用 CosyVoice API: {text[:50]}...")
+        logger.debug("调用 CosyVoice API: %s", text[:50])
         response = requests.post(url, headers=headers, json=payload, timeout=30)
         
         if response.status_code == 200:
             content_type = response.headers.get('Content-Type', '')
             
             if 'audio' in content_type or 'octet-stream' in content_type:
-                print(f"✅ 语音合成成功，大小: {len(response.content)} 字节")
+                logger.debug("语音合成成功，大小: %d 字节", len(response.content))
                 return response.content
             else:
                 try:
@@ -168,26 +543,26 @@ def synthesize_speech_http(
                         audio_url = result['output']['audio_url']
                         audio_response = requests.get(audio_url, timeout=10)
                         if audio_response.status_code == 200:
-                            print(f"✅ 语音合成成功（从URL），大小: {len(audio_response.content)} 字节")
+                            logger.debug("语音合成成功（从URL），大小: %d 字节", len(audio_response.content))
                             return audio_response.content
                     
-                    print(f"❌ API 返回格式不正确: {result}")
+                    logger.warning("API 返回格式不正确: %s", result)
                     return None
                 except Exception as e:
-                    print(f"❌ 解析响应失败: {e}")
+                    logger.warning("解析响应失败: %s", e)
                     return None
         else:
-            print(f"❌ API 调用失败: {response.status_code}")
+            logger.warning("API 调用失败: %s", response.status_code)
             try:
                 error_detail = response.json()
-                print(f"错误详情: {error_detail}")
+                logger.warning("错误详情: %s", error_detail)
             except:
-                print(f"响应内容: {response.text[:200]}")
+                logger.warning("响应内容: %.200s", response.text)
             return None
             
     except requests.Timeout:
-        print("❌ API 调用超时")
+        logger.warning("API 调用超时")
         return None
     except Exception as e:
-        print(f"❌ 语音合成异常: {str(e)}")
+        logger.warning("语音合成异常: %s", e)
         return None
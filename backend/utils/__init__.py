@@ -7,8 +7,17 @@ from .image_tool import (
     normalize_base64_image,
     get_image_size_estimate,
     validate_image_size,
-    clean_base64_string
+    clean_base64_string,
+    detect_image_format,
+    validate_image_bytes,
+    encode_image_bytes,
+    decode_base64_image,
+    compose_contact_sheet,
+    downscale_frames,
+    crop_to_region_of_interest,
+    preprocess_frames
 )
+from .frame_upload import is_binary_frame_request, parse_frame_upload, parse_frame_uploads
 
 __all__ = [
     "validate_base64_image",
@@ -16,5 +25,16 @@ __all__ = [
     "normalize_base64_image",
     "get_image_size_estimate",
     "validate_image_size",
-    "clean_base64_string"
+    "clean_base64_string",
+    "detect_image_format",
+    "validate_image_bytes",
+    "encode_image_bytes",
+    "decode_base64_image",
+    "compose_contact_sheet",
+    "downscale_frames",
+    "crop_to_region_of_interest",
+    "preprocess_frames",
+    "is_binary_frame_request",
+    "parse_frame_upload",
+    "parse_frame_uploads"
 ]
@@ -0,0 +1,327 @@
+"""
+准入控制
+保护共享的模型服务不被突发流量拖垮：
+
+1. 按客户端 IP 的令牌桶限流，超出返回 429（会话标识由客户端生成，不能作为限流依据；
+   部署在反向代理之后时配置 TRUSTED_PROXY_COUNT，从 X-Forwarded-For 中取可信代理记录的地址）
+2. 进程级并发上限，超出上限的请求排队等待
+3. 排队过长或等待超时时直接拒绝（503），并通过 Retry-After 提示客户端稍后重试
+4. 排队期间同一会话有更新的请求时（入口在排队前登记会话，见 scheduler.track_session）直接退出（409）
+
+并发上限与排队上限之和必须小于每个进程的请求线程数（SERVER_THREADS），否则请求在服务器的线程池外排队，
+准入控制永远不会拒绝
+
+与 Web 框架无关：Flask 应用在 before_request / teardown_request 中调用 acquire / release，
+Vercel 入口使用 admit() 上下文管理器。无服务器环境下每个实例独立计数
+"""
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, Mapping, Optional
+
+from backend.config import get_settings, on_reload
+from backend.utils.frame_upload import get_header
+from backend.utils.metrics import ADMISSION_EVENTS, ADMISSION_IN_FLIGHT, ADMISSION_QUEUE_DEPTH
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """令牌桶（调用方负责加锁）"""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """
+        取一个令牌
+
+        Returns:
+            float: 0 表示成功，否则为需要等待的秒数
+        """
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+
+@dataclass
+class Ticket:
+    """
+    准入结果
+
+    Attributes:
+        admitted: 是否放行
+        status: 拒绝时的 HTTP 状态码（429 限流 / 503 过载 / 409 被取代）
+        retry_after: 建议的重试等待时间（秒，向上取整；被取代时为 0）
+        reason: 拒绝原因（rate_limited / shed / timeout / superseded）
+        waited: 排队等待时间（秒）
+    """
+    admitted: bool
+    status: int = 200
+    retry_after: int = 0
+    reason: str = ""
+    waited: float = 0.0
+    controller: Optional["AdmissionController"] = field(default=None, repr=False)
+    started: float = field(default=0.0, repr=False)
+
+    def release(self) -> None:
+        """释放并发名额（重复调用无效）"""
+        controller, self.controller = self.controller, None
+        if controller is not None:
+            controller._release(self)
+
+    def error_body(self) -> Dict[str, Any]:
+        """限流 / 过载时的响应体（被取代时入口返回 scheduler.superseded_result()）"""
+        message = "请求过于频繁，请稍后重试" if self.status == 429 else "服务繁忙，请稍后重试"
+        return {
+            "success": False,
+            "error": message,
+            "reason": self.reason,
+            "retryAfter": self.retry_after
+        }
+
+    def headers(self) -> Dict[str, str]:
+        """拒绝时的响应头"""
+        return {"Retry-After": str(self.retry_after)} if not self.admitted and self.retry_after else {}
+
+
+class AdmissionController:
+    """
+    准入控制器（线程安全）
+
+    Args:
+        rate_per_minute: 每个客户端每分钟允许的请求数（0 表示不限流）
+        burst: 令牌桶容量（允许的突发请求数）
+        max_concurrency: 同时处理的请求上限（0 表示不限制）
+        max_queue: 排队请求上限，超出时直接拒绝
+        queue_timeout: 排队最长等待时间（秒）
+        max_clients: 记录的客户端数量上限（按最近使用淘汰）
+    """
+
+    def __init__(
+        self,
+        rate_per_minute: float = 12.0,
+        burst: int = 3,
+        max_concurrency: int = 6,
+        max_queue: int = 6,
+        queue_timeout: float = 10.0,
+        max_clients: int = 10000
+    ):
+        self.rate = rate_per_minute / 60.0
+        self.burst = max(burst, 1)
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_clients = max_clients
+
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._bucket_lock = threading.Lock()
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._waiting = 0
+        # 请求处理耗时的指数移动平均（秒），用于估算 Retry-After
+        self._service_time = 1.0
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting
+
+    def _check_rate(self, key: str, now: float) -> float:
+        if self.rate <= 0:
+            return 0.0
+        with self._bucket_lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.rate, self.burst, now)
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            return bucket.take(now)
+
+    def _estimate_wait(self) -> float:
+        """按当前排队长度估算需要等待的时间"""
+        slots = max(self.max_concurrency, 1)
+        return self._service_time * (self._waiting + 1) / slots
+
+    def _reject(self, status: int, reason: str, retry_after: float, waited: float = 0.0) -> Ticket:
+        ADMISSION_EVENTS.inc(result=reason)
+        return Ticket(False, status, max(int(math.ceil(retry_after)), 1), reason, waited)
+
+    def _wake(self) -> None:
+        with self._cond:
+            self._cond.notify_all()
+
+    def acquire(self, key: str, token: Optional[Any] = None) -> Ticket:
+        """
+        申请处理一个请求
+
+        Args:
+            key: 客户端标识
+            token: 本次请求的会话序号（scheduler.SessionToken，排队期间被取代时返回 409）
+
+        Returns:
+            Ticket: 放行时处理结束后必须调用 ticket.release()
+        """
+        now = time.monotonic()
+        wait = self._check_rate(key, now)
+        if wait > 0:
+            return self._reject(429, "rate_limited", wait)
+
+        if self.max_concurrency <= 0:
+            ADMISSION_EVENTS.inc(result="admitted")
+            return Ticket(True, controller=self, started=now)
+
+        with self._cond:
+            if self._in_flight >= self.max_concurrency:
+                if self._waiting >= self.max_queue:
+                    return self._reject(503, "shed", self._estimate_wait())
+
+                self._waiting += 1
+                ADMISSION_QUEUE_DEPTH.set(self._waiting)
+                deadline = now + self.queue_timeout
+                watch = token.watch(self._wake) if token is not None else nullcontext()
+                try:
+                    with watch:
+                        while self._in_flight >= self.max_concurrency:
+                            if token is not None and token.superseded:
+                                # 可能收到了 release 的唤醒，交给下一个等待者
+                                self._cond.notify()
+                                ADMISSION_EVENTS.inc(result="superseded")
+                                return Ticket(False, 409, 0, "superseded", time.monotonic() - now)
+                            remaining = deadline - time.monotonic()
+                            if remaining <= 0:
+                                return self._reject(503, "timeout", self._estimate_wait(), time.monotonic() - now)
+                            self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+                    ADMISSION_QUEUE_DEPTH.set(self._waiting)
+
+            self._in_flight += 1
+            ADMISSION_IN_FLIGHT.set(self._in_flight)
+
+        started = time.monotonic()
+        ADMISSION_EVENTS.inc(result="admitted")
+        return Ticket(True, waited=started - now, controller=self, started=started)
+
+    def _release(self, ticket: Ticket) -> None:
+        elapsed = time.monotonic() - ticket.started
+        if self.max_concurrency <= 0:
+            return
+        with self._cond:
+            self._service_time = 0.8 * self._service_time + 0.2 * elapsed
+            self._in_flight -= 1
+            ADMISSION_IN_FLIGHT.set(self._in_flight)
+            self._cond.notify()
+
+    @contextmanager
+    def admit(self, key: str, token: Optional[Any] = None) -> Iterator[Ticket]:
+        """
+        上下文管理器形式：退出时自动释放
+
+        用法:
+            with admission.admit(key) as ticket:
+                if not ticket.admitted:
+                    return 429 / 503 响应
+                ...
+        """
+        ticket = self.acquire(key, token)
+        try:
+            yield ticket
+        finally:
+            ticket.release()
+
+
+def client_key(
+    headers: Optional[Mapping[str, str]],
+    remote_addr: Optional[str] = None,
+    trusted_proxies: Optional[int] = None
+) -> str:
+    """
+    获取限流使用的客户端标识
+
+    使用连接地址；部署在 trusted_proxies 层可信反向代理之后时，使用 X-Forwarded-For 中
+    最外层可信代理记录的地址（从右往左第 trusted_proxies 个）。更靠左的地址由客户端填写，不可信
+
+    Args:
+        headers: 请求头
+        remote_addr: 连接地址
+        trusted_proxies: 可信反向代理层数（None 时使用 TRUSTED_PROXY_COUNT 配置）
+
+    Returns:
+        str: 客户端标识
+    """
+    if trusted_proxies is None:
+        trusted_proxies = get_settings().TRUSTED_PROXY_COUNT
+    if trusted_proxies > 0:
+        hops = [hop.strip() for hop in (get_header(headers, "X-Forwarded-For") or "").split(",")]
+        hops = [hop for hop in hops if hop]
+        if len(hops) >= trusted_proxies:
+            return f"ip:{hops[-trusted_proxies]}"
+    return f"ip:{remote_addr or 'unknown'}"
+
+
+_SETTING_NAMES = (
+    "RATE_LIMIT_PER_MINUTE",
+    "RATE_LIMIT_BURST",
+    "ADMISSION_MAX_CONCURRENCY",
+    "ADMISSION_MAX_QUEUE",
+    "ADMISSION_QUEUE_TIMEOUT",
+)
+
+_controller: Optional[AdmissionController] = None
+_controller_lock = threading.Lock()
+
+
+def _from_settings() -> AdmissionController:
+    config = get_settings()
+    if 0 < config.ADMISSION_MAX_CONCURRENCY and \
+            config.ADMISSION_MAX_CONCURRENCY + config.ADMISSION_MAX_QUEUE >= config.SERVER_THREADS:
+        logger.warning(
+            "ADMISSION_MAX_CONCURRENCY + ADMISSION_MAX_QUEUE (%d) 不小于 SERVER_THREADS (%d)，"
+            "过载时请求会在服务器线程池外排队而不会被拒绝",
+            config.ADMISSION_MAX_CONCURRENCY + config.ADMISSION_MAX_QUEUE, config.SERVER_THREADS
+        )
+    return AdmissionController(
+        rate_per_minute=config.RATE_LIMIT_PER_MINUTE,
+        burst=config.RATE_LIMIT_BURST,
+        max_concurrency=config.ADMISSION_MAX_CONCURRENCY,
+        max_queue=config.ADMISSION_MAX_QUEUE,
+        queue_timeout=config.ADMISSION_QUEUE_TIMEOUT,
+    )
+
+
+def get_admission_controller() -> AdmissionController:
+    """获取全局准入控制器（按配置创建）"""
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                _controller = _from_settings()
+    return _controller
+
+
+@on_reload
+def _rebuild_on_reload(old, new) -> None:
+    """限流配置变更后创建新的控制器（进行中的请求仍在原控制器上释放）"""
+    global _controller
+    if any(getattr(old, name) != getattr(new, name) for name in _SETTING_NAMES):
+        with _controller_lock:
+            _controller = None
+
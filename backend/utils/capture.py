@@ -0,0 +1,326 @@
+"""
+分析样本采集
+将发送给模型的画面（缩小后）和场景、统计信息、模型的解析结果写入本地样本库，
+用于训练更小的本地模型（蒸馏）或离线评估。配置 CAPTURE_DIR 后启用，默认关闭。
+
+样本库为只追加的分片文件：
+
+- frames-<pid>-<n>.bin: 图片数据依次拼接，单个分片超过 CAPTURE_SHARD_BYTES 后写入下一个分片
+- index-<pid>.jsonl: 每行一条样本记录（场景、统计信息、结果、各帧所在分片和位置）
+
+每个进程写入自己的文件，多个 worker 不需要加锁。相同内容的图片（SHA-256）只存储一次；
+同一会话中与上一条样本画面几乎相同（感知哈希汉明距离不超过 CAPTURE_DEDUP_DISTANCE）且结果相同的
+样本直接跳过（没有会话标识的样本无法判断来源，不做相似去重）。写入在后台线程中进行，队列满时丢弃样本，
+不影响请求耗时；样本库目录不可用时停止采集，之后提交的样本直接丢弃
+"""
+import hashlib
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from backend.config import get_settings, on_reload
+from backend.utils.frame_batch import hamming_distance
+from backend.utils.image_tool import downscale_frames
+from backend.utils.metrics import CAPTURE_EVENTS
+
+logger = logging.getLogger(__name__)
+
+# 相似去重时最多记住的会话数
+MAX_RECENT_SESSIONS = 4096
+
+
+@dataclass
+class CaptureSample:
+    """
+    一条待写入的样本
+
+    Attributes:
+        frames: 各帧图片二进制数据（按时间顺序）
+        hashes: 各帧感知哈希（未安装 Pillow 时为空，不做相似去重）
+        scene: 场景
+        stats: 请求中的统计信息
+        result: 模型的解析结果（status, message, confidence, shouldSpeak, frames）
+        session_id: 会话标识（只用于相似去重，不写入样本库）
+        created: 采集时间（Unix 时间戳）
+    """
+    frames: List[bytes]
+    hashes: List[int]
+    scene: str
+    stats: Dict[str, Any]
+    result: Dict[str, Any]
+    session_id: Optional[str] = None
+    created: float = field(default_factory=time.time)
+
+
+class CaptureStore:
+    """
+    只追加的样本库（单个后台写入线程）
+
+    Args:
+        directory: 样本库目录
+        max_side: 图片长边上限（像素，0 表示保存原图）
+        shard_bytes: 单个图片分片的大小上限（字节）
+        queue_size: 待写入队列长度
+        dedup_distance: 同一会话相邻样本视为重复的最大汉明距离（负数表示不做相似去重）
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_side: int = 384,
+        shard_bytes: int = 64 * 1024 * 1024,
+        queue_size: int = 256,
+        dedup_distance: int = 4
+    ):
+        self.directory = Path(directory)
+        self.max_side = max_side
+        self.shard_bytes = shard_bytes
+        self.dedup_distance = dedup_distance
+        self._queue: "queue.Queue[Optional[CaptureSample]]" = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        # 样本库目录不可用时停止采集
+        self._disabled = False
+        # 以下状态只在写入线程中访问
+        self._blobs: Dict[str, Dict[str, Any]] = {}
+        self._recent: "OrderedDict[str, Tuple[int, str]]" = OrderedDict()
+        self._shard = -1
+        self._shard_size = 0
+
+    def submit(self, sample: CaptureSample) -> bool:
+        """
+        提交样本（不阻塞，队列满时丢弃）
+
+        Returns:
+            bool: 是否已加入队列（样本库不可用时为 False）
+        """
+        if self._disabled:
+            CAPTURE_EVENTS.inc(result="dropped")
+            return False
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(sample)
+            return True
+        except queue.Full:
+            CAPTURE_EVENTS.inc(result="dropped")
+            return False
+
+    @property
+    def disabled(self) -> bool:
+        """样本库目录不可用，已停止采集"""
+        return self._disabled
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待已提交的样本全部写入
+
+        Returns:
+            bool: 是否在超时前写完
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def close(self, timeout: float = 5.0) -> None:
+        """写完队列中的样本后停止写入线程"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            try:
+                self._queue.put(None, timeout=timeout)
+            except queue.Full:
+                logger.warning("样本写入队列未清空，剩余样本丢弃")
+                return
+            thread.join(timeout)
+
+    def _ensure_started(self) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="capture-writer", daemon=True)
+                    self._thread.start()
+
+    def _run(self) -> None:
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._load_index()
+        except OSError as e:
+            logger.error("样本库目录不可用，停止采集: %s", e)
+            self._disabled = True
+        while True:
+            sample = self._queue.get()
+            try:
+                if sample is None:
+                    return
+                if self._disabled:
+                    # 停止采集前已在队列中的样本
+                    CAPTURE_EVENTS.inc(result="dropped")
+                    continue
+                CAPTURE_EVENTS.inc(result=self._write(sample))
+            except Exception as e:
+                CAPTURE_EVENTS.inc(result="error")
+                logger.warning("写入样本失败: %s", e)
+            finally:
+                self._queue.task_done()
+
+    def _load_index(self) -> None:
+        """读取已有的索引，恢复图片去重表（包括其他进程写入的样本）"""
+        pid = os.getpid()
+        for record in iter_records(self.directory):
+            for frame in record.get("frames", []):
+                self._blobs.setdefault(frame["sha256"], frame)
+        prefix = f"frames-{pid}-"
+        shards = [
+            int(path.stem[len(prefix):]) for path in self.directory.glob(f"{prefix}*.bin")
+            if path.stem[len(prefix):].isdigit()
+        ]
+        if shards:
+            self._shard = max(shards)
+            self._shard_size = (self.directory / f"{prefix}{self._shard}.bin").stat().st_size
+
+    def _write(self, sample: CaptureSample) -> str:
+        # 相似去重：同一会话的画面和结果都没有变化时不增加信息量（没有会话标识时不去重，
+        # 否则不同客户端的样本会互相比较）
+        status = str(sample.result.get("status", ""))
+        key = sample.session_id
+        if key and sample.hashes and self.dedup_distance >= 0:
+            previous = self._recent.pop(key, None)
+            self._recent[key] = (sample.hashes[-1], status)
+            if len(self._recent) > MAX_RECENT_SESSIONS:
+                self._recent.popitem(last=False)
+            if previous is not None and previous[1] == status and \
+                    hamming_distance(previous[0], sample.hashes[-1]) <= self.dedup_distance:
+                return "duplicate"
+
+        frames = (self.max_side and downscale_frames(sample.frames, self.max_side)) or sample.frames
+        refs = [self._store_blob(frame) for frame in frames]
+        record = {
+            "time": round(sample.created, 3),
+            "scene": sample.scene,
+            "stats": sample.stats,
+            "result": sample.result,
+            "dhash": [f"{value:016x}" for value in sample.hashes],
+            "frames": refs,
+        }
+        with open(self.directory / f"index-{os.getpid()}.jsonl", "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+        return "written"
+
+    def _store_blob(self, data: bytes) -> Dict[str, Any]:
+        """写入一张图片（内容相同的图片只写一次），返回其位置"""
+        digest = hashlib.sha256(data).hexdigest()
+        ref = self._blobs.get(digest)
+        if ref is not None:
+            return ref
+
+        if self._shard < 0 or self._shard_size + len(data) > self.shard_bytes:
+            self._shard += 1
+            self._shard_size = 0
+        name = f"frames-{os.getpid()}-{self._shard}.bin"
+        with open(self.directory / name, "ab") as f:
+            offset = f.tell()
+            f.write(data)
+        self._shard_size = offset + len(data)
+        ref = self._blobs[digest] = {"sha256": digest, "shard": name, "offset": offset, "length": len(data)}
+        return ref
+
+
+def iter_records(directory: os.PathLike) -> Iterator[Dict[str, Any]]:
+    """
+    依次读取样本库中的全部记录（合并各进程的索引）
+
+    Args:
+        directory: 样本库目录
+
+    Yields:
+        Dict: 样本记录（time, scene, stats, result, dhash, frames）
+    """
+    for path in sorted(Path(directory).glob("index-*.jsonl")):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                # 进程异常退出时最后一行可能不完整
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def load_frame(directory: os.PathLike, ref: Dict[str, Any]) -> bytes:
+    """
+    读取样本记录中的一帧图片
+
+    Args:
+        directory: 样本库目录
+        ref: 记录中 frames 列表的元素
+
+    Returns:
+        bytes: 图片二进制数据
+    """
+    with open(Path(directory) / ref["shard"], "rb") as f:
+        f.seek(ref["offset"])
+        return f.read(ref["length"])
+
+
+_store: Optional[CaptureStore] = None
+_store_lock = threading.Lock()
+
+
+def get_capture_store() -> Optional[CaptureStore]:
+    """获取全局样本库（未配置 CAPTURE_DIR 时为 None）"""
+    global _store
+    config = get_settings()
+    if not config.CAPTURE_DIR:
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = CaptureStore(
+                    config.CAPTURE_DIR,
+                    config.CAPTURE_MAX_SIDE,
+                    config.CAPTURE_SHARD_BYTES,
+                    dedup_distance=config.CAPTURE_DEDUP_DISTANCE
+                )
+    return _store
+
+
+def capture_sample(sample: CaptureSample) -> bool:
+    """
+    便捷函数：按 CAPTURE_SAMPLE_RATE 采样后提交样本
+
+    Returns:
+        bool: 是否已提交
+    """
+    store = get_capture_store()
+    if store is None or random.random() >= get_settings().CAPTURE_SAMPLE_RATE:
+        return False
+    return store.submit(sample)
+
+
+def close_capture_store() -> None:
+    """写完剩余样本并停止写入线程（进程退出时调用）"""
+    global _store
+    with _store_lock:
+        store, _store = _store, None
+    if store is not None:
+        store.close()
+
+
+_SETTING_NAMES = ("CAPTURE_DIR", "CAPTURE_MAX_SIDE", "CAPTURE_SHARD_BYTES", "CAPTURE_DEDUP_DISTANCE")
+
+
+@on_reload
+def _rebuild_on_reload(old, new) -> None:
+    """样本库配置变更后关闭原写入线程，下次采集时按新配置创建"""
+    if any(getattr(old, name) != getattr(new, name) for name in _SETTING_NAMES):
+        close_capture_store()
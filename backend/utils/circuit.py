@@ -0,0 +1,120 @@
+"""
+模型服务熔断器
+模型服务连续调用失败达到 CIRCUIT_FAILURE_THRESHOLD 次后熔断（open）：
+之后的请求不再调用模型、也不再等待超时，由调用方直接使用本地降级分类。
+熔断 CIRCUIT_RESET_TIMEOUT 秒后放行一次探测调用（half_open），成功则恢复（closed），失败则继续熔断
+"""
+import logging
+import threading
+import time
+from typing import Callable, Optional
+
+from backend.config import get_settings, on_reload
+from backend.utils.metrics import MODEL_CIRCUIT_OPEN
+
+logger = logging.getLogger(__name__)
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitOpen(Exception):
+    """熔断中，本次请求没有调用模型"""
+
+
+class CircuitBreaker:
+    """
+    连续失败熔断器（线程安全）
+
+    Args:
+        failure_threshold: 连续失败多少次后熔断（0 表示不熔断）
+        reset_timeout: 熔断后多久（秒）放行一次探测调用
+        clock: 时钟函数（测试时替换）
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 3,
+        reset_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = STATE_CLOSED
+        self._failures = 0
+        self._opened = 0.0
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def allow(self) -> bool:
+        """
+        本次调用是否可以发往模型服务
+
+        Returns:
+            bool: 未熔断，或熔断已超过 reset_timeout 且本次为探测调用时为 True
+        """
+        with self._lock:
+            if self._state == STATE_CLOSED:
+                return True
+            if self._state == STATE_OPEN and self._clock() - self._opened >= self.reset_timeout:
+                # 只放行一次探测调用，结果返回前其他请求仍视为熔断
+                self._state = STATE_HALF_OPEN
+                return True
+            return False
+
+    def record_success(self) -> None:
+        """记录一次成功调用"""
+        with self._lock:
+            if self._state != STATE_CLOSED:
+                logger.info("模型服务已恢复，关闭熔断")
+            self._state = STATE_CLOSED
+            self._failures = 0
+        MODEL_CIRCUIT_OPEN.set(0)
+
+    def record_failure(self) -> None:
+        """记录一次失败调用"""
+        with self._lock:
+            self._failures += 1
+            if self._state == STATE_HALF_OPEN or (
+                self.failure_threshold > 0 and self._failures >= self.failure_threshold
+            ):
+                if self._state != STATE_OPEN:
+                    logger.warning(
+                        "模型服务连续失败 %d 次，熔断 %.0f 秒", self._failures, self.reset_timeout
+                    )
+                self._state = STATE_OPEN
+                self._opened = self._clock()
+            opened = self._state == STATE_OPEN
+        if opened:
+            MODEL_CIRCUIT_OPEN.set(1)
+
+
+_circuit: Optional[CircuitBreaker] = None
+_circuit_lock = threading.Lock()
+
+
+def get_model_circuit() -> CircuitBreaker:
+    """获取模型服务熔断器（按配置创建）"""
+    global _circuit
+    if _circuit is None:
+        with _circuit_lock:
+            if _circuit is None:
+                config = get_settings()
+                _circuit = CircuitBreaker(config.CIRCUIT_FAILURE_THRESHOLD, config.CIRCUIT_RESET_TIMEOUT)
+    return _circuit
+
+
+@on_reload
+def _rebuild_on_reload(old, new) -> None:
+    """熔断配置或模型服务变更后重新开始计数"""
+    names = ("CIRCUIT_FAILURE_THRESHOLD", "CIRCUIT_RESET_TIMEOUT", "API_BASE", "API_KEY", "MODEL_NAME")
+    global _circuit
+    if any(getattr(old, name) != getattr(new, name) for name in names):
+        with _circuit_lock:
+            _circuit = None
+        MODEL_CIRCUIT_OPEN.set(0)
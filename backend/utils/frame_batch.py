@@ -0,0 +1,265 @@
+"""
+批量帧预处理
+一次请求的多帧（连拍）一起解码为小尺寸灰度探针图，再按批计算：
+
+- 亮度（判断画面过暗 / 过曝，如摄像头被遮挡、关灯）
+- 感知哈希（dHash，64 位，相似画面的哈希汉明距离小）
+- 区域检测使用的边缘能量分布（连拍时叠加相邻帧差异）
+
+JPEG 按探针尺寸降采样解码（draft 模式，DCT 缩放），不解码完整分辨率。
+安装 NumPy 时各帧只做降采样解码并写入预分配的 RGB 数组，之后的灰度转换、缩放到探针尺寸
+（面积平均）、dHash 的 9x8 降采样和统计都对整批数组做向量化运算；否则逐帧使用 Pillow 计算。
+两种方式都使用面积平均缩放，结果只有取整误差。需要 Pillow，未安装时 load_batch 返回 None
+"""
+import io
+from dataclasses import dataclass
+from typing import Any, List, Optional, Tuple
+
+# 探针图宽度（像素）
+PROBE_WIDTH = 64
+
+# 平均亮度（0-255）低于 / 高于该值视为过暗 / 过曝
+DARK_THRESHOLD = 25.0
+BRIGHT_THRESHOLD = 235.0
+
+
+@dataclass
+class FrameBatch:
+    """
+    一批帧的探针统计
+
+    Attributes:
+        size: 原图尺寸 (width, height)
+        probe_size: 探针图尺寸 (width, height)
+        brightness: 各帧平均亮度（0-255）
+        hashes: 各帧 64 位 dHash
+        columns / rows: 边缘能量按列 / 行的分布（最外圈为 0）
+        total: 边缘能量总和
+    """
+    size: Tuple[int, int]
+    probe_size: Tuple[int, int]
+    brightness: List[float]
+    hashes: List[int]
+    columns: List[float]
+    rows: List[float]
+    total: float
+
+    @property
+    def dark(self) -> bool:
+        """所有帧都过暗"""
+        return all(value < DARK_THRESHOLD for value in self.brightness)
+
+    @property
+    def overexposed(self) -> bool:
+        """所有帧都过曝"""
+        return all(value > BRIGHT_THRESHOLD for value in self.brightness)
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """两个感知哈希的汉明距离（0 表示画面几乎相同）"""
+    return bin(a ^ b).count("1")
+
+
+def _numpy() -> Any:
+    """NumPy 模块（未安装时为 None）"""
+    try:
+        import numpy as np
+    except ImportError:
+        return None
+    return np
+
+
+def _probe_height(size: Tuple[int, int], probe_width: int) -> int:
+    return max(round(probe_width * size[1] / size[0]), 8)
+
+
+def _open_probe(frame: bytes, probe_width: int, probe_height: Optional[int]) -> Tuple[Tuple[int, int], Any]:
+    """按探针尺寸解码一帧，返回 (原图尺寸, 灰度探针图)（逐帧计算时使用）"""
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(frame))
+    size = image.size
+    if probe_height is None:
+        probe_height = _probe_height(size, probe_width)
+    # JPEG 直接以缩小的比例解码（DCT 缩放），其他格式无效果
+    image.draft("L", (probe_width * 4, probe_height * 4))
+    return size, image.convert("L").resize((probe_width, probe_height), Image.BOX)
+
+
+def _load_stack(np: Any, frames: List[bytes], probe_width: int) -> Optional[Tuple[Tuple[int, int], Any]]:
+    """
+    逐帧降采样解码，写入预分配的 RGB 数组（只有解码逐帧进行）
+
+    Returns:
+        (原图尺寸, uint8 数组 [帧, 高, 宽, 3])；各帧原图尺寸不一致时为 None
+    """
+    from PIL import Image
+
+    size = None
+    stack = None
+    for index, frame in enumerate(frames):
+        image = Image.open(io.BytesIO(frame))
+        if size is None:
+            size = image.size
+            draft_size = (probe_width * 4, _probe_height(size, probe_width) * 4)
+        elif image.size != size:
+            return None
+        image.draft("RGB", draft_size)
+        image = image.convert("RGB")
+        if stack is None:
+            stack = np.empty((len(frames), image.height, image.width, 3), dtype=np.uint8)
+        elif image.size != (stack.shape[2], stack.shape[1]):
+            # 格式不同（如 JPEG 与 PNG 混合）时降采样比例不同
+            image = image.resize((stack.shape[2], stack.shape[1]), Image.BOX)
+        stack[index] = np.asarray(image)
+    return size, stack
+
+
+def _area_weights(np: Any, source: int, target: int) -> Any:
+    """面积平均缩放矩阵（target x source），每行为目标像素覆盖的各源像素的面积占比"""
+    edges = np.arange(target + 1) * (source / target)
+    left = np.arange(source)
+    overlap = np.minimum(edges[1:, None], left + 1) - np.maximum(edges[:-1, None], left)
+    overlap = np.clip(overlap, 0.0, None)
+    return overlap / overlap.sum(axis=1, keepdims=True)
+
+
+def _resize_stack(np: Any, stack: Any, width: int, height: int) -> Any:
+    """整批面积平均缩放（[帧, 高, 宽] -> [帧, height, width]）"""
+    rows = _area_weights(np, stack.shape[1], height)
+    columns = _area_weights(np, stack.shape[2], width)
+    return rows @ stack @ columns.T
+
+
+def _batch_numpy(
+    np: Any,
+    stack: Any,
+    probe_size: Tuple[int, int]
+) -> Tuple[List[float], List[int], List[float], List[float]]:
+    """
+    向量化计算整批的探针图、亮度、dHash 和边缘能量分布
+
+    Args:
+        stack: 降采样解码后的 RGB 数组 [帧, 高, 宽, 3]
+        probe_size: 探针图尺寸 (宽, 高)
+
+    Returns:
+        (亮度, dHash, 按列 / 按行的边缘能量)
+    """
+    count = stack.shape[0]
+    width, height = probe_size
+
+    # 灰度（与 Pillow convert("L") 相同的 ITU-R 601 权重），缩放到探针尺寸后取整
+    gray = stack @ np.array([0.299, 0.587, 0.114])
+    probes = np.rint(_resize_stack(np, gray, width, height))
+    brightness = probes.mean(axis=(1, 2))
+
+    # dHash：缩放到 9x8 后每行相邻像素比较，得到 8x8 位
+    small = np.rint(_resize_stack(np, probes, 9, 8))
+    bits = (small[:, :, 1:] > small[:, :, :-1]).reshape(count, 64)
+    hashes = [int.from_bytes(row.tobytes(), "big") for row in np.packbits(bits, axis=1)]
+
+    # 与 Pillow FIND_EDGES 相同的 3x3 拉普拉斯（负值截为 0），只计算内部像素
+    window = sum(
+        probes[:, dy:dy + height - 2, dx:dx + width - 2]
+        for dy in range(3) for dx in range(3)
+    )
+    edges = np.clip(9 * probes[:, 1:-1, 1:-1] - window, 0, 255)
+    energy = edges.max(axis=0)
+    if count > 1:
+        motion = np.abs(probes[1:] - probes[:-1])[:, 1:-1, 1:-1].max(axis=0)
+        energy = np.maximum(energy, motion)
+
+    columns = np.zeros(width)
+    rows = np.zeros(height)
+    columns[1:-1] = energy.sum(axis=0)
+    rows[1:-1] = energy.sum(axis=1)
+    return brightness.tolist(), hashes, columns.tolist(), rows.tolist()
+
+
+def _batch_pillow(probes: List[Any]) -> Tuple[List[float], List[int], List[float], List[float]]:
+    """逐帧使用 Pillow 计算亮度、dHash 和边缘能量分布"""
+    from PIL import Image, ImageChops, ImageFilter, ImageStat
+
+    width, height = probes[0].size
+    brightness = [ImageStat.Stat(probe).mean[0] for probe in probes]
+
+    hashes = []
+    for probe in probes:
+        pixels = probe.resize((9, 8), Image.BOX).tobytes()
+        value = 0
+        for y in range(8):
+            for x in range(8):
+                value = (value << 1) | (pixels[y * 9 + x + 1] > pixels[y * 9 + x])
+        hashes.append(value)
+
+    energy = None
+    for index, probe in enumerate(probes):
+        layer = probe.filter(ImageFilter.FIND_EDGES)
+        if index:
+            layer = ImageChops.lighter(layer, ImageChops.difference(probe, probes[index - 1]))
+        energy = layer if energy is None else ImageChops.lighter(energy, layer)
+
+    # 忽略最外圈像素（边缘检测在图像边界上不可靠）
+    pixels = energy.tobytes()
+    columns = [0.0] * width
+    rows = [0.0] * height
+    for y in range(1, height - 1):
+        offset = y * width
+        for x in range(1, width - 1):
+            value = pixels[offset + x]
+            columns[x] += value
+            rows[y] += value
+    return brightness, hashes, columns, rows
+
+
+def load_batch(frames: List[bytes], probe_width: int = PROBE_WIDTH) -> Optional[FrameBatch]:
+    """
+    解码一批帧并计算探针统计
+
+    Args:
+        frames: 各帧图片二进制数据（按时间顺序）
+        probe_width: 探针图宽度
+
+    Returns:
+        Optional[FrameBatch]: 探针统计；未安装 Pillow、无法解码或各帧尺寸不一致时为 None
+    """
+    if not frames:
+        return None
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        return None
+
+    np = _numpy()
+    try:
+        if np is not None:
+            loaded = _load_stack(np, frames, probe_width)
+            if loaded is None:
+                return None
+            size, stack = loaded
+            probe_size = (probe_width, _probe_height(size, probe_width))
+            stats = _batch_numpy(np, stack, probe_size)
+        else:
+            size, first = _open_probe(frames[0], probe_width, None)
+            probes = [first]
+            for frame in frames[1:]:
+                frame_size, probe = _open_probe(frame, probe_width, first.size[1])
+                if frame_size != size:
+                    return None
+                probes.append(probe)
+            probe_size = first.size
+            stats = _batch_pillow(probes)
+    except Exception:
+        return None
+
+    brightness, hashes, columns, rows = stats
+    return FrameBatch(
+        size=size,
+        probe_size=probe_size,
+        brightness=[float(value) for value in brightness],
+        hashes=hashes,
+        columns=columns,
+        rows=rows,
+        total=float(sum(rows)),
+    )
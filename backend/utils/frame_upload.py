@@ -0,0 +1,151 @@
+"""
+二进制帧上传解析
+支持 multipart/form-data 和原始 image/* 请求体，避免 Base64 JSON 的体积和解析开销
+"""
+import json
+from email.parser import BytesParser
+from email.policy import HTTP
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+from urllib.parse import unquote
+
+# 原始图片请求体中携带统计信息的请求头
+STATS_HEADER = "X-FocusEye-Stats"
+
+
+def is_binary_frame_request(content_type: Optional[str]) -> bool:
+    """
+    判断请求是否为二进制帧上传
+    
+    Args:
+        content_type: Content-Type 请求头
+        
+    Returns:
+        bool: multipart/form-data 或 image/* 时为 True
+    """
+    if not content_type:
+        return False
+    
+    mimetype = content_type.split(";", 1)[0].strip().lower()
+    return mimetype == "multipart/form-data" or mimetype.startswith("image/")
+
+
+def get_header(headers: Optional[Mapping[str, str]], name: str) -> Optional[str]:
+    """大小写不敏感地读取请求头"""
+    if not headers:
+        return None
+    
+    value = headers.get(name)
+    if value is not None:
+        return value
+    
+    lowered = name.lower()
+    for key, value in headers.items():
+        if key.lower() == lowered:
+            return value
+    return None
+
+
+def parse_stats(raw: Optional[str]) -> Optional[Dict[str, Any]]:
+    """
+    解析统计信息 JSON（请求头中允许 URL 编码，以便携带非 ASCII 字符）
+    
+    Args:
+        raw: JSON 字符串
+        
+    Returns:
+        Optional[Dict]: 统计信息，为空时返回 None
+        
+    Raises:
+        ValueError: JSON 格式错误
+    """
+    if not raw:
+        return None
+    
+    raw = raw.strip()
+    if not raw.startswith("{"):
+        raw = unquote(raw)
+    
+    stats = json.loads(raw)
+    if not isinstance(stats, dict):
+        raise ValueError("stats 必须是 JSON 对象")
+    return stats
+
+
+def parse_frame_uploads(
+    content_type: str,
+    body: bytes,
+    headers: Optional[Mapping[str, str]] = None
+) -> Tuple[List[bytes], Optional[Dict[str, Any]]]:
+    """
+    从二进制上传请求中提取图片（支持连拍多帧）和统计信息
+    
+    - image/*：请求体即图片，统计信息放在 X-FocusEye-Stats 请求头
+    - multipart/form-data：image 字段为图片（连拍时按时间顺序重复 image 字段），stats 字段为 JSON
+    
+    Args:
+        content_type: Content-Type 请求头（multipart 需包含 boundary）
+        body: 原始请求体
+        headers: 请求头
+        
+    Returns:
+        Tuple[List[bytes], Optional[Dict]]: (各帧图片二进制, 统计信息)
+        
+    Raises:
+        ValueError: 请求格式错误或缺少图片
+    """
+    mimetype = content_type.split(";", 1)[0].strip().lower()
+    
+    if mimetype.startswith("image/"):
+        if not body:
+            raise ValueError("缺少图片数据")
+        return [body], parse_stats(get_header(headers, STATS_HEADER))
+    
+    if mimetype != "multipart/form-data":
+        raise ValueError(f"不支持的 Content-Type: {content_type}")
+    
+    message = BytesParser(policy=HTTP).parsebytes(
+        b"Content-Type: " + content_type.encode("latin-1") + b"\r\n\r\n" + body
+    )
+    if not message.is_multipart():
+        raise ValueError("multipart 请求格式错误")
+    
+    frames: List[bytes] = []
+    stats_raw = None
+    for part in message.iter_parts():
+        name = part.get_param("name", header="content-disposition")
+        if name == "image":
+            payload = part.get_payload(decode=True)
+            if payload:
+                frames.append(payload)
+        elif name == "stats":
+            payload = part.get_payload(decode=True) or b""
+            stats_raw = payload.decode(part.get_content_charset() or "utf-8")
+    
+    if not frames:
+        raise ValueError("缺少 image 字段")
+    
+    stats = parse_stats(stats_raw) if stats_raw else parse_stats(get_header(headers, STATS_HEADER))
+    return frames, stats
+
+
+def parse_frame_upload(
+    content_type: str,
+    body: bytes,
+    headers: Optional[Mapping[str, str]] = None
+) -> Tuple[bytes, Optional[Dict[str, Any]]]:
+    """
+    从二进制上传请求中提取单张图片和统计信息（多帧时取第一帧，见 parse_frame_uploads）
+    
+    Args:
+        content_type: Content-Type 请求头（multipart 需包含 boundary）
+        body: 原始请求体
+        headers: 请求头
+        
+    Returns:
+        Tuple[bytes, Optional[Dict]]: (图片二进制, 统计信息)
+        
+    Raises:
+        ValueError: 请求格式错误或缺少图片
+    """
+    frames, stats = parse_frame_uploads(content_type, body, headers)
+    return frames[0], stats
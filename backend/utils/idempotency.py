@@ -0,0 +1,205 @@
+"""
+幂等请求结果缓存
+客户端为每次检查生成 Idempotency-Key，网络重试时沿用同一个键：
+
+- 原请求已完成：直接返回缓存的结果
+- 原请求仍在处理：等待原请求完成后返回同一结果
+
+因此重试不会再次调用模型。只缓存成功的结果，失败的请求重试时重新处理。
+
+每个键同时记录请求内容的指纹（图片、统计信息和布局的 SHA-256），同一个键携带不同内容时
+抛出 IdempotencyConflict（接口返回 422），不会把其他请求的结果返回给客户端。
+幂等键按会话隔离；没有会话标识的请求不使用幂等缓存，避免不同客户端共用同一个键空间
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple, Union
+
+from backend.config import get_settings, on_reload
+from backend.utils.metrics import CACHE_EVENTS
+
+# 幂等键请求头 / 请求体字段
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_FIELD = "idempotencyKey"
+
+
+class IdempotencyConflict(Exception):
+    """同一个幂等键被用于内容不同的请求"""
+
+
+class _Entry:
+    __slots__ = ("done", "result", "expires", "fingerprint")
+
+    def __init__(self, fingerprint: Optional[str] = None):
+        self.done = threading.Event()
+        self.result: Optional[Dict[str, Any]] = None
+        self.expires = float("inf")
+        self.fingerprint = fingerprint
+
+
+class IdempotencyCache:
+    """
+    幂等结果缓存（线程安全，按最近使用淘汰）
+
+    Args:
+        ttl: 结果保留时间（秒，0 表示不缓存）
+        max_entries: 最多保留的键数量
+        wait_timeout: 等待进行中的原请求的最长时间（秒），超时后自行处理
+    """
+
+    def __init__(self, ttl: float = 120.0, max_entries: int = 1024, wait_timeout: float = 60.0):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.wait_timeout = wait_timeout
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _prune(self, now: float) -> None:
+        """移除过期的键，超出数量上限时淘汰最久未使用的已完成结果"""
+        for key in [key for key, entry in self._entries.items() if entry.expires <= now]:
+            del self._entries[key]
+        while len(self._entries) > self.max_entries:
+            key = next((key for key, entry in self._entries.items() if entry.done.is_set()), None)
+            if key is None:
+                break
+            del self._entries[key]
+
+    def run(
+        self,
+        key: str,
+        compute: Callable[[], Dict[str, Any]],
+        fingerprint: Optional[str] = None
+    ) -> Tuple[Dict[str, Any], str]:
+        """
+        按幂等键执行请求
+
+        Args:
+            key: 幂等键（调用方负责加上客户端范围）
+            compute: 实际处理函数
+            fingerprint: 请求内容指纹（见 request_fingerprint），与原请求不同时拒绝
+
+        Returns:
+            Tuple[Dict, str]: (结果, 来源：miss 首次处理 / hit 已完成的结果 / joined 等待进行中的原请求)
+
+        Raises:
+            IdempotencyConflict: 幂等键已用于内容不同的请求
+        """
+        if self.ttl <= 0:
+            return compute(), "miss"
+
+        with self._lock:
+            now = time.monotonic()
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires <= now:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                entry = self._entries[key] = _Entry(fingerprint)
+                self._prune(now)
+                owner = True
+            elif fingerprint is not None and entry.fingerprint is not None and entry.fingerprint != fingerprint:
+                CACHE_EVENTS.inc(cache="idempotency", result="conflict")
+                raise IdempotencyConflict("幂等键已用于内容不同的请求")
+            else:
+                self._entries.move_to_end(key)
+                owner = False
+
+        if not owner:
+            finished = entry.done.is_set()
+            if entry.done.wait(self.wait_timeout) and entry.result is not None:
+                source = "hit" if finished else "joined"
+                CACHE_EVENTS.inc(cache="idempotency", result=source)
+                return dict(entry.result), source
+            CACHE_EVENTS.inc(cache="idempotency", result="miss")
+            return compute(), "miss"
+
+        CACHE_EVENTS.inc(cache="idempotency", result="miss")
+        result = None
+        try:
+            result = compute()
+            return result, "miss"
+        finally:
+            with self._lock:
+                entry.result = dict(result) if result is not None else None
+                if result is not None and result.get("success"):
+                    entry.expires = time.monotonic() + self.ttl
+                elif self._entries.get(key) is entry:
+                    del self._entries[key]
+            entry.done.set()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def scoped_key(key: Optional[str], session_id: Optional[str] = None) -> Optional[str]:
+    """
+    生成缓存使用的幂等键（按会话隔离，避免不同客户端的键冲突）
+
+    Args:
+        key: 客户端传入的幂等键
+        session_id: 会话标识
+
+    Returns:
+        Optional[str]: 缓存键，未传入幂等键或没有会话标识时为 None（不使用幂等缓存）
+    """
+    key = (key or "").strip()
+    session_id = (session_id or "").strip()
+    if not key or not session_id:
+        return None
+    return f"{session_id[:64]}\n{key[:128]}"
+
+
+def request_fingerprint(
+    frames: Sequence[Union[str, bytes]],
+    stats: Optional[Dict[str, Any]] = None,
+    layout: Optional[str] = None
+) -> str:
+    """
+    计算分析请求内容的指纹
+
+    Args:
+        frames: 各帧图片（Base64 字符串或二进制数据）
+        stats: 统计信息
+        layout: 连拍布局
+
+    Returns:
+        str: SHA-256 十六进制摘要
+    """
+    digest = hashlib.sha256()
+    for frame in frames:
+        data = frame.encode("utf-8") if isinstance(frame, str) else bytes(frame)
+        digest.update(len(data).to_bytes(8, "big"))
+        digest.update(data)
+    digest.update(json.dumps([stats, layout], sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+
+_cache: Optional[IdempotencyCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_idempotency_cache() -> IdempotencyCache:
+    """获取全局幂等结果缓存（按配置创建）"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                config = get_settings()
+                _cache = IdempotencyCache(config.IDEMPOTENCY_TTL, config.IDEMPOTENCY_MAX_ENTRIES)
+    return _cache
+
+
+@on_reload
+def _rebuild_on_reload(old, new) -> None:
+    """缓存配置变更后创建新的缓存"""
+    global _cache
+    if (old.IDEMPOTENCY_TTL, old.IDEMPOTENCY_MAX_ENTRIES) != (new.IDEMPOTENCY_TTL, new.IDEMPOTENCY_MAX_ENTRIES):
+        with _cache_lock:
+            _cache = None
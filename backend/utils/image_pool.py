@@ -0,0 +1,182 @@
+"""
+图片处理进程池
+区域裁剪、拼图等 CPU 密集的图片处理在多线程服务器中会互相争抢 GIL。
+配置 IMAGE_POOL_WORKERS 后这些处理交给独立的进程池执行：
+
+- 图片数据写入共享内存交给子进程，任务参数只包含内存块名称和各帧长度，不需要序列化整张图片；
+  子进程从共享内存复制出各帧后解码（每帧一次复制，图片解码需要独立的 bytes）
+- 较小的图片（IMAGE_POOL_MIN_BYTES 以下）在当前线程直接处理，省去进程间通信开销
+- 进程池不可用、超时或出错时回退到当前线程处理；只有子进程异常退出（进程池损坏）时才重建进程池
+- 超时后取消排队中的任务；已交给子进程队列、无法取消的任务开始执行时共享内存已释放，直接放弃
+
+默认不启用（无服务器环境和开发环境直接在请求线程中处理）
+"""
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from backend.config import get_settings, on_reload
+from backend.utils.image_tool import (
+    compose_contact_sheet,
+    downscale_frames,
+    preprocess_frames
+)
+from backend.utils.metrics import IMAGE_POOL_TASKS
+
+logger = logging.getLogger(__name__)
+
+# 可交给进程池执行的任务（第一个参数为各帧图片二进制数据；区域裁剪包含在 preprocess 中）
+TASKS: Dict[str, Callable[..., Any]] = {
+    "preprocess": preprocess_frames,
+    "contact_sheet": compose_contact_sheet,
+    "downscale": downscale_frames,
+}
+
+
+def _run_in_worker(task: str, block_name: str, sizes: List[int], kwargs: Dict[str, Any]) -> Any:
+    """子进程入口：从共享内存复制出各帧后执行任务（共享内存已释放时视为任务已取消，返回 None）"""
+    try:
+        block = shared_memory.SharedMemory(name=block_name)
+    except FileNotFoundError:
+        # 请求方等待超时后已释放共享内存并在自己的线程中处理
+        return None
+    try:
+        frames, offset = [], 0
+        for size in sizes:
+            frames.append(bytes(block.buf[offset:offset + size]))
+            offset += size
+    finally:
+        block.close()
+    return TASKS[task](frames, **kwargs)
+
+
+class ImagePool:
+    """
+    图片处理进程池（按需启动子进程）
+
+    Args:
+        workers: 子进程数量（0 表示不使用进程池）
+        min_bytes: 图片总大小达到该值时才交给进程池
+        timeout: 等待子进程结果的最长时间（秒），超时后取消任务并在当前线程处理
+    """
+
+    def __init__(self, workers: int = 0, min_bytes: int = 256 * 1024, timeout: float = 10.0):
+        self.workers = workers
+        self.min_bytes = min_bytes
+        self.timeout = timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # 使用 spawn：服务进程中有多个线程，fork 出的子进程可能继承被占用的锁
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def start(self) -> None:
+        """提前启动子进程（worker 启动时调用，避免第一次请求承担子进程启动开销）"""
+        if self.enabled:
+            executor = self._get_executor()
+            for future in [executor.submit(len, ()) for _ in range(self.workers)]:
+                future.result()
+
+    def shutdown(self) -> None:
+        """关闭子进程"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def run(self, task: str, frames: List[bytes], **kwargs: Any) -> Any:
+        """
+        执行图片处理任务
+
+        Args:
+            task: 任务名称（见 TASKS）
+            frames: 各帧图片二进制数据
+            **kwargs: 任务参数
+
+        Returns:
+            Any: 任务结果（与直接调用对应函数相同）
+        """
+        total = sum(len(frame) for frame in frames)
+        if not self.enabled or total < self.min_bytes or total == 0:
+            IMAGE_POOL_TASKS.inc(task=task, mode="inline")
+            return TASKS[task](frames, **kwargs)
+
+        block = shared_memory.SharedMemory(create=True, size=total)
+        future = None
+        try:
+            offset = 0
+            for frame in frames:
+                block.buf[offset:offset + len(frame)] = frame
+                offset += len(frame)
+            future = self._get_executor().submit(
+                _run_in_worker, task, block.name, [len(frame) for frame in frames], kwargs
+            )
+            result = future.result(timeout=self.timeout)
+            IMAGE_POOL_TASKS.inc(task=task, mode="pool")
+            return result
+        except Exception as e:
+            logger.warning("进程池处理图片失败，改为在当前线程处理: %r", e)
+            IMAGE_POOL_TASKS.inc(task=task, mode="fallback")
+            if isinstance(e, FutureTimeoutError) and future is not None:
+                # 还在排队的任务不再执行，避免过载时同一份处理做两次
+                future.cancel()
+            elif isinstance(e, BrokenProcessPool):
+                # 子进程异常退出后进程池不再可用，重建（超时和任务本身的异常不影响其他进行中的任务）
+                self.shutdown()
+            return TASKS[task](frames, **kwargs)
+        finally:
+            block.close()
+            block.unlink()
+
+
+_pool: Optional[ImagePool] = None
+_pool_lock = threading.Lock()
+
+
+def get_image_pool() -> ImagePool:
+    """获取全局图片处理进程池（按配置创建）"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                config = get_settings()
+                _pool = ImagePool(config.IMAGE_POOL_WORKERS, config.IMAGE_POOL_MIN_BYTES, config.IMAGE_POOL_TIMEOUT)
+    return _pool
+
+
+def run_image_task(task: str, frames: List[bytes], **kwargs: Any) -> Any:
+    """便捷函数：在全局进程池中执行图片处理任务（未启用时直接执行）"""
+    return get_image_pool().run(task, frames, **kwargs)
+
+
+def shutdown_image_pool() -> None:
+    """关闭全局进程池（进程退出时调用）"""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown()
+
+
+_SETTING_NAMES: Tuple[str, ...] = ("IMAGE_POOL_WORKERS", "IMAGE_POOL_MIN_BYTES", "IMAGE_POOL_TIMEOUT")
+
+
+@on_reload
+def _rebuild_on_reload(old, new) -> None:
+    """进程池配置变更后关闭原进程池，下次使用时按新配置创建"""
+    if any(getattr(old, name) != getattr(new, name) for name in _SETTING_NAMES):
+        shutdown_image_pool()
@@ -2,9 +2,14 @@
 图片处理工具
 Base64 图片的校验、清洗和预处理
 """
+import io
+import math
 import re
 import base64
-from typing import Tuple, Optional
+from dataclasses import dataclass, field
+from typing import List, Tuple, Optional
+
+from backend.utils.frame_batch import FrameBatch, load_batch
 
 
 def validate_base64_image(base64_string: str) -> Tuple[bool, str]:
@@ -133,3 +138,316 @@ def clean_base64_string(base64_string: str) -> str:
         return f"{prefix};base64,{data}"
     
     return re.sub(r'\s+', '', base64_string)
+
+
+# 常见图片格式的文件头（magic number）
+_IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", "jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+)
+
+
+def detect_image_format(image_bytes: bytes) -> Optional[str]:
+    """
+    根据文件头识别二进制图片格式
+    
+    Args:
+        image_bytes: 图片二进制数据
+        
+    Returns:
+        Optional[str]: 图片格式 (如 'jpeg', 'png') 或 None
+    """
+    for signature, image_format in _IMAGE_SIGNATURES:
+        if image_bytes.startswith(signature):
+            return image_format
+    
+    if image_bytes[:4] == b"RIFF" and image_bytes[8:12] == b"WEBP":
+        return "webp"
+    
+    return None
+
+
+def validate_image_bytes(image_bytes: bytes, max_size_mb: float = 5.0) -> Tuple[bool, str]:
+    """
+    校验二进制图片（格式和大小）
+    
+    Args:
+        image_bytes: 图片二进制数据
+        max_size_mb: 最大允许大小（MB）
+        
+    Returns:
+        Tuple[bool, str]: (是否有效, 错误信息)
+    """
+    if not image_bytes:
+        return False, "图片数据为空"
+    
+    max_bytes = int(max_size_mb * 1024 * 1024)
+    if len(image_bytes) > max_bytes:
+        return False, f"图片过大: {len(image_bytes)/1024/1024:.2f}MB, 最大允许 {max_size_mb}MB"
+    
+    if detect_image_format(image_bytes) is None:
+        return False, "无法识别的图片格式"
+    
+    return True, ""
+
+
+def encode_image_bytes(image_bytes: bytes, image_format: Optional[str] = None) -> str:
+    """
+    将二进制图片编码为模型所需的 Data URI
+    
+    Args:
+        image_bytes: 图片二进制数据
+        image_format: 图片格式（默认根据文件头识别，无法识别时按 jpeg 处理）
+        
+    Returns:
+        str: data:image/...;base64,... 格式的字符串
+    """
+    image_format = image_format or detect_image_format(image_bytes) or "jpeg"
+    encoded = base64.b64encode(image_bytes).decode("ascii")
+    return f"data:image/{image_format};base64,{encoded}"
+
+
+def decode_base64_image(base64_string: str) -> bytes:
+    """
+    解码 Base64 图片（支持带 Data URI 前缀）
+    
+    Args:
+        base64_string: Base64 编码的图片
+        
+    Returns:
+        bytes: 图片二进制数据
+    """
+    if ";base64," in base64_string:
+        _, base64_string = base64_string.split(";base64,", 1)
+    return base64.b64decode(base64_string)
+
+
+def compose_contact_sheet(
+    frames: List[bytes],
+    columns: Optional[int] = None,
+    tile_width: int = 400,
+    quality: int = 80
+) -> Optional[bytes]:
+    """
+    将多张照片按时间顺序拼成一张网格图（从左到右、从上到下）
+    
+    需要 Pillow；未安装或图片无法解码时返回 None，由调用方改为逐张发送
+    
+    Args:
+        frames: 各帧图片二进制数据
+        columns: 列数（默认取接近正方形的布局）
+        tile_width: 每格宽度（像素），高度按第一帧的宽高比计算
+        quality: JPEG 质量
+        
+    Returns:
+        Optional[bytes]: 拼接后的 JPEG 图片
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    
+    try:
+        images = [Image.open(io.BytesIO(frame)).convert("RGB") for frame in frames]
+    except Exception:
+        return None
+    if not images:
+        return None
+    
+    columns = columns or math.ceil(math.sqrt(len(images)))
+    rows = math.ceil(len(images) / columns)
+    tile_height = max(round(tile_width * images[0].height / images[0].width), 1)
+    
+    sheet = Image.new("RGB", (columns * tile_width, rows * tile_height))
+    for index, image in enumerate(images):
+        image.thumbnail((tile_width, tile_height))
+        x = (index % columns) * tile_width + (tile_width - image.width) // 2
+        y = (index // columns) * tile_height + (tile_height - image.height) // 2
+        sheet.paste(image, (x, y))
+    
+    buffer = io.BytesIO()
+    sheet.save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def downscale_frames(
+    frames: List[bytes],
+    max_side: int = 384,
+    quality: int = 80
+) -> Optional[List[bytes]]:
+    """
+    生成低分辨率预览图（长边不超过 max_side 像素）
+
+    需要 Pillow；未安装、图片无法解码或原图已经足够小时返回 None，由调用方直接使用原图
+
+    Args:
+        frames: 各帧图片二进制数据
+        max_side: 预览图长边（像素）
+        quality: JPEG 质量
+
+    Returns:
+        Optional[List[bytes]]: 各帧预览图（JPEG）
+    """
+    if max_side <= 0 or not frames:
+        return None
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+
+    previews = []
+    try:
+        for frame in frames:
+            image = Image.open(io.BytesIO(frame))
+            if max(image.size) <= max_side:
+                return None
+            # JPEG 直接以缩小的比例解码（DCT 缩放）
+            image.draft("RGB", (max_side, max_side))
+            image = image.convert("RGB")
+            image.thumbnail((max_side, max_side))
+            buffer = io.BytesIO()
+            image.save(buffer, format="JPEG", quality=quality)
+            previews.append(buffer.getvalue())
+    except Exception:
+        return None
+    return previews
+
+
+def _find_region_of_interest(
+    batch: FrameBatch,
+    padding: float,
+    min_saving: float,
+    trim: float = 0.04
+) -> Optional[Tuple[int, int, int, int]]:
+    """
+    根据探针图的边缘能量估计人物和桌面所在区域
+    
+    以边缘强度（连拍时再叠加相邻帧的差异）为能量，从四边裁掉只含少量能量的背景；
+    画面几乎没有纹理、区域过小或节省不足 min_saving 时视为不确定，返回 None
+    
+    Returns:
+        Optional[Tuple]: 原图坐标下的 (left, top, right, bottom)
+    """
+    width, height = batch.size
+    probe_width, probe_height = batch.probe_size
+    total = batch.total
+    if total < 8 * (probe_width - 2) * (probe_height - 2):
+        return None
+    
+    def bounds(profile: List[float]) -> Tuple[int, int]:
+        limit = total * trim
+        start, removed = 0, 0.0
+        while start < len(profile) - 1 and removed + profile[start] <= limit:
+            removed += profile[start]
+            start += 1
+        end, removed = len(profile), 0.0
+        while end > start + 1 and removed + profile[end - 1] <= limit:
+            removed += profile[end - 1]
+            end -= 1
+        return start, end
+    
+    def expand(start: int, end: int, size: int) -> Tuple[float, float]:
+        # 加上留白，并保证不小于原图的 40%（过紧的裁剪容易切掉手部等关键信息）
+        start, end = start / size - padding, end / size + padding
+        if end - start < 0.4:
+            center = (start + end) / 2
+            start, end = center - 0.2, center + 0.2
+        return max(start, 0.0), min(end, 1.0)
+    
+    left, right = expand(*bounds(batch.columns), probe_width)
+    top, bottom = expand(*bounds(batch.rows), probe_height)
+    if (right - left) * (bottom - top) > 1 - min_saving:
+        return None
+    return round(left * width), round(top * height), round(right * width), round(bottom * height)
+
+
+@dataclass
+class PreprocessedFrames:
+    """
+    预处理结果
+    
+    Attributes:
+        frames: 处理后的图片（未裁剪时为原图）
+        area_ratio: 保留的面积比例（1.0 表示未裁剪）
+        brightness: 各帧平均亮度（0-255，无法计算时为空）
+        hashes: 各帧 64 位感知哈希（无法计算时为空）
+        dark: 所有帧都过暗（摄像头被遮挡、关灯等）
+    """
+    frames: List[bytes]
+    area_ratio: float = 1.0
+    brightness: List[float] = field(default_factory=list)
+    hashes: List[int] = field(default_factory=list)
+    dark: bool = False
+
+
+def preprocess_frames(
+    frames: List[bytes],
+    roi: bool = True,
+    padding: float = 0.1,
+    min_saving: float = 0.2,
+    quality: int = 85
+) -> PreprocessedFrames:
+    """
+    批量预处理一次请求的各帧：计算亮度和感知哈希，并裁剪到人物和桌面所在区域
+    
+    各帧一起以探针尺寸解码和计算（见 frame_batch），只有需要裁剪时才完整解码。
+    连拍的多帧使用同一个裁剪框。需要 Pillow；未安装、图片无法解码或无法可靠判断区域时
+    原样返回
+    
+    Args:
+        frames: 各帧图片二进制数据
+        roi: 是否裁剪
+        padding: 区域四周的留白（占原图边长的比例）
+        min_saving: 面积至少减少该比例时才裁剪
+        quality: 裁剪后的 JPEG 质量
+        
+    Returns:
+        PreprocessedFrames: 预处理结果
+    """
+    batch = load_batch(frames)
+    if batch is None:
+        return PreprocessedFrames(frames)
+    result = PreprocessedFrames(frames, brightness=batch.brightness, hashes=batch.hashes, dark=batch.dark)
+    
+    box = _find_region_of_interest(batch, padding, min_saving) if roi else None
+    if box is None:
+        return result
+    
+    try:
+        from PIL import Image
+        cropped = []
+        for frame in frames:
+            buffer = io.BytesIO()
+            Image.open(io.BytesIO(frame)).convert("RGB").crop(box).save(buffer, format="JPEG", quality=quality)
+            cropped.append(buffer.getvalue())
+    except Exception:
+        return result
+    
+    width, height = batch.size
+    result.frames = cropped
+    result.area_ratio = (box[2] - box[0]) * (box[3] - box[1]) / (width * height)
+    return result
+
+
+def crop_to_region_of_interest(
+    frames: List[bytes],
+    padding: float = 0.1,
+    min_saving: float = 0.2,
+    quality: int = 85
+) -> Tuple[List[bytes], float]:
+    """
+    将照片裁剪到人物和桌面所在区域，减少发送给模型的像素
+    
+    Args:
+        frames: 各帧图片二进制数据
+        padding: 区域四周的留白（占原图边长的比例）
+        min_saving: 面积至少减少该比例时才裁剪
+        quality: 裁剪后的 JPEG 质量
+        
+    Returns:
+        Tuple[List[bytes], float]: (处理后的图片, 保留的面积比例；1.0 表示未裁剪)
+    """
+    result = preprocess_frames(frames, True, padding, min_saving, quality)
+    return result.frames, result.area_ratio
@@ -0,0 +1,160 @@
+"""
+结构化日志工具
+JSON Lines 输出、请求 ID 关联、高频事件采样，日志写出在后台线程完成
+"""
+import atexit
+import copy
+import json
+import logging
+import queue
+import random
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+# 当前请求 ID（线程 / 协程隔离）
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+# LogRecord 的标准属性，其余属性视为 extra 结构化字段
+_RESERVED_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id", "sample_rate"}
+
+# 入队前格式化异常堆栈
+_EXC_FORMATTER = logging.Formatter()
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[QueueHandler] = None
+
+
+def new_request_id(incoming: Optional[str] = None) -> str:
+    """
+    设置当前请求 ID
+
+    Args:
+        incoming: 上游传入的请求 ID（如 X-Request-ID 请求头），为空时生成新 ID
+
+    Returns:
+        str: 当前请求 ID
+    """
+    request_id = (incoming or "").strip()[:64] or uuid.uuid4().hex[:16]
+    request_id_var.set(request_id)
+    return request_id
+
+
+def get_request_id() -> str:
+    """获取当前请求 ID"""
+    return request_id_var.get()
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    为日志记录附加请求 ID，并按 sample_rate 对高频事件采样
+
+    用法: logger.debug("...", extra={"sample_rate": 0.1}) 只保留约 10% 的记录
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        sample_rate = getattr(record, "sample_rate", None)
+        if sample_rate is not None and sample_rate < 1.0:
+            return random.random() < sample_rate
+        return True
+
+
+class StructuredQueueHandler(QueueHandler):
+    """
+    保留结构化字段的队列处理器
+
+    标准 QueueHandler 入队前把异常堆栈拼进 msg 并清空 exc_info，JSON 格式化器无法单独输出。
+    这里只合并消息参数，异常堆栈预先格式化到 exc_text（traceback 不跨线程保留），由写出端的格式化器输出
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or _EXC_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """单行 JSON 格式化器，extra 中的字段作为顶层键输出"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        exc = self.formatException(record.exc_info) if record.exc_info else record.exc_text
+        if exc:
+            entry["exc"] = exc
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure_logging(level: Optional[str] = None, fmt: Optional[str] = None) -> None:
+    """
+    配置根日志（幂等）
+
+    日志记录先进入内存队列，由后台线程格式化并写出，请求线程不会阻塞在 stdout/stderr 上。
+    只替换本函数之前安装的处理器，其他代码（测试框架、WSGI 服务器）添加的处理器保持不变
+
+    Args:
+        level: 日志级别（默认读取 LOG_LEVEL 配置）
+        fmt: 输出格式 json/text（默认读取 LOG_FORMAT 配置）
+    """
+    global _listener, _queue_handler
+    from backend.config import settings
+
+    level = (level or settings.LOG_LEVEL).upper()
+    fmt = (fmt or settings.LOG_FORMAT).lower()
+
+    root = logging.getLogger()
+    root.setLevel(level)
+
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    if fmt == "json":
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter(
+            "%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s"
+        ))
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    queue_handler = StructuredQueueHandler(log_queue)
+    queue_handler.addFilter(RequestContextFilter())
+
+    if _queue_handler is not None:
+        root.removeHandler(_queue_handler)
+    root.addHandler(queue_handler)
+    _queue_handler = queue_handler
+
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_stop_listener)
+
+
+def _stop_listener() -> None:
+    """停止后台写日志线程，写出队列中剩余的记录"""
+    global _listener, _queue_handler
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
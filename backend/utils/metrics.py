@@ -0,0 +1,263 @@
+"""
+进程内指标
+Prometheus 文本格式的计数器、仪表和直方图，由 /api/metrics 接口导出
+
+注意：指标按进程统计，gunicorn 多 worker 时每个 worker 独立计数
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# 默认延迟分桶（秒），覆盖图片校验的毫秒级到模型调用的数十秒
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    """指标基类"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} 需要标签 {self.labelnames}，实际为 {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """单调递增计数器"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(_Metric):
+    """可增可减的瞬时值"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Histogram(_Metric):
+    """累积分桶直方图"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # 每组标签: [各分桶计数..., 总和, 总数]
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[index] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """计时上下文管理器，退出时记录耗时（秒）"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels: str) -> int:
+        state = self._values.get(self._key(labels))
+        return int(state[-1]) if state else 0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(state)) for key, state in self._values.items())
+        lines = []
+        for key, state in items:
+            cumulative = 0.0
+            for index, bound in enumerate(self.buckets):
+                cumulative += state[index]
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {_format_value(cumulative)}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(state[-2])}")
+            lines.append(f"{self.name}_count{labels} {_format_value(state[-1])}")
+        return lines
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"指标已存在: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """导出 Prometheus 文本格式（text/plain; version=0.0.4）"""
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+registry = MetricsRegistry()
+
+# Prometheus 文本格式的 Content-Type
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def render_metrics() -> str:
+    """导出全部指标"""
+    return registry.render()
+
+
+# ===== 业务指标 =====
+
+# 分析流水线各阶段耗时: validate / prompt_build / model_call / parse / fallback_parse / total
+STAGE_LATENCY = registry.register(Histogram(
+    "focuseye_analyze_stage_seconds", "分析流水线各阶段耗时（秒）", ["stage"]
+))
+ANALYZE_RESULTS = registry.register(Counter(
+    "focuseye_analyze_results_total", "分析结果数（按状态）", ["status"]
+))
+MODEL_TOKENS = registry.register(Counter(
+    "focuseye_model_tokens_total", "模型 token 用量", ["direction"]
+))
+FALLBACK_PARSES = registry.register(Counter(
+    "focuseye_fallback_parse_total", "结构化解析失败后使用降级解析的次数"
+))
+CACHE_EVENTS = registry.register(Counter(
+    "focuseye_cache_events_total", "缓存命中情况", ["cache", "result"]
+))
+TTS_LATENCY = registry.register(Histogram(
+    "focuseye_tts_seconds", "语音合成耗时（秒）", ["voice", "format"]
+))
+ADMISSION_EVENTS = registry.register(Counter(
+    "focuseye_admission_total", "准入控制结果（admitted / rate_limited / shed / timeout / superseded）", ["result"]
+))
+ADMISSION_IN_FLIGHT = registry.register(Gauge(
+    "focuseye_admission_in_flight", "正在处理的分析请求数"
+))
+ADMISSION_QUEUE_DEPTH = registry.register(Gauge(
+    "focuseye_admission_queue_depth", "排队等待的分析请求数"
+))
+MODEL_QUEUE_WAIT = registry.register(Histogram(
+    "focuseye_model_queue_wait_seconds", "模型调用排队等待时间（秒，按优先级）", ["priority"]
+))
+MODEL_QUEUE_DEPTH = registry.register(Gauge(
+    "focuseye_model_queue_depth", "排队等待模型调用的请求数"
+))
+ROI_CROPS = registry.register(Counter(
+    "focuseye_roi_crops_total", "区域裁剪结果（cropped: 已裁剪 / full: 使用原图）", ["result"]
+))
+IMAGE_POOL_TASKS = registry.register(Counter(
+    "focuseye_image_pool_tasks_total", "图片处理任务数（inline: 当前线程 / pool: 进程池 / fallback: 进程池失败后回退）",
+    ["task", "mode"]
+))
+RESOLUTION_PASSES = registry.register(Counter(
+    "focuseye_resolution_passes_total",
+    "渐进分辨率分析结果（preview: 预览图即可判断 / escalated: 改用原图重新分析）", ["result"]
+))
+QUALITY_LEVEL = registry.register(Gauge(
+    "focuseye_quality_level", "当前分析质量等级（0: 完整，数值越大降级越多）"
+))
+MODEL_CIRCUIT_OPEN = registry.register(Gauge(
+    "focuseye_model_circuit_open", "模型服务是否处于熔断状态（1: 熔断中）"
+))
+LOCAL_FALLBACKS = registry.register(Counter(
+    "focuseye_local_fallback_total", "使用本地降级分类的次数（circuit_open: 熔断中 / model_error: 调用失败）",
+    ["reason", "status"]
+))
+CAPTURE_EVENTS = registry.register(Counter(
+    "focuseye_capture_total",
+    "样本采集结果（written: 已写入 / duplicate: 与上一条样本重复 / dropped: 队列已满 / error: 写入失败）", ["result"]
+))
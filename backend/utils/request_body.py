@@ -0,0 +1,300 @@
+"""
+请求体大小限制和流式解析
+分析接口的 JSON 请求体主要是 Base64 图片，整体读入再 json.loads 会同时持有原始请求体、
+解析后的字符串和清洗后的副本。这里：
+
+1. 读取前按 Content-Length 和各接口的上限拒绝过大的请求（413）
+2. 边读边解析 JSON：image / images 字段的 Base64 按块解码为图片二进制数据，
+   超出单帧上限或格式错误时立即停止读取；其他字段（stats 等）按小对象解析
+
+与 Web 框架无关：Flask 传入 request.stream，Vercel 入口传入 io.BytesIO(body)
+"""
+import base64
+import codecs
+import json
+import re
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+# 非图片字段的最大长度（字符）
+MAX_FIELD_CHARS = 64 * 1024
+
+# 每次读取的字节数
+CHUNK_SIZE = 64 * 1024
+
+_STRING_SPECIAL = re.compile(r'["\\]')
+_WHITESPACE = re.compile(r"\s+")
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class RequestBodyError(ValueError):
+    """
+    请求体无效
+
+    Attributes:
+        status: HTTP 状态码（400 格式错误 / 413 过大）
+    """
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+def check_content_length(content_length: Optional[int], limit: int) -> None:
+    """
+    读取请求体前检查 Content-Length
+
+    Args:
+        content_length: Content-Length 请求头（分块传输时为 None，读取时再限制）
+        limit: 允许的最大字节数（0 表示不限制）
+
+    Raises:
+        RequestBodyError: 超出上限（413）
+    """
+    if limit > 0 and content_length is not None and content_length > limit:
+        raise RequestBodyError(
+            f"请求体过大: {content_length / 1024 / 1024:.2f}MB, 最大允许 {limit / 1024 / 1024:.2f}MB", 413
+        )
+
+
+class _FrameDecoder:
+    """按块解码 Data URI 形式的 Base64 图片"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._prefix = ""
+        self._in_data = False
+        self._pending = ""
+        self._data = bytearray()
+
+    def feed(self, text: str) -> None:
+        if not self._in_data:
+            self._prefix += text
+            marker = self._prefix.find(";base64,")
+            if marker < 0:
+                if not "data:image/".startswith(self._prefix[:11]):
+                    raise RequestBodyError("图片格式不正确: 缺少 data:image/ 前缀")
+                if len(self._prefix) > 64:
+                    raise RequestBodyError("图片格式不正确: 缺少 ;base64, 标记")
+                return
+            if not self._prefix.startswith("data:image/"):
+                raise RequestBodyError("图片格式不正确: 缺少 data:image/ 前缀")
+            text = self._prefix[marker + len(";base64,"):]
+            self._in_data = True
+
+        self._pending += _WHITESPACE.sub("", text)
+        usable = len(self._pending) - len(self._pending) % 4
+        if usable:
+            self._decode(self._pending[:usable])
+            self._pending = self._pending[usable:]
+
+    def _decode(self, encoded: str) -> None:
+        try:
+            self._data += base64.b64decode(encoded, validate=True)
+        except ValueError as e:
+            raise RequestBodyError(f"图片格式不正确: Base64 解码失败: {e}") from e
+        if len(self._data) > self.max_bytes:
+            raise RequestBodyError(
+                f"图片过大: 超过 {self.max_bytes / 1024 / 1024:.2f}MB", 413
+            )
+
+    def finish(self) -> bytes:
+        if not self._in_data:
+            raise RequestBodyError("图片格式不正确: 缺少 ;base64, 标记")
+        if self._pending:
+            raise RequestBodyError("图片格式不正确: Base64 长度不正确")
+        if not self._data:
+            raise RequestBodyError("图片数据为空")
+        return bytes(self._data)
+
+
+class _JsonStream:
+    """从二进制流中按需读取并解析 JSON 的最小实现（只支持分析接口需要的结构）"""
+
+    def __init__(self, stream: BinaryIO, limit: int, chunk_size: int = CHUNK_SIZE):
+        self._stream = stream
+        self._limit = limit
+        self._chunk_size = chunk_size
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._pos = 0
+        self._read = 0
+        self._eof = False
+
+    def _fill(self) -> bool:
+        """读取下一块数据，没有更多数据时返回 False"""
+        if self._eof:
+            return False
+        chunk = self._stream.read(self._chunk_size)
+        self._eof = not chunk
+        self._read += len(chunk)
+        if self._limit > 0 and self._read > self._limit:
+            raise RequestBodyError(f"请求体过大: 最大允许 {self._limit / 1024 / 1024:.2f}MB", 413)
+        try:
+            tail = self._decoder.decode(chunk, final=self._eof)
+        except UnicodeDecodeError as e:
+            raise RequestBodyError("请求体不是有效的 UTF-8") from e
+        self._buffer = self._buffer[self._pos:] + tail
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        """跳过空白并返回下一个字符（结束时返回空字符串）"""
+        while True:
+            while self._pos < len(self._buffer):
+                char = self._buffer[self._pos]
+                if char not in " \t\r\n":
+                    return char
+                self._pos += 1
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise RequestBodyError(f"JSON 格式错误: 缺少 {char!r}")
+        self._pos += 1
+
+    def string_chunks(self) -> Iterator[str]:
+        """逐块返回字符串内容（已处理转义），调用前当前位置为左引号"""
+        self.expect('"')
+        while True:
+            match = _STRING_SPECIAL.search(self._buffer, self._pos)
+            if match is None:
+                if self._pos < len(self._buffer):
+                    yield self._buffer[self._pos:]
+                    self._pos = len(self._buffer)
+                if not self._fill():
+                    raise RequestBodyError("JSON 格式错误: 字符串未结束")
+                continue
+
+            if match.start() > self._pos:
+                yield self._buffer[self._pos:match.start()]
+            self._pos = match.start() + 1
+            if match.group() == '"':
+                return
+            yield self._escape()
+
+    def _escape(self) -> str:
+        while len(self._buffer) - self._pos < 5 and self._fill():
+            pass
+        char = self._buffer[self._pos:self._pos + 1]
+        if char in _ESCAPES:
+            self._pos += 1
+            return _ESCAPES[char]
+        if char == "u" and len(self._buffer) - self._pos >= 5:
+            try:
+                value = chr(int(self._buffer[self._pos + 1:self._pos + 5], 16))
+            except ValueError:
+                value = None
+            if value is not None:
+                self._pos += 5
+                return value
+        raise RequestBodyError("JSON 格式错误: 无效的转义字符")
+
+    def string(self, max_chars: int = MAX_FIELD_CHARS) -> str:
+        parts, size = [], 0
+        for part in self.string_chunks():
+            size += len(part)
+            if size > max_chars:
+                raise RequestBodyError("JSON 字段过长", 413)
+            parts.append(part)
+        return "".join(parts)
+
+    def small_value(self, max_chars: int = MAX_FIELD_CHARS) -> Any:
+        """读取一个较小的 JSON 值（对象、数组、字符串、数字等）"""
+        if self.peek() == '"':
+            return self.string(max_chars)
+
+        parts, size, depth = [], 0, 0
+        while True:
+            char = self.peek()
+            if not char:
+                raise RequestBodyError("JSON 格式错误: 请求体不完整")
+            if depth == 0 and char in ",}]":
+                break
+            if char == '"':
+                parts.append(json.dumps(self.string(max_chars)))
+            else:
+                if char in "{[":
+                    depth += 1
+                elif char in "}]":
+                    depth -= 1
+                parts.append(char)
+                self._pos += 1
+            size += len(parts[-1])
+            if size > max_chars:
+                raise RequestBodyError("JSON 字段过长", 413)
+
+        try:
+            return json.loads("".join(parts))
+        except ValueError as e:
+            raise RequestBodyError(f"JSON 格式错误: {e}") from e
+
+
+def parse_analyze_body(
+    stream: BinaryIO,
+    limit: int = 0,
+    max_frame_bytes: int = 5 * 1024 * 1024,
+    max_frames: int = 4
+) -> Tuple[List[bytes], Dict[str, Any]]:
+    """
+    流式解析分析接口的 JSON 请求体
+
+    Args:
+        stream: 请求体流
+        limit: 请求体最大字节数（0 表示不限制）
+        max_frame_bytes: 单帧图片解码后的最大字节数
+        max_frames: images 列表的最大长度
+
+    Returns:
+        Tuple[List[bytes], Dict]: (按时间顺序的图片二进制数据, 其他字段)；
+            同时有 images 和 image 时使用 images
+
+    Raises:
+        RequestBodyError: 请求体过大（413）或格式错误（400）
+    """
+    reader = _JsonStream(stream, limit)
+    fields: Dict[str, Any] = {}
+    frames: Dict[str, List[bytes]] = {}
+
+    def read_frame() -> bytes:
+        if reader.peek() != '"':
+            raise RequestBodyError("图片格式不正确: 图片必须是字符串")
+        decoder = _FrameDecoder(max_frame_bytes)
+        for part in reader.string_chunks():
+            decoder.feed(part)
+        return decoder.finish()
+
+    reader.expect("{")
+    if reader.peek() == "}":
+        reader.expect("}")
+    else:
+        while True:
+            key = reader.string()
+            reader.expect(":")
+            if key == "image" and reader.peek() == '"':
+                frames[key] = [read_frame()]
+            elif key == "images" and reader.peek() == "[":
+                reader.expect("[")
+                items: List[bytes] = []
+                if reader.peek() != "]":
+                    while True:
+                        if len(items) >= max_frames:
+                            raise RequestBodyError(f"连拍照片过多: 最多 {max_frames} 张", 413)
+                        items.append(read_frame())
+                        if reader.peek() != ",":
+                            break
+                        reader.expect(",")
+                reader.expect("]")
+                frames[key] = items
+            else:
+                fields[key] = reader.small_value()
+
+            if reader.peek() == ",":
+                reader.expect(",")
+                continue
+            reader.expect("}")
+            break
+
+    if reader.peek():
+        raise RequestBodyError("JSON 格式错误: 请求体末尾有多余内容")
+    return frames.get("images") or frames.get("image") or [], fields
@@ -0,0 +1,175 @@
+"""
+链路追踪
+为分析流水线各阶段创建 span，接口与 OpenTelemetry 兼容
+
+后端由 TRACING_BACKEND 配置：
+- none（默认）：空实现，几乎无开销
+- otel：使用 opentelemetry-api（需自行安装并配置 SDK / exporter）
+- memory：记录到进程内导出器，供测试和本地排查使用
+"""
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+
+class NoopSpan:
+    """空 span"""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        pass
+
+    def record_exception(self, exception: BaseException) -> None:
+        pass
+
+
+_NOOP_SPAN = NoopSpan()
+
+
+@dataclass
+class RecordedSpan:
+    """进程内导出器记录的 span"""
+    name: str
+    span_id: int
+    parent_id: Optional[int]
+    start: float
+    end: float = 0.0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end - self.start) * 1000
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        self.attributes.update(attributes)
+
+    def record_exception(self, exception: BaseException) -> None:
+        self.error = f"{type(exception).__name__}: {exception}"
+
+
+class InMemoryExporter:
+    """进程内 span 导出器（线程安全）"""
+
+    def __init__(self, max_spans: int = 10000):
+        self.max_spans = max_spans
+        self._spans: List[RecordedSpan] = []
+        self._lock = threading.Lock()
+
+    def export(self, span: RecordedSpan) -> None:
+        with self._lock:
+            self._spans.append(span)
+            if len(self._spans) > self.max_spans:
+                del self._spans[: len(self._spans) - self.max_spans]
+
+    def get_finished_spans(self) -> List[RecordedSpan]:
+        with self._lock:
+            return list(self._spans)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._spans.clear()
+
+
+_current_span: ContextVar[Optional[RecordedSpan]] = ContextVar("current_span", default=None)
+_span_ids = itertools.count(1)
+
+# 当前后端: None 表示空实现；InMemoryExporter 或 OpenTelemetry tracer
+_exporter: Optional[InMemoryExporter] = None
+_otel_tracer: Any = None
+
+
+def configure_tracing(backend: Optional[str] = None) -> Optional[InMemoryExporter]:
+    """
+    配置追踪后端
+
+    Args:
+        backend: none / otel / memory（默认读取 TRACING_BACKEND 配置）
+
+    Returns:
+        Optional[InMemoryExporter]: memory 后端时返回导出器
+    """
+    global _exporter, _otel_tracer
+
+    if backend is None:
+        from backend.config import settings
+        backend = settings.TRACING_BACKEND
+
+    backend = backend.lower()
+    _exporter = None
+    _otel_tracer = None
+
+    if backend == "memory":
+        _exporter = InMemoryExporter()
+    elif backend == "otel":
+        try:
+            from opentelemetry import trace
+            _otel_tracer = trace.get_tracer("focuseye")
+        except ImportError:
+            import logging
+            logging.getLogger(__name__).warning("未安装 opentelemetry-api，追踪已禁用")
+
+    return _exporter
+
+
+def get_exporter() -> Optional[InMemoryExporter]:
+    """获取进程内导出器（仅 memory 后端）"""
+    return _exporter
+
+
+@contextmanager
+def start_span(name: str, **attributes: Any) -> Iterator[Any]:
+    """
+    创建 span 的上下文管理器，嵌套调用自动形成父子关系
+
+    用法:
+        with start_span("supervisor.model_call", model=name) as span:
+            span.set_attribute("tokens.output", 12)
+
+    Args:
+        name: span 名称
+        **attributes: 初始属性
+
+    Yields:
+        span 对象（支持 set_attribute / set_attributes / record_exception）
+    """
+    if _otel_tracer is not None:
+        with _otel_tracer.start_as_current_span(name, attributes=attributes) as span:
+            yield span
+        return
+
+    exporter = _exporter
+    if exporter is None:
+        yield _NOOP_SPAN
+        return
+
+    parent = _current_span.get()
+    span = RecordedSpan(
+        name=name,
+        span_id=next(_span_ids),
+        parent_id=parent.span_id if parent else None,
+        start=time.perf_counter(),
+        attributes=dict(attributes),
+    )
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.record_exception(e)
+        raise
+    finally:
+        span.end = time.perf_counter()
+        _current_span.reset(token)
+        exporter.export(span)
+
+
+configure_tracing()
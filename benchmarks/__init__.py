@@ -0,0 +1,3 @@
+"""
+离线压测工具
+"""
@@ -0,0 +1,391 @@
+"""
+准确率 / 成本评估
+将带标签的样本（样本采集库，见 backend/utils/capture.py）在一组配置矩阵下交给 SupervisorAgent 分析，
+统计每组配置的准确率、token 用量和延迟，输出 Pareto 表：* 标记的配置不被任何其他配置
+在准确率、平均 token 和 p50 延迟上全面超越
+
+样本标签取记录中的 label 字段（人工标注），没有标注的样本跳过。指定 --use-model-labels 时，
+没有标注的样本改用采集时模型给出的 result.status 作为标签：此时的"准确率"只表示与采集时模型结果的
+一致程度，不代表真实准确率（输出中会注明标签来源）
+
+配置矩阵（逗号分隔，取笛卡尔积）:
+    --sizes 0,640,384,p384   图片长边（0 为原图；pN 表示先用长边 N 的预览图分析，不确定时再用原图）
+    --layouts frames,grid    连拍布局
+    --models a,b             模型名称（默认使用 MODEL_NAME）
+    --outputs parser,json    结构化输出方式（parser: 格式说明 + Pydantic 解析；json: 额外要求 JSON 输出模式）
+
+模型后端:
+    mock    本地模拟服务（默认；回复与画面无关，只用于检查流程、token 和延迟）
+    live    .env 中配置的模型服务（API_BASE / API_KEY）
+    replay  回放 --record 保存的回复（离线复现，延迟取录制时的值）
+
+mock / live 后端指定 --record 时保存每次模型调用的回复，之后可以用 replay 后端反复评估
+
+示例:
+    python -m benchmarks.evaluate --dataset captures --backend live --record eval.jsonl
+    python -m benchmarks.evaluate --dataset captures --backend replay --record eval.jsonl --json results.json
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# 添加项目路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from benchmarks.mock_server import MockServer, add_mock_arguments, config_from_args
+from benchmarks.run_benchmark import percentile
+
+OUTPUT_MODES = ("parser", "json")
+
+
+@dataclass(frozen=True)
+class EvalConfig:
+    """一组评估配置"""
+    size: str
+    layout: str
+    model: str
+    output: str
+
+    @property
+    def name(self) -> str:
+        return f"size={self.size} layout={self.layout} model={self.model} output={self.output}"
+
+
+@dataclass
+class Sample:
+    """一条带标签的样本"""
+    frames: List[bytes]
+    scene: str
+    stats: Dict[str, Any]
+    label: str
+
+
+def load_samples(directory: str, limit: int = 0, use_model_labels: bool = False) -> List[Sample]:
+    """
+    从样本采集库读取带标签的样本
+
+    Args:
+        directory: 样本库目录（CAPTURE_DIR）
+        limit: 最多读取的样本数（0 表示全部）
+        use_model_labels: 没有人工标注（label 字段）时是否使用采集时的模型结果作为标签
+
+    Returns:
+        List[Sample]: 样本列表
+    """
+    from backend.utils.capture import iter_records, load_frame
+
+    samples = []
+    for record in iter_records(directory):
+        label = record.get("label")
+        if not label and use_model_labels:
+            label = (record.get("result") or {}).get("status")
+        if not label or not record.get("frames"):
+            continue
+        samples.append(Sample(
+            frames=[load_frame(directory, ref) for ref in record["frames"]],
+            scene=record.get("scene", "reading"),
+            stats=record.get("stats") or {},
+            label=label,
+        ))
+        if limit and len(samples) >= limit:
+            break
+    return samples
+
+
+class _Meter(threading.local):
+    """当前线程正在评估的样本的模型调用统计"""
+
+    def reset(self) -> None:
+        self.calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.latency = 0.0
+
+
+class EvalLLM:
+    """
+    评估用的模型包装：指定模型和输出方式，统计 token 和延迟，录制或回放回复
+
+    Args:
+        inner: 实际的 LLM 客户端（replay 后端为 None）
+        model: 模型名称
+        output: 结构化输出方式（parser / json）
+        recording: 录制的回复（key -> 记录）；replay 后端从中读取，其他后端写入
+    """
+
+    def __init__(self, inner: Any, model: str, output: str, recording: Dict[str, Dict[str, Any]], meter: _Meter):
+        self.inner = inner
+        self.model = model
+        self.output = output
+        self.recording = recording
+        self.meter = meter
+        self._lock = threading.Lock()
+
+    def _key(self, messages: List[Any]) -> str:
+        digest = hashlib.sha256(f"{self.model}\n{self.output}\n".encode())
+        for message in messages:
+            content = message.content
+            digest.update(json.dumps(content, ensure_ascii=False, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def invoke(self, messages: List[Any], **kwargs: Any) -> Any:
+        from langchain_core.messages import AIMessage
+
+        key = self._key(messages)
+        if self.inner is None:
+            entry = self.recording.get(key)
+            if entry is None:
+                raise LookupError("录制中没有对应的回复")
+            latency = entry["latency_ms"] / 1000.0
+            response = AIMessage(content=entry["content"], usage_metadata=entry.get("usage"))
+        else:
+            if self.output == "json":
+                kwargs["response_format"] = {"type": "json_object"}
+            started = time.perf_counter()
+            response = self.inner.invoke(messages, model=self.model, **kwargs)
+            latency = time.perf_counter() - started
+            with self._lock:
+                self.recording[key] = {
+                    "key": key,
+                    "content": response.content,
+                    "usage": getattr(response, "usage_metadata", None),
+                    "latency_ms": round(latency * 1000, 1),
+                }
+
+        usage = getattr(response, "usage_metadata", None) or {}
+        self.meter.calls += 1
+        self.meter.input_tokens += usage.get("input_tokens", 0)
+        self.meter.output_tokens += usage.get("output_tokens", 0)
+        self.meter.latency += latency
+        return response
+
+
+def prepare_images(sample: Sample, config: EvalConfig) -> Dict[str, Any]:
+    """按配置生成发送给模型的图片（图片处理需要 Pillow，不可用时使用原图）"""
+    from backend.utils.image_tool import compose_contact_sheet, downscale_frames, encode_image_bytes
+
+    frames = sample.frames
+    layout = config.layout
+    if len(frames) > 1 and layout == "grid":
+        sheet = compose_contact_sheet(frames)
+        if sheet:
+            frames = [sheet]
+        else:
+            layout = "frames"
+
+    preview = None
+    if config.size.startswith("p"):
+        previews = downscale_frames(frames, int(config.size[1:]))
+        preview = [encode_image_bytes(frame) for frame in previews] if previews else None
+    elif int(config.size) > 0:
+        frames = downscale_frames(frames, int(config.size)) or frames
+
+    return {
+        "images": [encode_image_bytes(frame) for frame in frames],
+        "layout": layout,
+        "frame_count": len(sample.frames),
+        "preview": preview,
+    }
+
+
+def evaluate_config(
+    config: EvalConfig,
+    samples: List[Sample],
+    inner: Any,
+    recording: Dict[str, Dict[str, Any]],
+    concurrency: int
+) -> Dict[str, Any]:
+    """
+    评估一组配置
+
+    Returns:
+        Dict: 准确率、错误数、平均 token、延迟百分位和各状态的混淆统计
+    """
+    from backend.Agent.supervisor import SupervisorAgent
+
+    meter = _Meter()
+    agent = SupervisorAgent()
+    agent.llm = EvalLLM(inner, config.model, config.output, recording, meter)
+
+    def run(sample: Sample) -> Dict[str, Any]:
+        meter.reset()
+        prepared = prepare_images(sample, config)
+        result = agent.analyze(
+            prepared["images"], dict(sample.stats, scene=sample.scene),
+            prepared["layout"], prepared["frame_count"], prepared["preview"]
+        )
+        return {
+            "label": sample.label,
+            "status": result.status,
+            "calls": meter.calls,
+            "input_tokens": meter.input_tokens,
+            "output_tokens": meter.output_tokens,
+            "latency": meter.latency,
+        }
+
+    with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as executor:
+        outcomes = list(executor.map(run, samples))
+
+    count = max(len(outcomes), 1)
+    latencies = sorted(outcome["latency"] for outcome in outcomes)
+    confusion: Dict[str, Dict[str, int]] = {}
+    for outcome in outcomes:
+        row = confusion.setdefault(outcome["label"], {})
+        row[outcome["status"]] = row.get(outcome["status"], 0) + 1
+    return {
+        "config": config.name,
+        "size": config.size,
+        "layout": config.layout,
+        "model": config.model,
+        "output": config.output,
+        "samples": len(outcomes),
+        "accuracy": round(sum(o["status"] == o["label"] for o in outcomes) / count, 4),
+        "errors": sum(o["status"] == "error" for o in outcomes),
+        "calls": round(sum(o["calls"] for o in outcomes) / count, 2),
+        "input_tokens": round(sum(o["input_tokens"] for o in outcomes) / count, 1),
+        "output_tokens": round(sum(o["output_tokens"] for o in outcomes) / count, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "confusion": confusion,
+    }
+
+
+def mark_pareto(results: List[Dict[str, Any]]) -> None:
+    """标记 Pareto 最优的配置（准确率越高越好，token 和 p50 延迟越低越好）"""
+    def tokens(item: Dict[str, Any]) -> float:
+        return item["input_tokens"] + item["output_tokens"]
+
+    def dominates(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+        no_worse = a["accuracy"] >= b["accuracy"] and tokens(a) <= tokens(b) and a["p50_ms"] <= b["p50_ms"]
+        better = a["accuracy"] > b["accuracy"] or tokens(a) < tokens(b) or a["p50_ms"] < b["p50_ms"]
+        return no_worse and better
+
+    for item in results:
+        item["pareto"] = not any(dominates(other, item) for other in results)
+
+
+def print_table(results: List[Dict[str, Any]]) -> None:
+    """打印 Pareto 表（按准确率从高到低）"""
+    columns = ("size", "layout", "model", "output", "accuracy", "errors", "calls",
+               "input_tokens", "output_tokens", "p50_ms", "p95_ms")
+    print("   " + " | ".join(f"{column:>13}" for column in columns))
+    print("-" * (16 * len(columns) + 3))
+    for item in sorted(results, key=lambda r: (-r["accuracy"], r["input_tokens"] + r["output_tokens"])):
+        marker = " * " if item["pareto"] else "   "
+        print(marker + " | ".join(f"{str(item[column]):>13}" for column in columns))
+
+
+def build_matrix(args: argparse.Namespace, default_model: str) -> List[EvalConfig]:
+    def split(value: str) -> List[str]:
+        return [item.strip() for item in value.split(",") if item.strip()]
+
+    models = split(args.models) or [default_model]
+    outputs = split(args.outputs)
+    unknown = set(outputs) - set(OUTPUT_MODES)
+    if unknown:
+        raise ValueError(f"未知输出方式: {', '.join(sorted(unknown))}")
+    return [
+        EvalConfig(size, layout, model, output)
+        for size, layout, model, output in itertools.product(split(args.sizes), split(args.layouts), models, outputs)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="FocusEye 准确率 / 成本评估")
+    parser.add_argument("--dataset", required=True, help="样本采集库目录（CAPTURE_DIR）")
+    parser.add_argument("--limit", type=int, default=0, help="最多使用的样本数（0 表示全部）")
+    parser.add_argument("--backend", choices=("mock", "live", "replay"), default="mock", help="模型后端")
+    parser.add_argument("--record", help="录制文件（mock / live 写入，replay 读取）")
+    parser.add_argument("--sizes", default="0,640,384,p384", help="图片长边（0 为原图，pN 为渐进分辨率）")
+    parser.add_argument("--layouts", default="frames", help="连拍布局（frames / grid）")
+    parser.add_argument("--models", default="", help="模型名称（默认使用 MODEL_NAME）")
+    parser.add_argument("--outputs", default="parser", help=f"结构化输出方式，可选 {OUTPUT_MODES}")
+    parser.add_argument("--concurrency", type=int, default=4, help="并发数")
+    parser.add_argument("--json", dest="json_path", help="将结果写入 JSON 文件")
+    parser.add_argument(
+        "--use-model-labels", action="store_true",
+        help="没有人工标注的样本使用采集时的模型结果作为标签（只衡量与原模型的一致性）"
+    )
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    if args.backend == "replay" and not args.record:
+        parser.error("replay 后端需要 --record")
+
+    recording: Dict[str, Dict[str, Any]] = {}
+    if args.backend == "replay":
+        with open(args.record, encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                recording[entry["key"]] = entry
+
+    server: Optional[MockServer] = None
+    if args.backend == "mock":
+        server = MockServer(config_from_args(args)).start()
+    # 必须在导入 backend 之前设置，配置在导入时读取；评估时不熔断、不限制模型并发
+    os.environ.update({
+        "CIRCUIT_FAILURE_THRESHOLD": "0",
+        "MODEL_MAX_CONCURRENCY": "0",
+        "LOG_LEVEL": os.environ.get("LOG_LEVEL", "ERROR"),
+    })
+    if server is not None:
+        os.environ.update({"API_BASE": server.api_base, "API_KEY": "mock-key"})
+    elif args.backend == "replay":
+        os.environ.update({"API_BASE": "http://replay.invalid/v1", "API_KEY": "replay"})
+
+    try:
+        samples = load_samples(args.dataset, args.limit, args.use_model_labels)
+        if not samples:
+            hint = "" if args.use_model_labels else "（没有人工标注时可以指定 --use-model-labels）"
+            parser.error(f"样本库中没有带标签的样本: {args.dataset}{hint}")
+        label_source = "label+model" if args.use_model_labels else "label"
+        print(
+            "标签来源: " + (
+                "人工标注，缺少时使用采集时的模型结果（准确率为与原模型的一致程度）"
+                if args.use_model_labels else "人工标注"
+            ),
+            file=sys.stderr
+        )
+
+        from backend.client import get_llm_client
+        from backend.config import get_settings
+
+        configs = build_matrix(args, get_settings().MODEL_NAME)
+        inner = None if args.backend == "replay" else get_llm_client()
+        results = []
+        for config in configs:
+            print(f"评估 {config.name}（{len(samples)} 个样本）...", file=sys.stderr)
+            results.append(evaluate_config(config, samples, inner, recording, args.concurrency))
+    finally:
+        if server is not None:
+            server.stop()
+
+    mark_pareto(results)
+    print_table(results)
+    if args.use_model_labels:
+        print("注意: 标签包含采集时的模型结果，accuracy 为与原模型结果的一致程度")
+
+    if args.record and args.backend != "replay":
+        with open(args.record, "w", encoding="utf-8") as f:
+            for entry in recording.values():
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"args": vars(args), "label_source": label_source, "results": results},
+                f, ensure_ascii=False, indent=2
+            )
+
+
+if __name__ == "__main__":
+    main()
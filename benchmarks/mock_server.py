@@ -0,0 +1,259 @@
+"""
+本地模拟服务
+OpenAI 兼容的视觉模型接口（/v1/chat/completions）和 CosyVoice HTTP 合成接口的替身，
+用于离线压测，延迟分布、输出速率和畸形 JSON 比例均可配置
+
+独立运行: python -m benchmarks.mock_server --port 8799 --latency-ms 800
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+# 模拟回复（轮流返回，覆盖三种状态）
+_REPLIES = (
+    {"status": "focused", "message": "专注阅读的样子真棒", "confidence": 0.92, "shouldSpeak": False},
+    {"status": "distracted", "message": "手机放一边吧", "confidence": 0.81, "shouldSpeak": True},
+    {"status": "away", "message": "该回来学习了", "confidence": 0.88, "shouldSpeak": True},
+)
+
+# 约 0.1 秒的静音 MP3 帧（仅用于填充响应体积）
+_SILENT_MP3_FRAME = b"\xff\xfb\x90\x64" + b"\x00" * 413
+
+
+@dataclass
+class MockConfig:
+    """
+    模拟服务配置
+
+    Attributes:
+        latency_ms: 首 token 延迟的中位数（毫秒）
+        latency_sigma: 对数正态分布的 sigma（0 表示固定延迟）
+        tokens_per_second: 输出 token 速率（0 表示不模拟生成耗时）
+        malformed_rate: 返回非 JSON 文本的比例（触发降级解析）
+        error_rate: 返回 HTTP 500 的比例
+        tts_latency_ms: 语音合成延迟（毫秒）
+        tts_audio_kb: 合成音频大小（KB）
+        seed: 随机种子
+    """
+    latency_ms: float = 800.0
+    latency_sigma: float = 0.35
+    tokens_per_second: float = 40.0
+    malformed_rate: float = 0.05
+    error_rate: float = 0.0
+    tts_latency_ms: float = 300.0
+    tts_audio_kb: int = 12
+    seed: Optional[int] = None
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    """请求处理器（配置和计数器挂在 server 上）"""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002 - 覆盖基类签名
+        pass
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        try:
+            return json.loads(raw or b"{}")
+        except json.JSONDecodeError:
+            return {}
+
+    def _send(self, status: int, body: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:  # noqa: N802
+        if self.path.rstrip("/").endswith("/models"):
+            body = json.dumps({"object": "list", "data": [{"id": "mock-vl", "object": "model"}]})
+            self._send(200, body.encode(), "application/json")
+        else:
+            self._send(404, b"{}", "application/json")
+
+    def do_POST(self) -> None:  # noqa: N802
+        server: "MockServer" = self.server.mock  # type: ignore[attr-defined]
+        payload = self._read_json()
+
+        if self.path.endswith("/chat/completions"):
+            self._chat_completion(server, payload)
+        elif self.path.endswith("/tts/synthesis"):
+            self._tts(server)
+        else:
+            self._send(404, b"{}", "application/json")
+
+    def _chat_completion(self, server: "MockServer", payload: Dict[str, Any]) -> None:
+        config = server.config
+        rng = server.rng
+        server.count("chat")
+
+        with server.lock:
+            latency = config.latency_ms / 1000.0
+            if config.latency_sigma > 0:
+                latency *= rng.lognormvariate(0.0, config.latency_sigma)
+            malformed = rng.random() < config.malformed_rate
+            failed = rng.random() < config.error_rate
+            reply = _REPLIES[server.counts["chat"] % len(_REPLIES)]
+
+        if failed:
+            time.sleep(latency)
+            self._send(500, b'{"error": {"message": "mock upstream error"}}', "application/json")
+            return
+
+        content = reply["message"] + "，用户看起来很专注" if malformed else json.dumps(reply, ensure_ascii=False)
+        completion_tokens = max(len(content) // 2, 1)
+        if config.tokens_per_second > 0:
+            latency += completion_tokens / config.tokens_per_second
+        time.sleep(latency)
+
+        prompt_tokens = _estimate_prompt_tokens(payload)
+        body = {
+            "id": f"chatcmpl-mock-{server.counts['chat']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "mock-vl"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        }
+        self._send(200, json.dumps(body, ensure_ascii=False).encode(), "application/json")
+
+    def _tts(self, server: "MockServer") -> None:
+        server.count("tts")
+        time.sleep(server.config.tts_latency_ms / 1000.0)
+        frames = max(server.config.tts_audio_kb * 1024 // len(_SILENT_MP3_FRAME), 1)
+        self._send(200, _SILENT_MP3_FRAME * frames, "audio/mpeg")
+
+
+def _estimate_prompt_tokens(payload: Dict[str, Any]) -> int:
+    """粗略估算 prompt token：文本按 2 字符/token，图片按 Base64 长度折算"""
+    tokens = 0
+    for message in payload.get("messages", []):
+        content = message.get("content")
+        if isinstance(content, str):
+            tokens += len(content) // 2
+            continue
+        for part in content or []:
+            if part.get("type") == "text":
+                tokens += len(part.get("text", "")) // 2
+            elif part.get("type") == "image_url":
+                url = part.get("image_url", {}).get("url", "")
+                tokens += max(len(url) * 3 // 4 // 750, 64)
+    return tokens
+
+
+class MockServer:
+    """
+    在后台线程运行的模拟服务
+
+    用法:
+        with MockServer(MockConfig(latency_ms=200)) as server:
+            os.environ["API_BASE"] = server.api_base
+    """
+
+    def __init__(self, config: Optional[MockConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or MockConfig()
+        self.rng = random.Random(self.config.seed)
+        self.lock = threading.Lock()
+        self.counts: Dict[str, int] = {"chat": 0, "tts": 0}
+        self._httpd = ThreadingHTTPServer((host, port), _MockHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.mock = self  # type: ignore[attr-defined]
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def api_base(self) -> str:
+        """OpenAI 兼容接口地址（API_BASE）"""
+        return f"{self.url}/v1"
+
+    @property
+    def tts_url(self) -> str:
+        """CosyVoice HTTP 接口地址（TTS_API_URL）"""
+        return f"{self.url}/api/v1/services/audio/tts/synthesis"
+
+    def count(self, name: str) -> None:
+        with self.lock:
+            self.counts[name] += 1
+
+    def start(self) -> "MockServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="mock-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "MockServer":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+
+def add_mock_arguments(parser: argparse.ArgumentParser) -> None:
+    """注册模拟服务的命令行参数（压测脚本复用）"""
+    defaults = MockConfig()
+    parser.add_argument("--latency-ms", type=float, default=defaults.latency_ms, help="模型延迟中位数（毫秒）")
+    parser.add_argument("--latency-sigma", type=float, default=defaults.latency_sigma, help="对数正态 sigma，0 为固定延迟")
+    parser.add_argument("--token-rate", type=float, default=defaults.tokens_per_second, help="输出 token/秒")
+    parser.add_argument("--malformed-rate", type=float, default=defaults.malformed_rate, help="畸形 JSON 比例")
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate, help="上游 500 错误比例")
+    parser.add_argument("--tts-latency-ms", type=float, default=defaults.tts_latency_ms, help="语音合成延迟（毫秒）")
+    parser.add_argument("--tts-audio-kb", type=int, default=defaults.tts_audio_kb, help="合成音频大小（KB）")
+    parser.add_argument("--seed", type=int, default=None, help="随机种子")
+
+
+def config_from_args(args: argparse.Namespace) -> MockConfig:
+    return MockConfig(
+        latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        tokens_per_second=args.token_rate,
+        malformed_rate=args.malformed_rate,
+        error_rate=args.error_rate,
+        tts_latency_ms=args.tts_latency_ms,
+        tts_audio_kb=args.tts_audio_kb,
+        seed=args.seed,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="FocusEye 本地模拟模型 / TTS 服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8799)
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    server = MockServer(config_from_args(args), host=args.host, port=args.port)
+    print(f"🧪 模拟服务已启动: API_BASE={server.api_base} TTS_API_URL={server.tts_url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+离线压测
+启动本地模拟服务（见 mock_server.py），以指定并发驱动 analyze_status 和 /api/tts，
+输出 p50/p95/p99 延迟、吞吐量和内存占用
+
+示例:
+    python -m benchmarks.run_benchmark --requests 200 --concurrency 16
+    python -m benchmarks.run_benchmark --json results.json
+    python -m benchmarks.run_benchmark --compare results.json
+"""
+import argparse
+import base64
+import json
+import math
+import os
+import random
+import resource
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 添加项目路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from benchmarks.mock_server import MockServer, add_mock_arguments, config_from_args
+
+SCENARIOS = ("analyze", "analyze-binary", "tts")
+
+
+def make_frame(size_kb: int, seed: int = 0) -> bytes:
+    """
+    生成测试帧（JPEG）
+
+    安装了 Pillow 时生成真实的噪声图片，否则生成带 JPEG 文件头的随机字节
+    （模拟服务不解码图片，校验只检查文件头）
+    """
+    rng = random.Random(seed)
+    try:
+        from io import BytesIO
+        from PIL import Image
+
+        width, height = 800, 450
+        image = Image.frombytes("RGB", (width, height), rng.randbytes(width * height * 3))
+        buffer = BytesIO()
+        quality = 95
+        image.save(buffer, format="JPEG", quality=quality)
+        while buffer.tell() > size_kb * 1024 and quality > 10:
+            quality -= 10
+            buffer = BytesIO()
+            image.save(buffer, format="JPEG", quality=quality)
+        return buffer.getvalue()
+    except ImportError:
+        return b"\xff\xd8\xff\xe0" + rng.randbytes(size_kb * 1024 - 4)
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """最近秩法百分位"""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100.0 * len(sorted_values)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def run_scenario(
+    name: str,
+    call: Callable[[int], bool],
+    requests: int,
+    concurrency: int,
+    warmup: int
+) -> Dict[str, Any]:
+    """
+    以固定并发执行一个场景
+
+    Args:
+        name: 场景名
+        call: 执行第 i 个请求，成功返回 True
+        requests: 请求总数
+        concurrency: 并发数
+        warmup: 预热请求数（不计入统计）
+
+    Returns:
+        Dict: 统计结果
+    """
+    for index in range(warmup):
+        call(-1 - index)
+
+    def timed(index: int) -> Tuple[float, bool]:
+        started = time.perf_counter()
+        ok = call(index)
+        return time.perf_counter() - started, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(timed, range(requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for latency, _ in results)
+    errors = sum(1 for _, ok in results if not ok)
+    return {
+        "scenario": name,
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(requests / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 1) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def build_scenarios(frame: bytes, scenes: List[str]) -> Dict[str, Callable[[int], bool]]:
+    """构建各场景的调用函数（必须在设置好环境变量之后调用）"""
+    from backend.app import create_app
+    from backend.service import analyze_status, analyze_frame_bytes
+
+    data_uri = "data:image/jpeg;base64," + base64.b64encode(frame).decode("ascii")
+    client = create_app().test_client()
+
+    def stats_for(index: int) -> Dict[str, Any]:
+        return {
+            "checkCount": index,
+            "scene": scenes[index % len(scenes)],
+            "continuousFocusMinutes": index % 30,
+            "incrementalFocusMinutes": index % 25,
+            "incrementalRestMinutes": index % 40,
+            "encouragementInterval": 20,
+            "restReminderInterval": 45,
+        }
+
+    def analyze(index: int) -> bool:
+        return bool(analyze_status(data_uri, stats_for(index)).get("success"))
+
+    def analyze_binary(index: int) -> bool:
+        return bool(analyze_frame_bytes(frame, stats_for(index)).get("success"))
+
+    def tts(index: int) -> bool:
+        # 每个请求使用不同文本，避免命中合成缓存
+        response = client.post("/api/tts", json={"text": f"该回来学习了 {index}", "format": "mp3"})
+        return response.status_code == 200
+
+    return {"analyze": analyze, "analyze-binary": analyze_binary, "tts": tts}
+
+
+def print_table(results: List[Dict[str, Any]], baseline: Optional[Dict[str, Dict[str, Any]]] = None) -> None:
+    """打印结果表（提供基线时附带变化百分比）"""
+    columns = ("scenario", "requests", "concurrency", "errors", "rps", "p50_ms", "p95_ms", "p99_ms", "max_rss_mb")
+    print(" | ".join(f"{column:>14}" for column in columns))
+    print("-" * (17 * len(columns)))
+    for result in results:
+        cells = []
+        for column in columns:
+            value = result[column]
+            base = (baseline or {}).get(result["scenario"], {}).get(column)
+            if isinstance(value, float) and isinstance(base, (int, float)) and base:
+                cells.append(f"{value:>8} ({(value - base) / base * 100:+.0f}%)")
+            else:
+                cells.append(f"{value:>14}")
+        print(" | ".join(cells))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="FocusEye 离线压测")
+    parser.add_argument("--requests", type=int, default=100, help="每个场景的请求数")
+    parser.add_argument("--concurrency", type=int, default=8, help="并发数")
+    parser.add_argument("--warmup", type=int, default=2, help="预热请求数")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"逗号分隔，可选 {SCENARIOS}")
+    parser.add_argument("--scenes", default="reading,homework,computer", help="轮换使用的监督场景")
+    parser.add_argument("--frame-kb", type=int, default=60, help="测试帧大小（KB）")
+    parser.add_argument("--tracemalloc", action="store_true", help="统计 Python 堆内存峰值（有额外开销）")
+    parser.add_argument("--json", dest="json_path", help="将结果写入 JSON 文件")
+    parser.add_argument("--compare", help="与之前保存的 JSON 结果对比")
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"未知场景: {', '.join(sorted(unknown))}")
+
+    with MockServer(config_from_args(args)) as server:
+        # 必须在导入 backend 之前设置，配置在导入时读取
+        os.environ.update({
+            "API_BASE": server.api_base,
+            "API_KEY": "mock-key",
+            "TTS_API_URL": server.tts_url,
+            "TTS_BACKEND": "http",
+            "LOG_LEVEL": os.environ.get("LOG_LEVEL", "WARNING"),
+        })
+
+        calls = build_scenarios(make_frame(args.frame_kb), args.scenes.split(","))
+
+        if args.tracemalloc:
+            tracemalloc.start()
+
+        results = []
+        for name in scenarios:
+            result = run_scenario(name, calls[name], args.requests, args.concurrency, args.warmup)
+            if args.tracemalloc:
+                result["heap_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 1)
+                tracemalloc.reset_peak()
+            results.append(result)
+
+        upstream_calls = dict(server.counts)
+
+    # 预览图结果不确定时会用原图再调用一次模型
+    from backend.utils.metrics import RESOLUTION_PASSES
+    escalations = int(RESOLUTION_PASSES.value(result="escalated"))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = {item["scenario"]: item for item in json.load(f)["results"]}
+
+    print_table(results, baseline)
+    print(f"\n上游调用次数: {upstream_calls}（其中原图复核 {escalations} 次）")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results, "upstream_calls": upstream_calls,
+                       "escalations": escalations}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -16,6 +16,25 @@ const API_BASE_URL = import.meta.env.VITE_API_URL || (
     : 'http://192.168.1.25:5001/api'
 )
 
+// 生成随机请求标识
+function newRequestKey() {
+  return (crypto.randomUUID && crypto.randomUUID()) || `${Date.now()}-${Math.random().toString(36).slice(2)}`
+}
+
+// 会话标识（每个标签页一个），服务端按会话限流
+const SESSION_ID = (() => {
+  try {
+    let id = sessionStorage.getItem('focuseye-session-id')
+    if (!id) {
+      id = newRequestKey()
+      sessionStorage.setItem('focuseye-session-id', id)
+    }
+    return id
+  } catch (e) {
+    return newRequestKey()
+  }
+})()
+
 /**
  * 分析图片
  * @param {string} imageBase64 - Base64 编码的图片
@@ -24,19 +43,34 @@ const API_BASE_URL = import.meta.env.VITE_API_URL || (
  * @returns {Promise<Object>} 分析结果
  */
 export async function analyzeImage(imageBase64, stats = null) {
-  try {
-    const response = await fetch(`${API_BASE_URL}/analyze`, {
-      method: 'POST',
-      headers: {
-        'Content-Type': 'application/json'
-      },
-      body: JSON.stringify({
-        image: imageBase64,
-        stats: stats  // 传递统计信息
-      })
+  // 同一次检查的重试沿用同一个幂等键，服务端直接返回原结果而不会再次调用模型
+  const idempotencyKey = newRequestKey()
+  const request = () => fetch(`${API_BASE_URL}/analyze`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      'X-Session-ID': SESSION_ID,
+      'Idempotency-Key': idempotencyKey
+    },
+    body: JSON.stringify({
+      image: imageBase64,
+      stats: stats  // 传递统计信息
     })
+  })
 
-    if (!response.ok) {
+  try {
+    let response
+    try {
+      response = await request()
+    } catch (networkError) {
+      // 网络中断时重试一次
+      console.warn('分析请求网络错误，重试中:', networkError)
+      await new Promise(resolve => setTimeout(resolve, 1000))
+      response = await request()
+    }
+
+    // 409: 本次检查已被同一会话的新请求取代，返回服务端结果
+    if (!response.ok && response.status !== 409) {
       throw new Error(`HTTP error! status: ${response.status}`)
     }
 
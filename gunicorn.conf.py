@@ -0,0 +1,53 @@
+"""
+gunicorn 配置
+进程数、线程数和超时均从环境变量读取（见 backend/config/settings.py）
+
+启动: gunicorn -c gunicorn.conf.py wsgi:app
+"""
+from backend.config import settings
+
+bind = f"{settings.SERVER_HOST}:{settings.SERVER_PORT}"
+
+# 分析请求大部分时间在等待模型响应，使用多线程 worker
+workers = settings.SERVER_WORKERS
+threads = settings.SERVER_THREADS
+worker_class = "gthread"
+
+# 模型调用超时 + 余量；收到 SIGTERM 后等待进行中的请求完成
+timeout = settings.SERVER_TIMEOUT
+graceful_timeout = settings.SERVER_GRACEFUL_TIMEOUT
+keepalive = 5
+
+loglevel = settings.LOG_LEVEL.lower()
+accesslog = "-"
+errorlog = "-"
+
+
+def post_worker_init(worker):
+    """
+    worker 启动后、接收请求前：
+    1. 重新读取配置（master 收到 SIGHUP 重启 worker 时，worker 继承的是 master 启动时的配置）
+    2. 安装配置热重载触发器（SIGHUP / .env 文件修改）
+    3. 启动图片处理进程池（IMAGE_POOL_WORKERS > 0 时）
+    4. 预热 Agent，使第一次分析不承担初始化开销
+    """
+    from backend.config import reload_settings, install_reload_handlers
+    from backend.app import on_shutdown
+    from backend.utils.image_pool import get_image_pool, shutdown_image_pool
+    from backend.utils.capture import close_capture_store
+
+    reload_settings()
+    on_shutdown(install_reload_handlers())
+    on_shutdown(shutdown_image_pool)
+    on_shutdown(close_capture_store)
+    get_image_pool().start()
+
+    if settings.WARMUP_ON_START:
+        from backend.service import warm_up
+        warm_up()
+
+
+def worker_exit(server, worker):
+    """worker 退出时执行应用注册的清理函数"""
+    from backend.app import shutdown
+    shutdown()
@@ -0,0 +1,184 @@
+"""
+准入控制测试
+"""
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from backend.utils.admission import AdmissionController, client_key
+
+
+def test_token_bucket_limits_per_client():
+    controller = AdmissionController(rate_per_minute=60, burst=2, max_concurrency=0)
+
+    assert controller.acquire("a").admitted
+    assert controller.acquire("a").admitted
+    rejected = controller.acquire("a")
+    assert not rejected.admitted and rejected.status == 429
+    assert rejected.headers() == {"Retry-After": "1"}
+    # 其他客户端不受影响
+    assert controller.acquire("b").admitted
+
+
+def test_concurrency_cap_queues_then_sheds():
+    controller = AdmissionController(rate_per_minute=0, max_concurrency=1, max_queue=1, queue_timeout=5)
+    first = controller.acquire("a")
+    assert first.admitted
+
+    queued = {}
+    waiter = threading.Thread(target=lambda: queued.setdefault("ticket", controller.acquire("b")))
+    waiter.start()
+    while controller.waiting == 0:
+        time.sleep(0.01)
+
+    # 队列已满：直接拒绝
+    shed = controller.acquire("c")
+    assert not shed.admitted and shed.status == 503 and shed.reason == "shed"
+    assert shed.retry_after >= 1
+
+    first.release()
+    waiter.join(timeout=5)
+    assert queued["ticket"].admitted and controller.in_flight == 1
+    queued["ticket"].release()
+    assert controller.in_flight == 0
+
+
+def test_queue_timeout():
+    controller = AdmissionController(rate_per_minute=0, max_concurrency=1, max_queue=4, queue_timeout=0.05)
+    with controller.admit("a") as ticket:
+        assert ticket.admitted
+        timed_out = controller.acquire("b")
+    assert not timed_out.admitted and timed_out.reason == "timeout"
+    assert controller.in_flight == 0
+
+
+def test_client_key_ignores_client_supplied_headers():
+    # 会话标识和 X-Forwarded-For 都可以由客户端随意填写
+    assert client_key({"x-session-id": "abc"}, "1.2.3.4", trusted_proxies=0) == "ip:1.2.3.4"
+    assert client_key({"X-Forwarded-For": "5.6.7.8"}, "1.2.3.4", trusted_proxies=0) == "ip:1.2.3.4"
+    assert client_key({}, None, trusted_proxies=0) == "ip:unknown"
+
+
+def test_client_key_uses_right_most_trusted_hop():
+    # 客户端伪造了第一个地址，可信代理追加的是真实地址
+    headers = {"X-Forwarded-For": "6.6.6.6, 5.6.7.8"}
+    assert client_key(headers, "10.0.0.1", trusted_proxies=1) == "ip:5.6.7.8"
+    headers = {"X-Forwarded-For": "6.6.6.6, 5.6.7.8, 10.0.0.2"}
+    assert client_key(headers, "10.0.0.1", trusted_proxies=2) == "ip:5.6.7.8"
+    # 记录的地址少于代理层数（请求没有经过全部代理）：使用连接地址
+    assert client_key({"X-Forwarded-For": "5.6.7.8"}, "10.0.0.1", trusted_proxies=2) == "ip:10.0.0.1"
+
+
+def test_default_settings_can_shed_load():
+    """默认配置下，占满 SERVER_THREADS 个请求线程时准入控制必须能拒绝请求"""
+    from backend.config import Settings
+    from backend.utils import admission
+
+    config = Settings()
+    assert 0 < config.ADMISSION_MAX_CONCURRENCY
+    assert config.ADMISSION_MAX_CONCURRENCY + config.ADMISSION_MAX_QUEUE < config.SERVER_THREADS
+
+    controller = admission.AdmissionController(
+        rate_per_minute=0,
+        max_concurrency=config.ADMISSION_MAX_CONCURRENCY,
+        max_queue=config.ADMISSION_MAX_QUEUE,
+        queue_timeout=config.ADMISSION_QUEUE_TIMEOUT
+    )
+    tickets = []
+    workers = [
+        threading.Thread(target=lambda: tickets.append(controller.acquire("client")))
+        for _ in range(config.SERVER_THREADS)
+    ]
+    for worker in workers:
+        worker.start()
+    deadline = time.monotonic() + 5
+    while sum(not ticket.admitted for ticket in list(tickets)) + controller.in_flight + controller.waiting \
+            < config.SERVER_THREADS and time.monotonic() < deadline:
+        time.sleep(0.01)
+    shed = [ticket for ticket in list(tickets) if not ticket.admitted]
+
+    while any(worker.is_alive() for worker in workers):
+        for ticket in list(tickets):
+            ticket.release()
+        time.sleep(0.01)
+    for ticket in tickets:
+        ticket.release()
+
+    assert len(shed) == config.SERVER_THREADS - config.ADMISSION_MAX_CONCURRENCY - config.ADMISSION_MAX_QUEUE
+    assert all(ticket.status == 503 and ticket.reason == "shed" for ticket in shed)
+
+
+def test_flask_returns_429_with_retry_after(monkeypatch):
+    from backend import app as app_module
+
+    controller = AdmissionController(rate_per_minute=1, burst=1, max_concurrency=0)
+    monkeypatch.setattr(app_module, "get_admission_controller", lambda: controller)
+    client = app_module.create_app().test_client()
+
+    headers = {"X-Session-ID": "s1"}
+    first = client.post("/api/analyze", json={}, headers=headers)
+    assert first.status_code == 400  # 放行（缺少 image 字段）
+    second = client.post("/api/analyze", json={}, headers=headers)
+    assert second.status_code == 429
+    assert int(second.headers["Retry-After"]) >= 1
+    assert second.get_json()["reason"] == "rate_limited"
+
+
+def test_newer_request_supersedes_queued_admission():
+    from backend.Agent.scheduler import track_session
+
+    controller = AdmissionController(rate_per_minute=0, max_concurrency=1, max_queue=4, queue_timeout=5)
+    holder = controller.acquire("other")
+    results = {}
+
+    def request(name):
+        with track_session("tab-1") as token, controller.admit("a", token) as ticket:
+            results[name] = ticket
+
+    old = threading.Thread(target=request, args=("old",))
+    old.start()
+    while controller.waiting == 0:
+        time.sleep(0.005)
+    new = threading.Thread(target=request, args=("new",))
+    new.start()
+    # 新请求到达后，排队中的旧请求立即退出，不必等到名额释放或排队超时
+    old.join(timeout=1)
+    assert not old.is_alive()
+    assert results["old"].status == 409 and results["old"].reason == "superseded"
+    assert results["old"].headers() == {}
+
+    holder.release()
+    new.join(timeout=5)
+    assert results["new"].admitted
+    assert controller.in_flight == 0 and controller.waiting == 0
+
+
+def test_flask_supersedes_queued_request(monkeypatch):
+    from backend import app as app_module
+
+    controller = AdmissionController(rate_per_minute=0, max_concurrency=1, max_queue=4, queue_timeout=5)
+    monkeypatch.setattr(app_module, "get_admission_controller", lambda: controller)
+    client = app_module.create_app().test_client()
+    holder = controller.acquire("other")
+
+    responses = {}
+    old = threading.Thread(target=lambda: responses.setdefault(
+        "old", client.post("/api/analyze", json={}, headers={"X-Session-ID": "s1"})
+    ))
+    old.start()
+    while controller.waiting == 0:
+        time.sleep(0.005)
+    new = threading.Thread(target=lambda: responses.setdefault(
+        "new", client.post("/api/analyze", json={}, headers={"X-Session-ID": "s1"})
+    ))
+    new.start()
+    old.join(timeout=1)
+    holder.release()
+    new.join(timeout=5)
+
+    assert responses["old"].status_code == 409
+    assert responses["old"].get_json()["superseded"] is True
+    assert responses["new"].status_code == 400  # 放行（缺少 image 字段）
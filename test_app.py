@@ -0,0 +1,130 @@
+"""
+测试 Flask 应用的健康检查和预热接口（不调用远程服务）
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from backend.app import create_app
+from backend.service import monitor
+from backend.service.monitor import MonitorService
+
+
+class BrokenSettings:
+    """校验失败的配置"""
+
+    def validate(self):
+        raise ValueError("未配置 API_KEY")
+
+
+def test_health_endpoint_is_cached(monkeypatch):
+    monkeypatch.setattr(MonitorService, "_health_cache", None)
+    client = create_app().test_client()
+
+    response = client.get("/api/health", headers={"X-Request-ID": "health-1"})
+    assert response.status_code == 200
+    assert response.headers["X-Request-ID"] == "health-1"
+    body = response.get_json()
+    assert body["status"] == "healthy" and "monitorInterval" in body["config"]
+
+    # 之后的请求直接返回缓存结果，不再读取和校验配置
+    monkeypatch.setattr(monitor, "get_settings", lambda: BrokenSettings())
+    cached = client.get("/api/health")
+    assert cached.status_code == 200 and cached.get_json() == body
+
+
+def test_health_endpoint_reports_invalid_config(monkeypatch):
+    monkeypatch.setattr(MonitorService, "_health_cache", None)
+    monkeypatch.setattr(monitor, "get_settings", lambda: BrokenSettings())
+    client = create_app().test_client()
+
+    response = client.get("/api/health")
+    assert response.status_code == 500
+    assert response.get_json()["status"] == "unhealthy"
+    # 失败结果不缓存
+    assert MonitorService._health_cache is None
+
+
+class FakeModels:
+    def __init__(self, llm):
+        self.llm = llm
+
+    def list(self):
+        self.llm.calls.append("connect")
+        if self.llm.fail:
+            raise ConnectionError("upstream down")
+        return []
+
+
+class FakeLLM:
+    """记录预热调用的模型客户端替身"""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.calls = []
+
+    @property
+    def root_client(self):
+        return self
+
+    def with_options(self, **kwargs):
+        return self
+
+    @property
+    def models(self):
+        return FakeModels(self)
+
+    def invoke(self, messages, max_tokens=None):
+        self.calls.append(("prime", max_tokens))
+
+
+def _fake_agent(monkeypatch, llm):
+    from backend.Agent import supervisor
+
+    agent = supervisor.SupervisorAgent()
+    agent.llm = llm
+    monkeypatch.setattr(supervisor, "_agent_instance", agent)
+    return agent
+
+
+def test_warmup_endpoint(monkeypatch):
+    llm = FakeLLM()
+    agent = _fake_agent(monkeypatch, llm)
+    client = create_app().test_client()
+
+    response = client.post("/api/warmup?prime=0")
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["status"] == "warm"
+    assert body["report"]["connected"] is True
+    assert {"agentMs", "promptsMs", "connectMs"} <= set(body["report"])
+    assert llm.calls == ["connect"]
+    # 全部场景的 System Prompt 已预渲染
+    assert agent._system_prompts
+
+    response = client.get("/api/warmup?prime=1")
+    assert response.status_code == 200
+    assert llm.calls[-1] == ("prime", 1)
+
+
+def test_warmup_endpoint_reports_connection_failure(monkeypatch):
+    _fake_agent(monkeypatch, FakeLLM(fail=True))
+    client = create_app().test_client()
+
+    response = client.post("/api/warmup?prime=0")
+    # 连接失败不影响预热结果（首个分析请求会重新建立连接）
+    assert response.status_code == 200
+    assert response.get_json()["report"]["connected"] is False
+
+
+def test_warmup_endpoint_failure(monkeypatch):
+    from backend.Agent import supervisor
+
+    def broken():
+        raise RuntimeError("agent init failed")
+
+    monkeypatch.setattr(supervisor, "get_supervisor_agent", broken)
+    response = create_app().test_client().post("/api/warmup")
+    assert response.status_code == 500
+    assert response.get_json()["status"] == "cold"
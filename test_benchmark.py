@@ -0,0 +1,86 @@
+"""
+测试离线压测工具（本地模拟服务，不访问外网）
+"""
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+
+def test_percentile_nearest_rank():
+    from benchmarks.run_benchmark import percentile
+
+    assert percentile([1, 2, 3, 4, 5, 6], 50) == 3
+    assert percentile(list(range(1, 101)), 99) == 99
+    assert percentile(list(range(1, 101)), 100) == 100
+    assert percentile([1, 2, 3], 0) == 1
+    assert percentile([], 50) == 0.0
+
+
+def test_benchmark_against_mock_server(tmp_path):
+    """小规模运行一次压测，检查各场景都成功且上游调用次数正确"""
+    output = tmp_path / "results.json"
+    completed = subprocess.run(
+        [
+            sys.executable, "-m", "benchmarks.run_benchmark",
+            "--requests", "6", "--concurrency", "3", "--warmup", "0",
+            "--latency-ms", "5", "--latency-sigma", "0", "--token-rate", "0",
+            "--tts-latency-ms", "5", "--malformed-rate", "0.5", "--seed", "1",
+            "--json", str(output),
+        ],
+        cwd=project_root, capture_output=True, text=True, timeout=120
+    )
+    assert completed.returncode == 0, completed.stderr
+    
+    data = json.loads(output.read_text(encoding="utf-8"))
+    results = {item["scenario"]: item for item in data["results"]}
+    assert set(results) == {"analyze", "analyze-binary", "tts"}
+    assert all(item["errors"] == 0 for item in results.values())
+    # 每个分析请求调用一次模型，预览图结果不确定时再用原图调用一次
+    assert data["upstream_calls"] == {"chat": 12 + data["escalations"], "tts": 6}
+
+
+def test_evaluate_record_and_replay(tmp_path):
+    """模拟服务评估并录制回复，回放时不访问模型服务且结果一致"""
+    from backend.utils.capture import CaptureSample, CaptureStore
+
+    dataset = tmp_path / "captures"
+    store = CaptureStore(str(dataset), max_side=0, dedup_distance=-1)
+    for index, label in enumerate(["focused", "distracted", "away"]):
+        frame = b"\xff\xd8\xff\xe0" + bytes([index]) * 512
+        store.submit(CaptureSample([frame], [], "reading", {"checkCount": index}, {"status": label}))
+    assert store.flush(timeout=5)
+    store.close()
+
+    def run(*extra):
+        return subprocess.run(
+            [
+                sys.executable, "-m", "benchmarks.evaluate", "--dataset", str(dataset),
+                "--sizes", "0", "--concurrency", "1", "--record", str(tmp_path / "record.jsonl"), *extra,
+            ],
+            cwd=project_root, capture_output=True, text=True, timeout=120
+        )
+
+    # 样本只有采集时的模型结果，没有人工标注：默认不使用
+    completed = run("--backend", "mock")
+    assert completed.returncode != 0 and "--use-model-labels" in completed.stderr
+
+    def evaluate(*extra):
+        output = tmp_path / f"{extra[1]}.json"
+        completed = run("--json", str(output), "--use-model-labels", *extra)
+        assert completed.returncode == 0, completed.stderr
+        assert "标签来源" in completed.stderr
+        data = json.loads(output.read_text(encoding="utf-8"))
+        assert data["label_source"] == "label+model"
+        return data["results"]
+
+    recorded = evaluate("--backend", "mock", "--latency-ms", "5", "--latency-sigma", "0",
+                        "--token-rate", "0", "--malformed-rate", "0", "--seed", "1")
+    replayed = evaluate("--backend", "replay")
+    assert len(recorded) == len(replayed) == 1
+    assert recorded[0]["samples"] == 3 and recorded[0]["errors"] == 0 and recorded[0]["pareto"]
+    for key in ("accuracy", "input_tokens", "output_tokens", "confusion"):
+        assert replayed[0][key] == recorded[0][key]
@@ -0,0 +1,79 @@
+"""
+测试样本采集库（只追加分片、内容去重、相似去重、后台写入）
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from backend.utils.capture import CaptureSample, CaptureStore, iter_records, load_frame
+
+
+def _sample(frame, hashes, status="focused", session="s1"):
+    return CaptureSample(
+        frames=[frame],
+        hashes=hashes,
+        scene="reading",
+        stats={"checkCount": 1},
+        result={"status": status, "message": "好", "confidence": 0.9, "shouldSpeak": False},
+        session_id=session
+    )
+
+
+def test_capture_store_dedup_and_shards(tmp_path):
+    store = CaptureStore(str(tmp_path), max_side=0, shard_bytes=40)
+    frame_a = b"\xff\xd8" + b"a" * 30
+    frame_b = b"\xff\xd8" + b"b" * 30
+
+    store.submit(_sample(frame_a, [0x00FF]))
+    # 同一会话、画面几乎相同且结果相同：跳过
+    store.submit(_sample(frame_a, [0x00FE]))
+    # 结果变化：记录，但图片内容相同只存一次
+    store.submit(_sample(frame_a, [0x00FE], status="distracted"))
+    # 其他会话、新内容：写入新的分片
+    store.submit(_sample(frame_b, [0xFF00], session="s2"))
+    assert store.flush(timeout=5)
+    store.close()
+
+    records = list(iter_records(tmp_path))
+    assert [record["result"]["status"] for record in records] == ["focused", "distracted", "focused"]
+    assert records[0]["frames"] == records[1]["frames"]
+    assert records[0]["frames"][0]["shard"] != records[2]["frames"][0]["shard"]
+    assert load_frame(tmp_path, records[2]["frames"][0]) == frame_b
+    assert len(list(tmp_path.glob("frames-*.bin"))) == 2
+
+    # 重新打开后沿用已有的图片，不重复写入
+    reopened = CaptureStore(str(tmp_path), max_side=0, dedup_distance=-1)
+    reopened.submit(_sample(frame_b, [0xFF00]))
+    assert reopened.flush(timeout=5)
+    reopened.close()
+    records = list(iter_records(tmp_path))
+    assert len(records) == 4 and records[-1]["frames"] == records[2]["frames"]
+
+
+def test_sessionless_samples_are_not_near_deduplicated(tmp_path):
+    store = CaptureStore(str(tmp_path), max_side=0)
+    frame = b"\xff\xd8" + b"a" * 30
+    store.submit(_sample(frame, [0x00FF], session=None))
+    store.submit(_sample(frame, [0x00FF], session=None))
+    assert store.flush(timeout=5)
+    store.close()
+    assert len(list(iter_records(tmp_path))) == 2
+
+
+def test_unusable_directory_disables_capture(tmp_path):
+    from backend.utils.metrics import CAPTURE_EVENTS
+
+    blocker = tmp_path / "file"
+    blocker.write_text("not a directory")
+    store = CaptureStore(str(blocker / "captures"), max_side=0)
+    dropped = CAPTURE_EVENTS.value(result="dropped")
+    errors = CAPTURE_EVENTS.value(result="error")
+
+    store.submit(_sample(b"\xff\xd8" + b"a" * 30, [0x00FF]))
+    assert store.flush(timeout=5) and store.disabled
+    # 停止采集后直接丢弃，不再尝试写入
+    assert not store.submit(_sample(b"\xff\xd8" + b"b" * 30, [0xFF00]))
+    store.close()
+    assert CAPTURE_EVENTS.value(result="dropped") == dropped + 2
+    assert CAPTURE_EVENTS.value(result="error") == errors
@@ -0,0 +1,53 @@
+"""
+测试无服务器入口的冷启动：健康检查和 CORS 预检不应加载 LLM 相关依赖
+"""
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent
+
+# 只有分析请求才需要的重量级依赖
+HEAVY_MODULES = ("langchain_core", "langchain_openai", "openai", "pydantic", "requests")
+
+_PROBE = """
+import json, sys
+import api.index as entry
+health = entry.handler({"httpMethod": "GET", "path": "/api/health"})
+options = entry.handler({"httpMethod": "OPTIONS", "path": "/api/analyze"})
+print(json.dumps({
+    "health": health["statusCode"],
+    "options": options["statusCode"],
+    "loaded": [name for name in %r if name in sys.modules],
+}))
+""" % (HEAVY_MODULES,)
+
+
+def _import_profile(stderr: str) -> dict:
+    """解析 -X importtime 输出，返回 {模块名: 累计耗时(微秒)}"""
+    profile = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        profile[name.strip()] = int(cumulative)
+    return profile
+
+
+def test_health_and_options_skip_llm_stack():
+    """健康检查和预检请求不导入 LangChain / OpenAI / pydantic"""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE],
+        cwd=project_root, capture_output=True, text=True, timeout=60
+    )
+    assert completed.returncode == 0, completed.stderr
+    
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    assert result["health"] == 200
+    assert result["options"] == 200
+    assert result["loaded"] == []
+    
+    profile = _import_profile(completed.stderr)
+    print(f"\n   api.index 导入耗时: {profile.get('api.index', 0) / 1000:.1f}ms")
+    assert "backend.Agent.supervisor" not in profile
@@ -0,0 +1,65 @@
+"""
+配置快照与热重载测试
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from backend.config import settings, get_settings, reload_settings, on_reload, Settings
+
+
+@pytest.fixture
+def restore_settings():
+    original = get_settings()
+    yield
+    reload_settings({name: str(value) for name, value in vars(original).items()})
+
+
+def test_snapshot_is_immutable():
+    snapshot = get_settings()
+    with pytest.raises(AttributeError):
+        snapshot.MODEL_NAME = "other"
+    with pytest.raises(AttributeError):
+        settings.MODEL_NAME = "other"
+
+
+def test_from_env_parses_types():
+    config = Settings.from_env({
+        "MONITOR_INTERVAL": "45",
+        "IMAGE_QUALITY": "0.8",
+        "WARMUP_PRIME": "yes",
+        "LOG_LEVEL": "debug",
+    })
+    assert config.MONITOR_INTERVAL == 45
+    assert config.IMAGE_QUALITY == 0.8
+    assert config.WARMUP_PRIME is True
+    assert config.LOG_LEVEL == "DEBUG"
+    assert config.ENCOURAGEMENT_INTERVAL == Settings.ENCOURAGEMENT_INTERVAL
+
+
+def test_reload_swaps_snapshot_and_notifies(restore_settings):
+    from backend.service import check_health
+
+    before = get_settings()
+    check_health()
+    changes = []
+    on_reload(lambda old, new: changes.append((old.MONITOR_INTERVAL, new.MONITOR_INTERVAL)))
+
+    new = reload_settings({"MONITOR_INTERVAL": "99", "MONITOR_INTERVAL_RANDOM": "3"})
+
+    assert get_settings() is new
+    assert settings.MONITOR_INTERVAL == 99
+    assert before.MONITOR_INTERVAL != 99  # 旧快照不受影响
+    assert changes[-1] == (before.MONITOR_INTERVAL, 99)
+    # 健康检查缓存随配置重新生成
+    assert check_health()["config"]["monitorInterval"] == 99
+    assert check_health()["config"]["monitorIntervalRandom"] == 3
+
+
+def test_invalid_reload_keeps_previous(restore_settings):
+    before = get_settings()
+    assert reload_settings({"MONITOR_INTERVAL": "not-a-number"}) is before
+    assert get_settings() is before
@@ -0,0 +1,112 @@
+"""
+测试模型服务熔断和本地降级分类（模型调用使用替身）
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from backend.Agent import supervisor
+from backend.Agent.fallback import LocalClassifier
+from backend.service import analyze_frame_bytes
+from backend.utils import circuit
+from backend.utils.circuit import CircuitBreaker
+
+JPEG = b"\xff\xd8\xff\xe0" + b"\x00" * 256
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class DownLLM:
+    """模拟不可用的模型服务"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        raise ConnectionError("upstream down")
+
+
+def test_circuit_breaker_states():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=clock)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    # 超过恢复时间后只放行一次探测调用
+    clock.now += 30
+    assert breaker.allow() and not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_local_classifier_nearest_neighbour():
+    classifier = LocalClassifier()
+    focused, phone = 0x0F0F0F0F0F0F0F0F, 0xF0F0F0F0F0F0F0F0
+    classifier.learn("s1", [focused], [120.0], "focused")
+    classifier.learn("s1", [phone], [120.0], "distracted")
+
+    result = classifier.classify("s1", [phone ^ 0b111], [118.0], "reading")
+    assert result["status"] == "distracted" and result["message"]
+    # 还没有与模型结果对照过：置信度为先验，不语音提醒
+    assert result["confidence"] == 0.5 and not result["shouldSpeak"]
+
+    assert classifier.classify("s1", [focused], [10.0])["status"] == "away"
+    # 没有可参考的记录：不做判断
+    unknown = classifier.classify("other", [focused], [120.0])
+    assert unknown["status"] == "unknown" and unknown["confidence"] == 0.0 and not unknown["shouldSpeak"]
+    assert classifier.classify("s1", [], [120.0])["status"] == "unknown"
+
+
+def test_confidence_calibrated_against_model_labels():
+    classifier = LocalClassifier()
+    focused, phone = 0x0F0F0F0F0F0F0F0F, 0xF0F0F0F0F0F0F0F0
+    classifier.learn("s1", [focused], [120.0], "focused")
+    classifier.learn("s1", [phone], [120.0], "distracted")
+    # 相似画面上本地判断与模型结果一致：置信度上升（不超过上限）
+    for offset in range(1, 9):
+        classifier.learn("s1", [phone ^ offset], [120.0], "distracted")
+    result = classifier.classify("s1", [phone ^ 0b111], [118.0])
+    assert result["status"] == "distracted"
+    assert result["confidence"] == 0.7 and result["shouldSpeak"]
+
+    # 只有一条相似记录支持时不语音提醒
+    classifier.learn("s2", [phone], [120.0], "distracted")
+    single = classifier.classify("s2", [phone ^ 0b111], [118.0])
+    assert single["confidence"] == 0.7 and not single["shouldSpeak"]
+
+    # 本地判断与模型结果不一致：置信度下降
+    classifier = LocalClassifier()
+    for index in range(5):
+        classifier.learn(f"t{index}", [phone], [120.0], "distracted")
+        classifier.learn(f"t{index}", [phone ^ 1], [120.0], "focused")
+    classifier.learn("s4", [phone], [120.0], "distracted")
+    assert classifier.classify("s4", [phone ^ 0b111], [118.0])["confidence"] < 0.3
+
+
+def test_degraded_result_when_model_unavailable(monkeypatch):
+    agent = supervisor.SupervisorAgent()
+    agent.llm = DownLLM()
+    monkeypatch.setattr(supervisor, "_agent_instance", agent)
+    monkeypatch.setattr(circuit, "_circuit", CircuitBreaker(failure_threshold=2, reset_timeout=60))
+
+    results = [analyze_frame_bytes(JPEG, {"scene": "reading"}) for _ in range(4)]
+    assert all(result["success"] and result["degraded"] for result in results)
+    # 会话没有模型分析过的画面：降级结果不做判断
+    assert all(result["status"] == "unknown" and not result["shouldSpeak"] for result in results)
+    # 熔断后不再调用模型服务
+    assert agent.llm.calls == 2
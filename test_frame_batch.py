@@ -0,0 +1,53 @@
+"""
+批量帧预处理测试（需要 Pillow；NumPy 向量化路径与逐帧路径结果一致）
+"""
+import io
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+pytest.importorskip("PIL")
+from PIL import Image, ImageDraw
+
+import backend.utils.frame_batch as frame_batch
+from backend.utils.image_tool import preprocess_frames
+
+
+def _frame(shift=0, background=(200, 200, 195)):
+    image = Image.new("RGB", (640, 360), background)
+    draw = ImageDraw.Draw(image)
+    draw.ellipse((280 + shift, 75, 360 + shift, 165), fill=(180, 140, 120))
+    draw.rectangle((240, 165, 400, 300), fill=(40, 60, 120))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def test_vectorized_matches_per_frame(monkeypatch):
+    pytest.importorskip("numpy")
+    frames = [_frame(0), _frame(20), _frame(40)]
+    vectorized = frame_batch.load_batch(frames)
+    monkeypatch.setattr(frame_batch, "_numpy", lambda: None)
+    per_frame = frame_batch.load_batch(frames)
+
+    # 两种方式都是面积平均缩放，只有取整误差
+    assert vectorized.probe_size == per_frame.probe_size
+    assert vectorized.brightness == pytest.approx(per_frame.brightness, abs=1.0)
+    for left, right in zip(vectorized.hashes, per_frame.hashes):
+        assert frame_batch.hamming_distance(left, right) <= 4
+    assert vectorized.total == pytest.approx(per_frame.total, rel=0.1)
+    assert vectorized.columns.index(max(vectorized.columns)) == pytest.approx(
+        per_frame.columns.index(max(per_frame.columns)), abs=2
+    )
+
+
+def test_brightness_and_hashes():
+    frames = [_frame(), _frame(), _frame(background=(5, 5, 5))]
+    batch = frame_batch.load_batch(frames)
+    assert frame_batch.hamming_distance(batch.hashes[0], batch.hashes[1]) == 0
+    assert not batch.dark
+    assert preprocess_frames([_frame(background=(5, 5, 5))], roi=False).dark
+    assert frame_batch.load_batch([b"not an image"]) is None
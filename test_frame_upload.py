@@ -0,0 +1,143 @@
+"""
+测试二进制帧上传解析（multipart/form-data 和 image/* 请求体）
+"""
+import sys
+from pathlib import Path
+
+# 添加项目路径
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from backend.utils import parse_frame_upload, is_binary_frame_request, validate_image_bytes
+
+JPEG_BYTES = b"\xff\xd8\xff\xe0" + b"\x00" * 64
+
+
+def test_raw_image_body_with_stats_header():
+    """测试原始 image/jpeg 请求体，统计信息放在请求头"""
+    assert is_binary_frame_request("image/jpeg")
+    image, stats = parse_frame_upload(
+        "image/jpeg", JPEG_BYTES, {"x-focuseye-stats": '%7B%22scene%22%3A%22homework%22%7D'}
+    )
+    assert image == JPEG_BYTES
+    assert stats == {"scene": "homework"}
+    assert validate_image_bytes(image) == (True, "")
+
+
+def test_multipart_body():
+    """测试 multipart/form-data 请求体"""
+    boundary = "----focuseye"
+    body = (
+        f"--{boundary}\r\n"
+        'Content-Disposition: form-data; name="stats"\r\n\r\n'
+        '{"scene": "reading", "checkCount": 3}\r\n'
+        f"--{boundary}\r\n"
+        'Content-Disposition: form-data; name="image"; filename="frame.jpg"\r\n'
+        "Content-Type: image/jpeg\r\n\r\n"
+    ).encode() + JPEG_BYTES + f"\r\n--{boundary}--\r\n".encode()
+    
+    image, stats = parse_frame_upload(f"multipart/form-data; boundary={boundary}", body)
+    assert image == JPEG_BYTES
+    assert stats == {"scene": "reading", "checkCount": 3}
+
+
+def test_multipart_burst():
+    """测试连拍：多个 image 字段按顺序返回"""
+    from backend.utils import parse_frame_uploads
+
+    boundary = "----focuseye"
+    frames = [JPEG_BYTES + bytes([index]) for index in range(3)]
+    body = b"".join(
+        (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="image"; filename="frame{index}.jpg"\r\n'
+            "Content-Type: image/jpeg\r\n\r\n"
+        ).encode() + frame + b"\r\n"
+        for index, frame in enumerate(frames)
+    ) + f"--{boundary}--\r\n".encode()
+
+    images, _ = parse_frame_uploads(f"multipart/form-data; boundary={boundary}", body)
+    assert images == frames
+    image, _ = parse_frame_upload(f"multipart/form-data; boundary={boundary}", body)
+    assert image == frames[0]
+
+
+def test_burst_user_message():
+    """测试连拍消息：每帧一个图片段，并附带连拍说明"""
+    from backend.Agent.prompts import create_user_message
+
+    parts = create_user_message(["data:image/jpeg;base64,AA"] * 3, {"checkCount": 2}, frame_count=3)
+    assert sum(1 for part in parts if part["type"] == "image_url") == 3
+    assert "3 张照片" in parts[0]["text"]
+
+    # 客户端传入的间隔无法解析时忽略，不影响请求
+    for interval, expected in (("2.5", "间隔约 2.5 秒"), ("abc", None), ([1], None), ("nan", None)):
+        parts = create_user_message(["AA"] * 2, {"frameIntervalSeconds": interval}, frame_count=2)
+        assert (expected in parts[0]["text"]) if expected else "间隔" not in parts[0]["text"]
+
+
+def test_frame_statuses_only_in_burst_prompt(monkeypatch):
+    """测试单张照片的 System Prompt 不包含连拍字段"""
+    from backend.Agent import supervisor
+
+    monkeypatch.setattr(supervisor, "get_llm_client", lambda: None)
+    agent = supervisor.SupervisorAgent()
+    single = agent.get_rendered_system_prompt("reading")
+    burst = agent.get_rendered_system_prompt("reading", burst=True)
+    assert "frameStatuses" not in single
+    assert "frameStatuses" in burst
+    assert agent.get_rendered_system_prompt("reading") is single
+
+    messages = agent._build_messages("AA", {"scene": "reading"})
+    assert messages[0].content is single
+    messages = agent._build_messages(["AA", "BB"], {"scene": "reading"})
+    assert messages[0].content is burst
+
+
+def test_contact_sheet():
+    """测试连拍拼图（需要 Pillow）"""
+    import io
+
+    import pytest
+    Image = pytest.importorskip("PIL.Image")
+    from backend.utils import compose_contact_sheet
+
+    frames = []
+    for color in ("red", "green", "blue"):
+        buffer = io.BytesIO()
+        Image.new("RGB", (64, 48), color).save(buffer, format="JPEG")
+        frames.append(buffer.getvalue())
+
+    sheet = Image.open(io.BytesIO(compose_contact_sheet(frames, tile_width=64)))
+    assert sheet.size == (128, 96)
+    assert compose_contact_sheet([b"not an image"]) is None
+
+
+def test_region_of_interest_crop():
+    """测试区域裁剪：背景被裁掉，纯色画面保持原图（需要 Pillow）"""
+    import io
+
+    import pytest
+    pytest.importorskip("PIL")
+    from PIL import Image, ImageDraw
+    from backend.utils import crop_to_region_of_interest
+
+    def encode(image):
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG")
+        return buffer.getvalue()
+
+    frame = Image.new("RGB", (1280, 720), (200, 200, 195))
+    draw = ImageDraw.Draw(frame)
+    draw.ellipse((560, 150, 720, 330), fill=(180, 140, 120))
+    draw.rectangle((480, 330, 800, 600), fill=(40, 60, 120))
+    draw.rectangle((350, 560, 950, 720), fill=(120, 80, 40))
+
+    cropped, ratio = crop_to_region_of_interest([encode(frame)])
+    assert ratio < 0.8
+    width, height = Image.open(io.BytesIO(cropped[0])).size
+    assert width < 1280 and width * height >= 0.4 * 1280 * 0.4 * 720
+
+    flat = encode(Image.new("RGB", (1280, 720), (90, 90, 90)))
+    assert crop_to_region_of_interest([flat]) == ([flat], 1.0)
+    assert crop_to_region_of_interest([b"not an image"]) == ([b"not an image"], 1.0)
@@ -0,0 +1,93 @@
+"""
+幂等请求结果缓存测试
+"""
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import pytest
+
+from backend.utils.idempotency import IdempotencyCache, IdempotencyConflict, request_fingerprint, scoped_key
+
+
+def test_retry_returns_cached_result():
+    cache = IdempotencyCache(ttl=60)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"success": True, "status": "focused"}
+
+    assert cache.run("k", compute) == ({"success": True, "status": "focused"}, "miss")
+    assert cache.run("k", compute) == ({"success": True, "status": "focused"}, "hit")
+    assert len(calls) == 1
+
+
+def test_retry_joins_in_progress_request():
+    cache = IdempotencyCache(ttl=60)
+    started = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        time.sleep(0.1)
+        return {"success": True, "status": "away"}
+
+    results = []
+    original = threading.Thread(target=lambda: results.append(cache.run("k", slow)))
+    original.start()
+    started.wait(1)
+    assert cache.run("k", slow) == ({"success": True, "status": "away"}, "joined")
+    original.join(1)
+    assert len(calls) == 1
+
+
+def test_failures_not_cached_and_keys_scoped():
+    cache = IdempotencyCache(ttl=60)
+    cache.run("k", lambda: {"success": False, "status": "error"})
+    assert cache.run("k", lambda: {"success": True})[1] == "miss"
+
+    assert scoped_key("", "tab-1") is None
+    assert scoped_key("abc", "tab-1") != scoped_key("abc", "tab-2")
+    # 没有会话标识：不使用共享的键空间
+    assert scoped_key("abc", None) is None and scoped_key("abc", " ") is None
+
+
+def test_same_key_with_different_body_is_rejected():
+    cache = IdempotencyCache(ttl=60)
+    first = request_fingerprint([b"frame-1"], {"checkCount": 1}, "frames")
+    assert first == request_fingerprint([b"frame-1"], {"checkCount": 1}, "frames")
+    other = request_fingerprint([b"frame-2"], {"checkCount": 1}, "frames")
+    assert other != first
+    assert request_fingerprint(["ab", "c"]) != request_fingerprint(["a", "bc"])
+
+    cache.run("k", lambda: {"success": True, "status": "focused"}, first)
+    assert cache.run("k", lambda: {"success": True}, first)[1] == "hit"
+    with pytest.raises(IdempotencyConflict):
+        cache.run("k", lambda: {"success": True}, other)
+
+
+def test_conflict_returns_422(monkeypatch):
+    from backend import app as app_module
+    from backend.service import monitor
+    from backend.utils import idempotency
+    from backend.utils.admission import AdmissionController
+
+    monkeypatch.setattr(idempotency, "_cache", IdempotencyCache(ttl=60))
+    monkeypatch.setattr(app_module, "get_admission_controller", lambda: AdmissionController(rate_per_minute=0))
+    monkeypatch.setattr(
+        monitor.MonitorService, "_run_analysis",
+        staticmethod(lambda *args, **kwargs: {"success": True, "status": "focused"})
+    )
+    client = app_module.create_app().test_client()
+    headers = {"X-Session-ID": "tab-1", "Idempotency-Key": "check-1", "Content-Type": "image/jpeg"}
+    jpeg = b"\xff\xd8\xff\xe0" + b"\x00" * 64
+    assert client.post("/api/analyze", data=jpeg, headers=headers).status_code == 200
+    assert client.post("/api/analyze", data=jpeg, headers=headers).status_code == 200
+    response = client.post("/api/analyze", data=jpeg + b"\x01", headers=headers)
+    assert response.status_code == 422
+    assert response.get_json()["idempotencyConflict"] is True
@@ -0,0 +1,104 @@
+"""
+图片处理进程池测试
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from backend.utils.image_pool import ImagePool, _run_in_worker
+from backend.utils.image_tool import PreprocessedFrames
+from backend.utils.metrics import IMAGE_POOL_TASKS
+
+FRAMES = [b"not an image" * 100, b"\x00" * 50]
+
+
+def _count(mode):
+    return IMAGE_POOL_TASKS.value(task="preprocess", mode=mode)
+
+
+def test_small_frames_run_inline():
+    pool = ImagePool(workers=1, min_bytes=1 << 20)
+    before = _count("inline")
+    assert pool.run("preprocess", FRAMES) == PreprocessedFrames(FRAMES)
+    assert _count("inline") == before + 1
+    assert pool._executor is None
+
+
+def test_frames_handed_to_worker_via_shared_memory():
+    pool = ImagePool(workers=1, min_bytes=1)
+    try:
+        before = _count("pool")
+        assert pool.run("preprocess", FRAMES, padding=0.1) == PreprocessedFrames(FRAMES)
+        assert _count("pool") == before + 1
+    finally:
+        pool.shutdown()
+
+
+def _photo():
+    """人物位于画面中间的合成照片（四周为均匀背景）"""
+    import io
+
+    from PIL import Image, ImageDraw
+
+    image = Image.new("RGB", (640, 480), (200, 200, 195))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((250, 150, 390, 400), fill=(40, 60, 90))
+    draw.ellipse((280, 80, 360, 160), fill=(180, 140, 120))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def test_pillow_tasks_match_inline_result():
+    import pytest
+    pytest.importorskip("PIL")
+    from backend.utils.image_pool import TASKS
+
+    frames = [_photo(), _photo()]
+    pool = ImagePool(workers=1, min_bytes=0)
+    try:
+        before = _count("pool")
+        prepared = pool.run("preprocess", frames)
+        assert prepared.area_ratio < 1.0 and prepared == TASKS["preprocess"](frames)
+        assert _count("pool") == before + 1
+        sheet = pool.run("contact_sheet", frames, tile_width=160)
+        assert sheet and sheet == TASKS["contact_sheet"](frames, tile_width=160)
+    finally:
+        pool.shutdown()
+
+
+def test_task_error_keeps_pool():
+    import pytest
+
+    pool = ImagePool(workers=1, min_bytes=1)
+    try:
+        pool.start()
+        executor = pool._executor
+        # 任务本身出错：在当前线程重试（仍然出错），进程池不重建
+        with pytest.raises(TypeError):
+            pool.run("preprocess", FRAMES, unknown_option=1)
+        assert pool._executor is executor
+        assert _count("fallback") >= 1
+    finally:
+        pool.shutdown()
+
+
+def test_timeout_cancels_queued_task():
+    import time
+
+    pool = ImagePool(workers=1, min_bytes=1, timeout=0.5)
+    try:
+        pool.start()
+        # 占住唯一的子进程，下一个任务只能排队
+        busy = pool._executor.submit(time.sleep, 3)
+        before = _count("fallback")
+        assert pool.run("preprocess", FRAMES) == PreprocessedFrames(FRAMES)
+        assert _count("fallback") == before + 1
+        busy.result()
+    finally:
+        pool.shutdown()
+
+
+def test_released_block_treated_as_cancelled():
+    assert _run_in_worker("preprocess", "psm_released_block", [len(FRAMES[0])], {}) is None
@@ -0,0 +1,43 @@
+"""
+测试结构化日志（在子进程中配置根日志，不影响测试框架的日志处理器）
+"""
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent
+
+SCRIPT = """
+import logging
+from backend.utils import log_tool
+
+foreign = logging.NullHandler()
+logging.getLogger().addHandler(foreign)
+log_tool.configure_logging("INFO", "json")
+log_tool.configure_logging("INFO", "json")
+log_tool.new_request_id("req-1")
+try:
+    1 / 0
+except ZeroDivisionError:
+    logging.getLogger("demo").exception("failed %s", "x", extra={"scene": "reading"})
+handlers = logging.getLogger().handlers
+assert foreign in handlers, handlers
+assert sum(isinstance(h, log_tool.StructuredQueueHandler) for h in handlers) == 1, handlers
+log_tool._stop_listener()
+"""
+
+
+def test_exception_is_logged_as_json_field():
+    completed = subprocess.run(
+        [sys.executable, "-c", SCRIPT], cwd=project_root, capture_output=True, text=True, timeout=60
+    )
+    assert completed.returncode == 0, completed.stderr
+    lines = [json.loads(line) for line in completed.stderr.splitlines() if line.startswith("{")]
+    assert len(lines) == 1, completed.stderr
+    entry = lines[0]
+    assert entry["level"] == "ERROR"
+    assert entry["request_id"] == "req-1"
+    assert entry["msg"] == "failed x"
+    assert entry["scene"] == "reading"
+    assert "ZeroDivisionError" in entry["exc"] and "ZeroDivisionError" not in entry["msg"]
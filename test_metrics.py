@@ -0,0 +1,65 @@
+"""
+测试 Prometheus 指标导出格式和 /api/metrics 接口
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from backend.utils.metrics import CONTENT_TYPE, Counter, Gauge, Histogram, MetricsRegistry
+
+
+def test_render_escapes_label_values():
+    registry = MetricsRegistry()
+    counter = registry.register(Counter("demo_total", "示例计数", ["path"]))
+    gauge = registry.register(Gauge("demo_depth", "示例瞬时值"))
+    counter.inc(path='a"b\\c\nd')
+    counter.inc(2, path="plain")
+    gauge.set(1.5)
+
+    text = registry.render()
+    assert text.endswith("\n")
+    lines = text.splitlines()
+    assert lines[:2] == ["# HELP demo_total 示例计数", "# TYPE demo_total counter"]
+    assert 'demo_total{path="a\\"b\\\\c\\nd"} 1' in lines
+    assert 'demo_total{path="plain"} 2' in lines
+    assert "# TYPE demo_depth gauge" in lines
+    assert "demo_depth 1.5" in lines
+
+
+def test_render_histogram_buckets():
+    histogram = Histogram("demo_seconds", "示例耗时", ["stage"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        histogram.observe(value, stage="total")
+
+    lines = histogram.render().splitlines()
+    assert lines[1] == "# TYPE demo_seconds histogram"
+    assert lines[2:] == [
+        'demo_seconds_bucket{stage="total",le="0.1"} 1',
+        'demo_seconds_bucket{stage="total",le="1"} 3',
+        'demo_seconds_bucket{stage="total",le="+Inf"} 4',
+        'demo_seconds_sum{stage="total"} 4.25',
+        'demo_seconds_count{stage="total"} 4',
+    ]
+    assert histogram.count(stage="total") == 4
+
+
+def test_metrics_endpoint():
+    from backend.app import create_app
+
+    client = create_app().test_client()
+    response = client.get("/api/metrics")
+    assert response.status_code == 200
+    assert response.headers["Content-Type"] == CONTENT_TYPE
+    text = response.get_data(as_text=True)
+    assert "# TYPE focuseye_analyze_stage_seconds histogram" in text
+    assert "# TYPE focuseye_admission_total counter" in text
+
+
+def test_metrics_endpoint_serverless():
+    from api.index import handler
+
+    response = handler({"httpMethod": "GET", "path": "/api/metrics"})
+    assert response["statusCode"] == 200
+    assert response["headers"]["Content-Type"] == CONTENT_TYPE
+    assert "# TYPE focuseye_analyze_results_total counter" in response["body"]
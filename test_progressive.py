@@ -0,0 +1,70 @@
+"""
+测试渐进分辨率：先用预览图分析，结果不确定时再用原图（模型调用使用替身）
+"""
+import io
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from langchain_core.messages import AIMessage
+
+from backend.Agent import supervisor
+from backend.Agent.prompts import SupervisorResponse
+from backend.service import analyze_frame_bytes
+
+
+class ScriptedLLM:
+    """按顺序返回预设结果的模型替身，记录每次调用的图片"""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.images = []
+
+    def invoke(self, messages):
+        self.images.append([
+            part["image_url"]["url"] for part in messages[1].content if part.get("type") == "image_url"
+        ])
+        return AIMessage(content=self.replies.pop(0))
+
+
+def _reply(status, confidence):
+    return f'{{"status": "{status}", "message": "好", "confidence": {confidence}, "shouldSpeak": false}}'
+
+
+def _photo():
+    Image = pytest.importorskip("PIL.Image")
+    buffer = io.BytesIO()
+    Image.new("RGB", (1024, 768), (120, 130, 140)).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def test_needs_full_resolution():
+    check = supervisor.SupervisorAgent.needs_full_resolution
+    assert not check(SupervisorResponse(status="focused", message="好", confidence=0.9))
+    assert not check(SupervisorResponse(status="away", message="好", confidence=0.8))
+    assert check(SupervisorResponse(status="focused", message="好", confidence=0.5))
+    assert check(SupervisorResponse(status="distracted", message="好", confidence=0.95))
+    assert check(SupervisorResponse(status="unknown", message="好", confidence=0.9))
+
+
+@pytest.mark.parametrize("replies, calls", [
+    ((_reply("focused", 0.9),), 1),
+    ((_reply("focused", 0.4), _reply("focused", 0.9)), 2),
+])
+def test_preview_then_escalate(monkeypatch, replies, calls):
+    photo = _photo()
+    agent = supervisor.SupervisorAgent()
+    agent.llm = ScriptedLLM(*replies)
+    monkeypatch.setattr(supervisor, "_agent_instance", agent)
+
+    result = analyze_frame_bytes(photo, {"scene": "reading"})
+    assert result["success"] and result["status"] == "focused" and result["confidence"] == 0.9
+    assert len(agent.llm.images) == calls
+    preview = agent.llm.images[0][0]
+    assert len(preview) < len(photo) * 4 / 3
+    if calls == 2:
+        # 复核时发送原图（未裁剪的纯色图保持原样）
+        assert len(agent.llm.images[1][0]) > len(preview)
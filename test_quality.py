@@ -0,0 +1,110 @@
+"""
+测试过载自适应质量控制器（时钟和排队数使用替身）
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from backend.service import monitor
+from backend.utils.metrics import QUALITY_LEVEL
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_steps_down_under_load_and_recovers(monkeypatch):
+    clock = FakeClock()
+    controller = monitor.QualityController(clock=clock)
+    queue = {"depth": 0.0}
+    monkeypatch.setattr(monitor.QualityController, "queue_depth", staticmethod(lambda: queue["depth"]))
+
+    clock.now += 60
+    assert controller.profile().level == 0
+
+    # 排队超过目标：每个调整间隔最多降一级
+    queue["depth"] = 10
+    assert controller.profile().level == 1
+    assert controller.profile().level == 1
+    clock.now += 10
+    assert controller.profile().level == 2
+    clock.now += 10
+    assert controller.profile().level == 2
+    assert QUALITY_LEVEL.value() == 2
+
+    # 排队回落但耗时仍高：保持
+    queue["depth"] = 0
+    controller.observe(12.0)
+    clock.now += 10
+    assert controller.profile().level == 2
+
+    # 耗时恢复后逐级回到完整质量
+    for _ in range(6):
+        controller.observe(1.0)
+    clock.now += 10
+    assert controller.profile().level == 1
+    clock.now += 10
+    assert controller.profile().level == 0
+
+
+def test_stale_latency_does_not_pin_degraded_level(monkeypatch):
+    clock = FakeClock()
+    controller = monitor.QualityController(clock=clock)
+    monkeypatch.setattr(monitor.QualityController, "queue_depth", staticmethod(lambda: 0.0))
+
+    clock.now += 60
+    controller.observe(30.0)
+    assert controller.profile().level == 1
+    # 之后没有新的请求（空闲），过期的耗时样本不再计入
+    clock.now += 120
+    assert controller.profile().level == 0
+
+
+def test_admission_queue_triggers_degradation_with_default_settings():
+    """默认配置下准入控制的排队数能够超过 QUALITY_QUEUE_TARGET（否则排队触发永远不会生效）"""
+    import threading
+    import time
+
+    from backend.config import Settings
+    from backend.utils.admission import AdmissionController
+
+    config = Settings()
+    assert config.ADMISSION_MAX_QUEUE > config.QUALITY_QUEUE_TARGET
+    admission = AdmissionController(
+        rate_per_minute=0,
+        max_concurrency=config.ADMISSION_MAX_CONCURRENCY,
+        max_queue=config.ADMISSION_MAX_QUEUE,
+        queue_timeout=5
+    )
+    running = [admission.acquire("client") for _ in range(config.ADMISSION_MAX_CONCURRENCY)]
+    queued = []
+    waiters = [
+        threading.Thread(target=lambda: queued.append(admission.acquire("client")))
+        for _ in range(config.ADMISSION_MAX_QUEUE)
+    ]
+    for waiter in waiters:
+        waiter.start()
+    deadline = time.monotonic() + 5
+    while admission.waiting < config.ADMISSION_MAX_QUEUE and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    clock = FakeClock()
+    controller = monitor.QualityController(clock=clock)
+    clock.now += 60
+    try:
+        assert controller.queue_depth() > config.QUALITY_QUEUE_TARGET
+        assert controller.profile().level == 1
+    finally:
+        for ticket in running:
+            ticket.release()
+        for waiter in waiters:
+            waiter.join(timeout=5)
+        for ticket in queued:
+            ticket.release()
+    clock.now += config.QUALITY_STEP_INTERVAL
+    assert controller.profile().level == 0
@@ -0,0 +1,55 @@
+"""
+请求体大小限制和流式解析测试
+"""
+import base64
+import io
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from backend.utils.request_body import RequestBodyError, check_content_length, parse_analyze_body
+
+JPEG_BYTES = b"\xff\xd8\xff\xe0" + bytes(range(256)) * 300
+DATA_URI = "data:image/jpeg;base64," + base64.b64encode(JPEG_BYTES).decode()
+
+
+def _parse(body, **kwargs):
+    return parse_analyze_body(io.BytesIO(body), **kwargs)
+
+
+def test_stream_parse_matches_json():
+    body = json.dumps({"image": DATA_URI, "stats": {"scene": "阅读", "checkCount": 2}, "layout": "grid"},
+                      ensure_ascii=False).encode()
+    frames, fields = _parse(body)
+    assert frames == [JPEG_BYTES]
+    assert fields == {"stats": {"scene": "阅读", "checkCount": 2}, "layout": "grid"}
+
+    # 转义的斜杠和连拍列表
+    frames, _ = _parse(json.dumps({"images": [DATA_URI, DATA_URI]}).replace("/", "\\/").encode())
+    assert frames == [JPEG_BYTES, JPEG_BYTES]
+
+
+def test_oversized_and_malformed_bodies_rejected():
+    with pytest.raises(RequestBodyError) as error:
+        check_content_length(10 * 1024 * 1024, 8 * 1024 * 1024)
+    assert error.value.status == 413
+
+    body = json.dumps({"image": DATA_URI}).encode()
+    for kwargs in ({"limit": 1024}, {"max_frame_bytes": 1024}):
+        with pytest.raises(RequestBodyError) as error:
+            _parse(body, **kwargs)
+        assert error.value.status == 413
+
+    with pytest.raises(RequestBodyError) as error:
+        _parse(json.dumps({"images": [DATA_URI] * 5}).encode(), max_frames=4)
+    assert error.value.status == 413
+
+    for bad in (b'{"image": "not-a-data-uri"}', b'{"image": "data:image/jpeg;base64,AAA"}',
+                b'{"image": "data:image/jpeg;base64,AAAA', b'{"stats": {}} trailing'):
+        with pytest.raises(RequestBodyError) as error:
+            _parse(bad)
+        assert error.value.status == 400
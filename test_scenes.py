@@ -0,0 +1,98 @@
+"""
+场景注册表测试
+"""
+import json
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from backend.Agent.scenes import BUILTIN_SCENES_DIR, SceneRegistry, parse_scene, scene_registry
+
+
+@pytest.fixture
+def scenes_dir(tmp_path):
+    directory = tmp_path / "scenes"
+    shutil.copytree(BUILTIN_SCENES_DIR, directory)
+    return directory
+
+
+def _edit(directory: Path, key: str, **changes) -> None:
+    path = directory / f"{key}.json"
+    data = json.loads(path.read_text(encoding="utf-8"))
+    data.update(changes)
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+
+
+def test_builtin_scenes_prerendered():
+    scenes = scene_registry.scenes()
+    assert list(scenes)[0] == "reading"
+    assert {"reading", "homework", "computer"} <= set(scenes)
+    homework = scenes["homework"]
+    assert homework.posture_check and "坐姿检查" in homework.system_prompt
+    assert homework.name in homework.system_prompt
+    # 未知场景回退到默认场景
+    assert scene_registry.get("unknown") is scenes["reading"]
+
+
+def test_parse_scene_rejects_invalid():
+    with pytest.raises(ValueError, match="version"):
+        parse_scene({"name": "x"}, "x")
+    data = json.loads((BUILTIN_SCENES_DIR / "reading.json").read_text(encoding="utf-8"))
+    data["normal_msg_examples"] = []
+    with pytest.raises(ValueError, match="normal_msg_examples"):
+        parse_scene(data, "reading")
+
+
+def test_reload_swaps_only_changed_scenes(scenes_dir):
+    registry = SceneRegistry(scenes_dir)
+    before = registry.scenes()
+    notified = []
+    registry.on_change(notified.append)
+
+    assert registry.reload() == set()  # 文件未变化
+    _edit(scenes_dir, "eating", version=2, name="好好吃饭")
+    (scenes_dir / "drawing.json").write_text(json.dumps({
+        **json.loads((scenes_dir / "reading.json").read_text(encoding="utf-8")),
+        "key": "drawing", "name": "专心画画",
+    }, ensure_ascii=False), encoding="utf-8")
+
+    assert registry.reload(force=True) == {"eating", "drawing"}
+    assert notified == [{"eating", "drawing"}]
+    assert registry.get("eating").version == "2"
+    assert "好好吃饭" in registry.get("eating").system_prompt
+    # 旧场景表和未变化的场景不受影响
+    assert before["eating"].name == "专心吃饭"
+    assert "drawing" not in before
+
+
+def test_invalid_file_keeps_previous_scenes(scenes_dir):
+    registry = SceneRegistry(scenes_dir)
+    before = registry.scenes()
+    (scenes_dir / "broken.json").write_text("{not json", encoding="utf-8")
+
+    assert registry.reload(force=True) == set()
+    assert registry.scenes() is before
+
+
+def test_supervisor_prompt_cache_follows_scene_reload(monkeypatch, scenes_dir):
+    from backend.Agent import supervisor
+
+    registry = SceneRegistry(scenes_dir)
+    monkeypatch.setattr(supervisor, "get_scene", registry.get)
+
+    agent = supervisor.SupervisorAgent.__new__(supervisor.SupervisorAgent)
+    agent._format_instructions = "FORMAT"
+    agent._system_prompts = {}
+
+    first = agent.get_rendered_system_prompt("tablet")
+    assert agent.get_rendered_system_prompt("tablet") is first
+
+    _edit(scenes_dir, "tablet", version=2, name="平板学习")
+    registry.reload(force=True)
+
+    second = agent.get_rendered_system_prompt("tablet")
+    assert second != first and "平板学习" in second and second.endswith("FORMAT")
@@ -0,0 +1,140 @@
+"""
+模型调用优先级调度测试
+"""
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from backend.Agent.scheduler import PriorityGate, Superseded, classify_request, track_session
+
+
+def test_classify_request():
+    base = {"checkCount": 5, "lastStatus": "focused", "incrementalFocusMinutes": 3,
+            "encouragementInterval": 20, "incrementalRestMinutes": 3, "restReminderInterval": 45}
+    assert classify_request(base) == "steady"
+    assert classify_request({**base, "lastStatus": "away"}) == "transition"
+    assert classify_request({**base, "checkCount": 1}) == "transition"
+    assert classify_request({**base, "incrementalFocusMinutes": 20}) == "milestone"
+    assert classify_request({**base, "incrementalFocusMinutes": 20, "suppressEncouragement": True}) == "steady"
+    assert classify_request({**base, "incrementalRestMinutes": 50}) == "milestone"
+
+
+def _queue_and_release(gate, arrivals):
+    """占满名额后按 arrivals 顺序排队，释放名额，返回放行顺序"""
+    order = []
+    holder = gate.slot("steady")
+    holder.__enter__()
+
+    def worker(name, priority):
+        with gate.slot(priority):
+            order.append(name)
+
+    threads = []
+    for name, priority in arrivals:
+        thread = threading.Thread(target=worker, args=(name, priority))
+        thread.start()
+        threads.append(thread)
+        while gate.pending < len(threads):
+            time.sleep(0.005)
+
+    holder.__exit__(None, None, None)
+    for thread in threads:
+        thread.join(timeout=5)
+    return order
+
+
+def test_higher_priority_served_first():
+    gate = PriorityGate(max_concurrency=1)
+    order = _queue_and_release(gate, [("steady", "steady"), ("milestone", "milestone"), ("transition", "transition")])
+    assert order == ["transition", "milestone", "steady"]
+    assert gate.active == 0
+
+
+def test_aged_request_not_starved():
+    # 例行检查已等待超过预算差，截止时间早于新到达的状态切换请求
+    gate = PriorityGate(max_concurrency=1, deadlines={"transition": 0.05, "milestone": 0.1, "steady": 0.1})
+    holder = gate.slot("steady")
+    holder.__enter__()
+    order = []
+
+    def worker(name, priority):
+        with gate.slot(priority):
+            order.append(name)
+
+    old = threading.Thread(target=worker, args=("old-steady", "steady"))
+    old.start()
+    time.sleep(0.2)
+    new = threading.Thread(target=worker, args=("new-transition", "transition"))
+    new.start()
+    while gate.pending < 2:
+        time.sleep(0.005)
+    holder.__exit__(None, None, None)
+    old.join(timeout=5)
+    new.join(timeout=5)
+    assert order == ["old-steady", "new-transition"]
+
+
+def test_queue_timeout_releases_entry():
+    gate = PriorityGate(max_concurrency=1, timeout=0.05)
+    with gate.slot("steady"):
+        with pytest.raises(TimeoutError):
+            with gate.slot("transition"):
+                pass
+        assert gate.pending == 0
+    # 超时的等待者不会占用名额
+    with gate.slot("steady") as waited:
+        assert waited < 0.05
+
+
+def test_newer_request_supersedes_queued_one():
+    gate = PriorityGate(max_concurrency=1, timeout=5)
+    holder = gate.slot("steady")
+    holder.__enter__()
+    results = {}
+
+    def worker(name):
+        with track_session("tab-1"):
+            try:
+                with gate.slot("steady"):
+                    results[name] = "called"
+            except Superseded:
+                results[name] = "superseded"
+
+    old = threading.Thread(target=worker, args=("old",))
+    old.start()
+    while gate.pending < 1:
+        time.sleep(0.005)
+    new = threading.Thread(target=worker, args=("new",))
+    new.start()
+    old.join(timeout=1)
+    assert results == {"old": "superseded"}
+
+    holder.__exit__(None, None, None)
+    new.join(timeout=5)
+    assert results == {"old": "superseded", "new": "called"}
+    assert gate.active == 0 and gate.pending == 0
+
+
+def test_other_sessions_not_superseded():
+    gate = PriorityGate(max_concurrency=1)
+    with track_session("tab-1") as first:
+        with track_session("tab-2"):
+            pass
+        assert not first.superseded
+        with gate.slot("steady"):
+            pass
+    with track_session(None) as token:
+        assert token is None
+
+
+def test_nested_tracking_reuses_entry_token():
+    # 入口在准入控制之前登记，分析流程中再次登记同一会话时沿用原序号，不会取代自己
+    with track_session("tab-1") as outer:
+        with track_session("tab-1") as inner:
+            assert inner is outer
+        assert not outer.superseded
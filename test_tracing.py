@@ -0,0 +1,51 @@
+"""
+测试分析流水线的追踪 span（进程内导出器，模型调用使用替身）
+"""
+import sys
+from pathlib import Path
+
+# 添加项目路径
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from langchain_core.messages import AIMessage
+
+from backend.Agent import supervisor
+from backend.service import analyze_frame_bytes
+from backend.utils import tracing
+
+
+class FakeLLM:
+    """返回固定 JSON 的模型替身"""
+
+    def invoke(self, messages):
+        return AIMessage(
+            content='{"status": "focused", "message": "继续保持", "confidence": 0.9, "shouldSpeak": false}',
+            usage_metadata={"input_tokens": 120, "output_tokens": 20, "total_tokens": 140}
+        )
+
+
+def test_analyze_pipeline_spans(monkeypatch):
+    """测试每个阶段都有 span，且父子关系和属性正确"""
+    exporter = tracing.configure_tracing("memory")
+    agent = supervisor.SupervisorAgent()
+    agent.llm = FakeLLM()
+    monkeypatch.setattr(supervisor, "_agent_instance", agent)
+    
+    try:
+        result = analyze_frame_bytes(b"\xff\xd8\xff\xe0" + b"\x00" * 256, {"scene": "homework"})
+        assert result["success"] and result["status"] == "focused"
+        
+        spans = {span.name: span for span in exporter.get_finished_spans()}
+        assert {"monitor.analyze", "monitor.validate", "supervisor.analyze",
+                "supervisor.prompt_build", "supervisor.model_call", "supervisor.parse"} <= set(spans)
+        
+        root = spans["monitor.analyze"]
+        assert root.parent_id is None
+        assert root.attributes["scene"] == "homework"
+        assert root.attributes["image.bytes"] == 260
+        assert spans["supervisor.analyze"].parent_id == root.span_id
+        assert spans["supervisor.model_call"].parent_id == spans["supervisor.analyze"].span_id
+        assert spans["supervisor.model_call"].attributes["tokens.input"] == 120
+    finally:
+        tracing.configure_tracing("none")
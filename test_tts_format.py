@@ -0,0 +1,67 @@
+"""
+测试语音合成输出格式选择、缓存和转码（不调用远程服务）
+"""
+import sys
+from pathlib import Path
+
+# 添加项目路径
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from backend.service import tts
+
+
+def test_resolve_output_format():
+    """测试格式协商：参数优先，其次 Accept 头"""
+    assert tts.resolve_output_format("ogg") == "opus"
+    assert tts.resolve_output_format("WAV") == "wav"
+    assert tts.resolve_output_format(None, "audio/ogg;q=0.5, audio/mpeg") == "mp3"
+    assert tts.resolve_output_format(None, "audio/ogg, audio/mpeg;q=0.8") == "opus"
+    assert tts.resolve_output_format("unknown", "text/html") == tts.DEFAULT_TTS_FORMAT
+
+
+def test_variant_cache_and_transcode(monkeypatch):
+    """测试缓存命中和 pcm -> wav 转码不会再次调用合成 API"""
+    calls = []
+
+    def fake_native(text, model, voice, output_format):
+        calls.append(output_format)
+        return b"\x00\x01" * 800, "pcm"
+
+    monkeypatch.setattr(tts, "_synthesize_native", fake_native)
+    tts.audio_cache.clear()
+
+    pcm, fmt = tts.synthesize_speech_variant("你好", "m", "v", "pcm")
+    assert fmt == "pcm" and len(pcm) == 1600
+
+    wav, fmt = tts.synthesize_speech_variant("你好", "m", "v", "wav")
+    assert fmt == "wav" and wav.startswith(b"RIFF")
+
+    again, _ = tts.synthesize_speech_variant("你好", "m", "v", "wav")
+    assert again == wav
+    assert calls == ["pcm"]
+    tts.audio_cache.clear()
+
+
+def test_audio_cache_variant_index():
+    """测试按文本查找任意格式变体，淘汰后索引同步更新"""
+    cache = tts.AudioCache(max_bytes=10)
+    cache.put("m", "v", "a", "pcm", b"1234")
+    cache.put("m", "v", "a", "mp3", b"56")
+    cache.put("m", "v", "b", "mp3", b"78")
+    assert cache.get_any("m", "v", "a") == (b"56", "mp3")
+    assert cache.get_any("m", "v", "c") is None
+
+    # 超出容量：淘汰最久未使用的 a/pcm
+    cache.put("m", "v", "c", "wav", b"9999")
+    assert cache.get("m", "v", "a", "pcm") is None
+    assert cache.get_any("m", "v", "a") == (b"56", "mp3")
+
+    # get_any 也会刷新使用顺序：淘汰 b 和 c，保留 a
+    cache.put("m", "v", "d", "wav", b"000000")
+    assert cache.get_any("m", "v", "b") is None
+    assert cache.get_any("m", "v", "c") is None
+    assert cache.get_any("m", "v", "a") == (b"56", "mp3")
+    assert cache.get_any("m", "v", "d") == (b"000000", "wav")
+    cache.clear()
+    assert cache.get_any("m", "v", "d") is None